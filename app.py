@@ -1,23 +1,821 @@
 import os
+import csv
 import sqlite3
 import secrets
-from datetime import datetime
-from flask import Flask, request, jsonify, session, send_from_directory
+import threading
+import time
+import json
+import atexit
+import zlib
+import base64
+import glob
+import hashlib
+import pickle
+import itertools
+import multiprocessing
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO, StringIO
+from datetime import datetime, timedelta, timezone
+import click
+from flask import Flask, Response, request, jsonify, session, send_from_directory, make_response, g, has_app_context, stream_with_context
 from werkzeug.security import generate_password_hash, check_password_hash
 from functools import wraps
+from contextlib import contextmanager
 
 app = Flask(__name__, static_folder='static', static_url_path='')
 app.secret_key = os.environ.get('SESSION_SECRET', secrets.token_hex(32))
 
-DATABASE = 'contract_review.db'
+DATABASE = os.environ.get('DATABASE_PATH', 'contract_review.db')
+# A postgres:// or postgresql:// URL selects PostgreSQL; otherwise the SQLite
+# file at DATABASE_PATH is used.
+DATABASE_URL = os.environ.get('DATABASE_URL', '')
+USE_POSTGRES = DATABASE_URL.startswith(('postgres://', 'postgresql://'))
+POSTGRES_POOL_SIZE = int(os.environ.get('POSTGRES_POOL_SIZE', '20'))
+POSTGRES_POOL_TIMEOUT = float(os.environ.get('POSTGRES_POOL_TIMEOUT', '30'))
 
-def get_db():
-    db = sqlite3.connect(DATABASE)
+if USE_POSTGRES:
+    import psycopg2
+    import psycopg2.extensions
+    import psycopg2.extras
+    import psycopg2.pool
+    DB_ERRORS = (sqlite3.Error, psycopg2.Error)
+    DB_DATA_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError,
+                      psycopg2.IntegrityError, psycopg2.DataError, psycopg2.ProgrammingError)
+else:
+    DB_ERRORS = (sqlite3.Error,)
+    DB_DATA_ERRORS = (sqlite3.IntegrityError, sqlite3.InterfaceError, sqlite3.ProgrammingError)
+
+def parse_pragmas(spec):
+    pragmas = {}
+    for item in spec.split(','):
+        if '=' in item:
+            name, value = item.split('=', 1)
+            pragmas[name.strip()] = value.strip()
+    return pragmas
+
+# Applied to every connection; override individual values with e.g.
+# SQLITE_PRAGMAS="synchronous=FULL,cache_size=-64000".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': '5000',
+    'foreign_keys': 'ON',
+    'cache_size': '-16000',
+    'temp_store': 'MEMORY'
+}
+SQLITE_PRAGMAS.update(parse_pragmas(os.environ.get('SQLITE_PRAGMAS', '')))
+
+FORM_TYPES = ('cr', 'ped', 'lead')  # keys of FORMS
+FORM_EVENTS_POLL_INTERVAL = float(os.environ.get('FORM_EVENTS_POLL_INTERVAL', '0.5'))
+FORM_EVENTS_STREAM_SECONDS = int(os.environ.get('FORM_EVENTS_STREAM_SECONDS', '300'))
+# Each open stream holds a worker thread, so keep this well below gunicorn's
+# --threads; pages beyond it are refused and poll with If-None-Match instead.
+FORM_EVENTS_MAX_STREAMS = int(os.environ.get('FORM_EVENTS_MAX_STREAMS', '4'))
+FORM_CHANGES_RETAINED = 10000
+# PostgreSQL only: how long (seconds) and how many ids skipped over by the
+# watcher are asked for again, in case their save commits late.
+FORM_CHANGES_GAP_SECONDS = 60
+FORM_CHANGES_MAX_GAPS = 1000
+AUTH_CACHE_TTL = float(os.environ.get('AUTH_CACHE_TTL', '30'))
+# Touched on every write to users; defaults to DATABASE_PATH + '.users-version'.
+USERS_VERSION_PATH = os.environ.get('USERS_VERSION_PATH')
+# Any werkzeug method string, e.g. "scrypt:32768:8:1" or "pbkdf2:sha256:600000".
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt')
+PASSWORD_HASH_THREADS = int(os.environ.get('PASSWORD_HASH_THREADS', '2'))
+# 'template' splices values into the CR templates' XML; 'openpyxl' renders
+# every workbook through openpyxl (slower, and the reference output).
+CR_RENDER_ENGINE = os.environ.get('CR_RENDER_ENGINE', 'template')
+EXPORT_PROCESSES = int(os.environ.get('EXPORT_PROCESSES', str(min(os.cpu_count() or 1, 8))))
+EXPORT_DIR = os.environ.get('EXPORT_DIR', 'exports')
+EXPORT_JOB_THREADS = int(os.environ.get('EXPORT_JOB_THREADS', '2'))
+EXPORT_RETENTION_SECONDS = int(os.environ.get('EXPORT_RETENTION_SECONDS', '86400'))
+EXPORT_JOB_STALE_SECONDS = 600
+CR_EXPORT_ROW_CHUNK = 500
+POS_PAGE_SIZE = 50
+POS_MAX_PAGE_SIZE = 200
+FORMS_LOAD_MAX_KEYS = 200
+FORMS_LOAD_CHUNK = 500
+FORM_EXPORT_CHUNK = 200  # forms whose rows are read per query by /api/<form>-export
+FORM_EXPORT_BUFFER = 64 * 1024
+XLSX_MAX_ROWS = 1048576
+BACKUP_CHUNK_SIZE = 64 * 1024
+BACKUP_RESTORE_CHUNK = 1000
+BACKUP_MAX_LINE = 16 * 1024 * 1024
+SNAPSHOT_DIR = os.environ.get('SNAPSHOT_DIR', 'snapshots')
+SNAPSHOT_RETAIN = int(os.environ.get('SNAPSHOT_RETAIN', '7'))
+# Seconds between scheduled snapshots; 0 disables the scheduler.
+SNAPSHOT_INTERVAL = int(os.environ.get('SNAPSHOT_INTERVAL', '0'))
+SNAPSHOT_PAGES = 1024
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') != '0'
+METRICS_PATH = os.environ.get('METRICS_PATH', '')
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '10'))
+
+_db_pool = threading.local()
+
+def connect_db():
+    if USE_POSTGRES:
+        return PostgresConnection(get_postgres_pool())
+    db = sqlite3.connect(DATABASE, factory=InstrumentedConnection)
     db.row_factory = sqlite3.Row
+    for name, value in SQLITE_PRAGMAS.items():
+        db.execute(f'PRAGMA {name} = {value}')
     return db
 
-def init_db():
-    db = get_db()
+def get_db():
+    """Return the connection for the current request.
+
+    Each thread keeps one open connection that is handed to every request it
+    serves and released in ``release_db`` on teardown, so routes and decorators
+    share it and must not close it. With PostgreSQL the connection is borrowed
+    from the pool instead and given back on teardown. Outside an app context a
+    fresh connection is returned and the caller owns it.
+    """
+    if not has_app_context():
+        return connect_db()
+    if 'db' not in g:
+        if USE_POSTGRES:
+            db = connect_db()
+        else:
+            db = getattr(_db_pool, 'db', None)
+            if db is None or getattr(_db_pool, 'path', None) != DATABASE:
+                if db is not None:
+                    db.close()
+                db = connect_db()
+                _db_pool.db = db
+                _db_pool.path = DATABASE
+        db.query_count = 0
+        db.query_seconds = 0.0
+        g.db = db
+    return g.db
+
+@app.teardown_appcontext
+def release_db(exc):
+    db = g.pop('db', None)
+    if db is None:
+        return
+    if USE_POSTGRES:
+        db.close()
+    elif db.in_transaction:
+        db.rollback()
+
+class InstrumentedConnection(sqlite3.Connection):
+    """Counts and times the statements run through execute/executemany.
+
+    Time spent fetching rows after execute returns is not included.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.query_count = 0
+        self.query_seconds = 0.0
+    
+    def execute(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().execute(*args)
+        finally:
+            self.query_count += 1
+            self.query_seconds += time.perf_counter() - started
+    
+    def executemany(self, *args):
+        started = time.perf_counter()
+        try:
+            return super().executemany(*args)
+        finally:
+            self.query_count += 1
+            self.query_seconds += time.perf_counter() - started
+
+class PostgresRow:
+    """A result row readable like sqlite3.Row: by column name, by index, or with dict()."""
+    __slots__ = ('_values', '_index')
+    
+    def __init__(self, values, index):
+        self._values = values
+        self._index = index
+    
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._index[key]]
+        return self._values[key]
+    
+    def __iter__(self):
+        return iter(self._values)
+    
+    def __len__(self):
+        return len(self._values)
+    
+    def keys(self):
+        return list(self._index)
+
+class PostgresCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.rowcount = cursor.rowcount
+        # Like sqlite3.Row, the first of several same-named columns wins.
+        names = [column.name for column in cursor.description or ()]
+        self._index = {name: i for i, name in reversed(list(enumerate(names)))}
+    
+    def fetchone(self):
+        values = self._cursor.fetchone()
+        return None if values is None else PostgresRow(values, self._index)
+    
+    def fetchall(self):
+        return [PostgresRow(values, self._index) for values in self._cursor.fetchall()]
+    
+    def __iter__(self):
+        for values in self._cursor:
+            yield PostgresRow(values, self._index)
+
+_INSERT_VALUES = re.compile(r'^(INSERT\s+INTO\s.*?\)\s*VALUES\s*)(\([^()]*\))(.*)$', re.S | re.I)
+_postgres_statements = {}
+
+def postgres_statement(sql):
+    """Translate SQLite-dialect ``sql`` for psycopg2, cached.
+
+    Returns ``(statement, kind, values)``: ``?`` placeholders become ``%s``,
+    ``BEGIN IMMEDIATE`` (the SQLite write lock) becomes a plain READ COMMITTED
+    ``BEGIN`` and a bare ``BEGIN`` (used for consistent multi-query reads)
+    becomes REPEATABLE READ. ``kind`` is ``'begin'``, ``'write'`` or ``'read'``;
+    for single-row INSERTs ``values`` is ``(prefix, template, suffix)`` for
+    execute_values.
+    """
+    translated = _postgres_statements.get(sql)
+    if translated is None:
+        statement = sql.strip()
+        command = statement.split(None, 1)[0].upper()
+        if command == 'BEGIN':
+            statement = 'BEGIN ISOLATION LEVEL REPEATABLE READ' if statement.upper() == 'BEGIN' else 'BEGIN'
+            kind = 'begin'
+        else:
+            statement = statement.replace('%', '%%').replace('?', '%s')
+            kind = 'write' if command in ('INSERT', 'UPDATE', 'DELETE') else 'read'
+        match = _INSERT_VALUES.match(statement) if command == 'INSERT' else None
+        values = (match.group(1), match.group(2), match.group(3)) if match else None
+        translated = _postgres_statements[sql] = (statement, kind, values)
+    return translated
+
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+
+def postgres_copy_value(value):
+    # One field in COPY's text format.
+    if type(value) is str:
+        return value.translate(_COPY_ESCAPES)
+    if value is None:
+        return '\\N'
+    if isinstance(value, bytes):
+        return '\\\\x' + value.hex()
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (dict, list)):
+        raise TypeError(f'unsupported {type(value).__name__} value')
+    return str(value).translate(_COPY_ESCAPES)
+
+class PostgresConnection:
+    """A pooled psycopg2 connection behind the subset of the sqlite3 API the app uses.
+
+    Statements are written for SQLite and translated by postgres_statement.
+    As with sqlite3, a transaction is opened implicitly before the first
+    INSERT/UPDATE/DELETE and lasts until commit or rollback; plain reads
+    outside one autocommit. Bulk executemany INSERTs go through
+    execute_values, one multi-row statement per page. ``close`` hands the
+    connection back to the pool, rolling back anything uncommitted.
+    """
+    def __init__(self, pool):
+        self._pool = pool
+        self._conn = pool.acquire()
+        self._broken = False
+        self._trace = None
+        self.in_transaction = False
+        self.query_count = 0
+        self.query_seconds = 0.0
+    
+    def set_trace_callback(self, callback):
+        self._trace = callback
+    
+    def _run(self, sql, run):
+        statement, kind, values = postgres_statement(sql)
+        started = time.perf_counter()
+        try:
+            if self._trace is not None:
+                self._trace(sql)
+            cursor = self._conn.cursor()
+            if kind == 'begin':
+                cursor.execute(statement)
+                self.in_transaction = True
+                return cursor
+            if kind == 'write' and not self.in_transaction:
+                cursor.execute('BEGIN')
+                self.in_transaction = True
+            run(cursor, statement, values)
+            return cursor
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self._broken = True
+            raise
+        finally:
+            self.query_count += 1
+            self.query_seconds += time.perf_counter() - started
+    
+    def execute(self, sql, params=()):
+        return PostgresCursor(self._run(sql, lambda cursor, statement, _: cursor.execute(statement, tuple(params))))
+    
+    def executemany(self, sql, seq_of_params):
+        rows = [tuple(params) for params in seq_of_params]
+        
+        def run(cursor, statement, values):
+            if not rows:
+                return
+            if values is not None:
+                prefix, template, suffix = values
+                psycopg2.extras.execute_values(cursor, f'{prefix}%s{suffix}', rows, template=template, page_size=1000)
+            else:
+                psycopg2.extras.execute_batch(cursor, statement, rows, page_size=500)
+        return PostgresCursor(self._run(sql, run))
+    
+    def copy_rows(self, table, columns, rows):
+        """Bulk-insert ``rows`` with COPY FROM STDIN, much faster than INSERTs for restores."""
+        buffer = StringIO()
+        for row in rows:
+            buffer.write('\t'.join(map(postgres_copy_value, row)))
+            buffer.write('\n')
+        buffer.seek(0)
+        # Run (and counted) as a write, so it opens the transaction like an INSERT.
+        self._run(f'INSERT INTO {table}', lambda cursor, statement, _: cursor.copy_expert(
+            f'COPY {table} ({", ".join(columns)}) FROM STDIN', buffer))
+    
+    def _end(self, statement):
+        if self.in_transaction:
+            self.in_transaction = False
+            try:
+                self._conn.cursor().execute(statement)
+            except (psycopg2.OperationalError, psycopg2.InterfaceError):
+                self._broken = True
+                raise
+    
+    def commit(self):
+        self._end('COMMIT')
+    
+    def rollback(self):
+        self._end('ROLLBACK')
+    
+    def close(self):
+        if self._conn is None:
+            return
+        try:
+            self.rollback()
+        except psycopg2.Error:
+            self._broken = True
+        self._pool.release(self._conn, self._broken)
+        self._conn = None
+
+def _postgres_cast(oid, name, cast):
+    return psycopg2.extensions.new_type((oid,), name, lambda value, cursor: None if value is None else cast(value, cursor))
+
+class PostgresPool:
+    """psycopg2's ThreadedConnectionPool, but callers wait for a free connection
+    (up to POSTGRES_POOL_TIMEOUT) instead of getting an error when it is exhausted."""
+    def __init__(self, dsn, size):
+        self.pid = os.getpid()
+        self._pool = psycopg2.pool.ThreadedConnectionPool(1, size, dsn, options='-c timezone=UTC')
+        self._slots = threading.BoundedSemaphore(size)
+    
+    def acquire(self):
+        if not self._slots.acquire(timeout=POSTGRES_POOL_TIMEOUT):
+            raise RuntimeError('Timed out waiting for a database connection')
+        try:
+            conn = self._pool.getconn()
+            if conn.closed:
+                self._pool.putconn(conn, close=True)
+                conn = self._pool.getconn()
+            conn.autocommit = True
+            return conn
+        except BaseException:
+            self._slots.release()
+            raise
+    
+    def release(self, conn, broken=False):
+        try:
+            self._pool.putconn(conn, close=broken or bool(conn.closed))
+        finally:
+            self._slots.release()
+
+_postgres_pool = None
+_postgres_pool_lock = threading.Lock()
+
+def get_postgres_pool():
+    # One pool per process: a worker forked after the pool was created must not
+    # share the parent's sockets.
+    global _postgres_pool
+    with _postgres_pool_lock:
+        if _postgres_pool is None or _postgres_pool.pid != os.getpid():
+            # Values come back as sqlite3 returns them: timestamps as
+            # 'YYYY-MM-DD HH:MM:SS' text, BYTEA as bytes, integral sums as int.
+            for caster in (
+                _postgres_cast(1114, 'TIMESTAMP_TEXT', lambda value, cursor: value),
+                _postgres_cast(17, 'BYTEA_BYTES', lambda value, cursor: bytes(psycopg2.BINARY(value, cursor))),
+                _postgres_cast(1700, 'NUMERIC_NUMBER', lambda value, cursor: float(value) if '.' in value else int(value))
+            ):
+                psycopg2.extensions.register_type(caster)
+            _postgres_pool = PostgresPool(DATABASE_URL, POSTGRES_POOL_SIZE)
+        return _postgres_pool
+
+# Request metrics are accumulated in memory per worker and added to a small
+# SQLite file shared by all workers every METRICS_FLUSH_INTERVAL seconds, so
+# /api/metrics reports totals for the whole server whichever worker answers.
+METRIC_FAMILIES = {
+    'contract_review_http_requests_total': ('counter', 'Requests handled, by endpoint, method and status.'),
+    'contract_review_http_request_duration_seconds': ('histogram', 'Time spent in the view, excluding streamed bodies.'),
+    'contract_review_http_request_sql_queries': ('histogram', 'SQL statements executed per request.'),
+    'contract_review_http_request_sql_seconds_total': ('counter', 'Time spent executing SQL statements.'),
+    'contract_review_http_response_bytes': ('histogram', 'Response body size, when known up front.')
+}
+METRIC_BUCKETS = {
+    'contract_review_http_request_duration_seconds': (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    'contract_review_http_request_sql_queries': (1, 2, 5, 10, 20, 50, 100, 200),
+    'contract_review_http_response_bytes': (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+}
+
+_metrics = {}  # (series, labels, le) -> value added since the last flush
+_metrics_lock = threading.Lock()
+_metrics_flushed_at = time.monotonic()
+
+def metrics_path():
+    return METRICS_PATH or f'{os.path.splitext(DATABASE)[0]}_metrics.db'
+
+def metric_labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+def observe_metric(name, labels, value):
+    buckets = METRIC_BUCKETS.get(name)
+    if buckets is None:
+        _metrics[(name, labels, '')] = _metrics.get((name, labels, ''), 0) + value
+        return
+    for le in buckets:
+        key = (f'{name}_bucket', labels, str(le))
+        _metrics[key] = _metrics.get(key, 0) + (value <= le)
+    for key, amount in (((f'{name}_bucket', labels, '+Inf'), 1), ((f'{name}_sum', labels, ''), value),
+                        ((f'{name}_count', labels, ''), 1)):
+        _metrics[key] = _metrics.get(key, 0) + amount
+
+def flush_metrics():
+    global _metrics, _metrics_flushed_at
+    with _metrics_lock:
+        pending, _metrics = _metrics, {}
+        _metrics_flushed_at = time.monotonic()
+    if not pending:
+        return
+    try:
+        db = sqlite3.connect(metrics_path(), timeout=1)
+        try:
+            db.execute('PRAGMA journal_mode = WAL')
+            db.execute('CREATE TABLE IF NOT EXISTS metrics (series TEXT, labels TEXT, le TEXT, value REAL, '
+                       'PRIMARY KEY (series, labels, le))')
+            db.executemany('INSERT INTO metrics (series, labels, le, value) VALUES (?, ?, ?, ?) '
+                           'ON CONFLICT (series, labels, le) DO UPDATE SET value = value + excluded.value',
+                           [key + (value,) for key, value in pending.items()])
+            db.commit()
+        finally:
+            db.close()
+    except sqlite3.Error:
+        # Keep the counts for the next attempt rather than losing them.
+        with _metrics_lock:
+            for key, value in pending.items():
+                _metrics[key] = _metrics.get(key, 0) + value
+
+atexit.register(flush_metrics)
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('metrics_started', None)
+    if started is None or not METRICS_ENABLED:
+        return response
+    elapsed = time.perf_counter() - started
+    # get_db resets the pooled connection's counters when a request takes it.
+    db = g.get('db')
+    queries, query_seconds = (db.query_count, db.query_seconds) if db is not None else (0, 0.0)
+    endpoint = request.endpoint or 'unmatched'
+    labels = metric_labels(endpoint=endpoint, method=request.method)
+    with _metrics_lock:
+        observe_metric('contract_review_http_requests_total',
+                       metric_labels(endpoint=endpoint, method=request.method, status=response.status_code), 1)
+        observe_metric('contract_review_http_request_duration_seconds', labels, elapsed)
+        observe_metric('contract_review_http_request_sql_queries', labels, queries)
+        observe_metric('contract_review_http_request_sql_seconds_total', labels, query_seconds)
+        if response.content_length is not None:
+            observe_metric('contract_review_http_response_bytes', labels, response.content_length)
+        due = time.monotonic() - _metrics_flushed_at >= METRICS_FLUSH_INTERVAL
+    if due:
+        flush_metrics()
+    return response
+
+def add_column(db, table, column, definition):
+    columns = [row['name'] for row in db.execute(f'PRAGMA table_info({table})')]
+    if column not in columns:
+        db.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+def migration_users_lead_form_access(db):
+    add_column(db, 'users', 'lead_form_access', 'BOOLEAN NOT NULL DEFAULT 0')
+
+def migration_cr_form_record_fields(db):
+    add_column(db, 'cr_forms', 'record_no', 'TEXT')
+    add_column(db, 'cr_forms', 'record_date', 'TEXT')
+
+def migration_cr_form_amendment_details(db):
+    add_column(db, 'cr_forms', 'amendment_details', 'TEXT')
+
+def migration_form_versions(db):
+    for table in ('cr_forms', 'ped_forms', 'lead_forms'):
+        add_column(db, table, 'version', 'INTEGER NOT NULL DEFAULT 0')
+
+def migration_form_changes(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS form_changes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            form_type TEXT NOT NULL,
+            po_key TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            changed_by TEXT,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def migration_form_row_indexes(db):
+    db.execute('CREATE INDEX IF NOT EXISTS idx_cr_form_rows_form ON cr_form_rows (cr_form_id, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_ped_form_rows_form ON ped_form_rows (ped_form_id, id)')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_lead_form_rows_form ON lead_form_rows (lead_form_id, id)')
+
+def migration_export_jobs(db):
+    db.execute('''
+        CREATE TABLE IF NOT EXISTS export_jobs (
+            id TEXT PRIMARY KEY,
+            kind TEXT NOT NULL,
+            params_key TEXT NOT NULL,
+            status TEXT NOT NULL,
+            forms_done INTEGER NOT NULL DEFAULT 0,
+            forms_total INTEGER NOT NULL DEFAULT 0,
+            file_size INTEGER,
+            error TEXT,
+            created_by TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+    db.execute('CREATE INDEX IF NOT EXISTS idx_export_jobs_params ON export_jobs (params_key, status)')
+
+def migration_export_job_params(db):
+    add_column(db, 'export_jobs', 'params', 'TEXT')
+
+def migration_compact_cycles(db):
+    for table, column in (('cr_form_rows', 'cycles'), ('ped_form_rows', 'ped_cycles')):
+        add_column(db, table, 'cycle_count', 'INTEGER NOT NULL DEFAULT 0')
+        add_column(db, table, 'filled_count', 'INTEGER NOT NULL DEFAULT 0')
+        updates = []
+        for row in db.execute(f'SELECT id, {column} FROM {table}').fetchall():
+            try:
+                cycles = decode_cycles(row[column])
+            except ValueError:
+                continue
+            updates.append(cycle_values(cycles) + (row['id'],))
+        db.executemany(f'UPDATE {table} SET {column} = ?, cycle_count = ?, filled_count = ? WHERE id = ?', updates)
+
+def migration_pos_search(db):
+    # External-content FTS5 index over the PO fields, kept in sync by triggers.
+    db.execute('''
+        CREATE VIRTUAL TABLE IF NOT EXISTS pos_fts USING fts5(
+            customer, bid, po, cr,
+            content='pos', content_rowid='id', tokenize='unicode61 remove_diacritics 2'
+        )
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS pos_fts_insert AFTER INSERT ON pos BEGIN
+            INSERT INTO pos_fts (rowid, customer, bid, po, cr) VALUES (new.id, new.customer, new.bid, new.po, new.cr);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS pos_fts_delete AFTER DELETE ON pos BEGIN
+            INSERT INTO pos_fts (pos_fts, rowid, customer, bid, po, cr) VALUES ('delete', old.id, old.customer, old.bid, old.po, old.cr);
+        END
+    ''')
+    db.execute('''
+        CREATE TRIGGER IF NOT EXISTS pos_fts_update AFTER UPDATE ON pos BEGIN
+            INSERT INTO pos_fts (pos_fts, rowid, customer, bid, po, cr) VALUES ('delete', old.id, old.customer, old.bid, old.po, old.cr);
+            INSERT INTO pos_fts (rowid, customer, bid, po, cr) VALUES (new.id, new.customer, new.bid, new.po, new.cr);
+        END
+    ''')
+    db.execute("INSERT INTO pos_fts (pos_fts) VALUES ('rebuild')")
+
+# Applied in order on top of the base tables created by init_db. The schema
+# version is kept in PRAGMA user_version; append new steps, never renumber.
+# Steps must tolerate databases patched by the older ad-hoc ALTER TABLE checks.
+MIGRATIONS = [
+    (1, migration_users_lead_form_access),
+    (2, migration_cr_form_record_fields),
+    (3, migration_cr_form_amendment_details),
+    (4, migration_form_versions),
+    (5, migration_form_changes),
+    (6, migration_form_row_indexes),
+    (7, migration_export_jobs),
+    (8, migration_export_job_params),
+    (9, migration_pos_search),
+    (10, migration_compact_cycles),
+]
+
+def migrate_db(db):
+    for version, migrate in MIGRATIONS:
+        if db.execute('PRAGMA user_version').fetchone()[0] >= version:
+            continue
+        # IMMEDIATE serialises workers that start up at the same time; re-check
+        # once the write lock is held in case another one got there first.
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if db.execute('PRAGMA user_version').fetchone()[0] < version:
+                migrate(db)
+                db.execute(f'PRAGMA user_version = {version}')
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+
+def schema_version(db):
+    if USE_POSTGRES:
+        return db.execute('SELECT version FROM schema_version').fetchone()[0]
+    return db.execute('PRAGMA user_version').fetchone()[0]
+
+def table_columns(db, table):
+    if USE_POSTGRES:
+        return [row['column_name'] for row in db.execute(
+            'SELECT column_name FROM information_schema.columns WHERE table_schema = current_schema() AND table_name = ? '
+            'ORDER BY ordinal_position', (table,))]
+    return [row['name'] for row in db.execute(f'PRAGMA table_info({table})')]
+
+# PO search document on PostgreSQL. Punctuation is folded to spaces first so
+# 'PO-0117/Rev A' yields the words po, 0117, rev and a, as FTS5's unicode61
+# tokenizer splits it; the GIN index and fetch_pos_page use this same text.
+POS_SEARCH_DOCUMENT = ("to_tsvector('simple', regexp_replace(customer || ' ' || bid || ' ' || po || ' ' || cr, "
+                       "'[^[:alnum:]]+', ' ', 'g'))")
+
+# Key for pg_advisory_xact_lock.
+POSTGRES_LOCK_SCHEMA = 0x47544e01
+
+# PostgreSQL databases are created directly at the latest schema version
+# instead of replaying MIGRATIONS, so a new migration needs its PostgreSQL DDL
+# here as well (and applying by hand to existing PostgreSQL databases).
+POSTGRES_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)''',
+    '''CREATE TABLE IF NOT EXISTS users (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        username TEXT UNIQUE NOT NULL,
+        password_hash TEXT NOT NULL,
+        name TEXT NOT NULL,
+        department TEXT NOT NULL,
+        is_admin INTEGER NOT NULL DEFAULT 0,
+        lead_form_access INTEGER NOT NULL DEFAULT 0,
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS pos (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        customer TEXT NOT NULL,
+        bid TEXT NOT NULL,
+        po TEXT NOT NULL,
+        cr TEXT NOT NULL,
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+    )''',
+    f'CREATE INDEX IF NOT EXISTS idx_pos_search ON pos USING GIN ({POS_SEARCH_DOCUMENT})',
+    '''CREATE TABLE IF NOT EXISTS cr_forms (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        po_key TEXT UNIQUE NOT NULL,
+        customer TEXT,
+        bid TEXT,
+        po TEXT,
+        cr TEXT,
+        record_no TEXT,
+        record_date TEXT,
+        amendment_details TEXT,
+        last_modified_by TEXT,
+        last_modified_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS cr_form_rows (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        cr_form_id INTEGER NOT NULL REFERENCES cr_forms(id) ON DELETE CASCADE,
+        item_no TEXT NOT NULL,
+        part_number TEXT,
+        part_description TEXT,
+        rev TEXT,
+        qty TEXT,
+        cycles BYTEA,
+        remarks TEXT,
+        cycle_count INTEGER NOT NULL DEFAULT 0,
+        filled_count INTEGER NOT NULL DEFAULT 0
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_cr_form_rows_form ON cr_form_rows (cr_form_id, id)',
+    '''CREATE TABLE IF NOT EXISTS ped_forms (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        po_key TEXT UNIQUE NOT NULL,
+        customer TEXT,
+        bid TEXT,
+        po TEXT,
+        cr TEXT,
+        record_no TEXT,
+        record_date TEXT,
+        amendment_details TEXT,
+        last_modified_by TEXT,
+        last_modified_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS ped_form_rows (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        ped_form_id INTEGER NOT NULL REFERENCES ped_forms(id) ON DELETE CASCADE,
+        item_no TEXT NOT NULL,
+        part_number TEXT,
+        part_description TEXT,
+        rev TEXT,
+        qty TEXT,
+        ped_cycles BYTEA,
+        notes TEXT,
+        remarks TEXT,
+        cycle_count INTEGER NOT NULL DEFAULT 0,
+        filled_count INTEGER NOT NULL DEFAULT 0
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_ped_form_rows_form ON ped_form_rows (ped_form_id, id)',
+    '''CREATE TABLE IF NOT EXISTS lead_forms (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        po_key TEXT UNIQUE NOT NULL,
+        customer TEXT,
+        bid TEXT,
+        po TEXT,
+        cr TEXT,
+        record_no TEXT,
+        record_date TEXT,
+        last_modified_by TEXT,
+        last_modified_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        version INTEGER NOT NULL DEFAULT 0
+    )''',
+    '''CREATE TABLE IF NOT EXISTS lead_form_rows (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        lead_form_id INTEGER NOT NULL REFERENCES lead_forms(id) ON DELETE CASCADE,
+        item_no TEXT NOT NULL,
+        part_number TEXT,
+        part_description TEXT,
+        rev TEXT,
+        qty TEXT,
+        customer_required_date TEXT,
+        standard_lead_time TEXT,
+        gtn_agreed_date TEXT,
+        remarks TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_lead_form_rows_form ON lead_form_rows (lead_form_id, id)',
+    '''CREATE TABLE IF NOT EXISTS form_changes (
+        id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+        form_type TEXT NOT NULL,
+        po_key TEXT NOT NULL,
+        version INTEGER NOT NULL,
+        changed_by TEXT,
+        changed_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP
+    )''',
+    '''CREATE TABLE IF NOT EXISTS export_jobs (
+        id TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        params_key TEXT NOT NULL,
+        status TEXT NOT NULL,
+        forms_done INTEGER NOT NULL DEFAULT 0,
+        forms_total INTEGER NOT NULL DEFAULT 0,
+        file_size BIGINT,
+        error TEXT,
+        created_by TEXT,
+        created_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP(0) DEFAULT CURRENT_TIMESTAMP,
+        finished_at TIMESTAMP(0),
+        params TEXT
+    )''',
+    'CREATE INDEX IF NOT EXISTS idx_export_jobs_params ON export_jobs (params_key, status)'
+]
+
+def create_postgres_schema(db):
+    db.execute('BEGIN IMMEDIATE')
+    try:
+        # Serialises workers that start up at the same time.
+        db.execute('SELECT pg_advisory_xact_lock(?)', (POSTGRES_LOCK_SCHEMA,))
+        for statement in POSTGRES_SCHEMA:
+            db.execute(statement)
+        row = db.execute('SELECT version FROM schema_version').fetchone()
+        if row is None:
+            db.execute('INSERT INTO schema_version (version) VALUES (?)', (len(MIGRATIONS),))
+        elif row['version'] != len(MIGRATIONS):
+            raise RuntimeError(f"PostgreSQL schema is at version {row['version']}, this application needs {len(MIGRATIONS)}")
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+def create_sqlite_schema(db):
     db.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -31,12 +829,6 @@ def init_db():
         )
     ''')
     
-    try:
-        db.execute('SELECT lead_form_access FROM users LIMIT 1')
-    except:
-        db.execute('ALTER TABLE users ADD COLUMN lead_form_access BOOLEAN NOT NULL DEFAULT 0')
-        db.commit()
-    
     db.execute('''
         CREATE TABLE IF NOT EXISTS pos (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -64,19 +856,6 @@ def init_db():
         )
     ''')
     
-    try:
-        db.execute('SELECT record_no FROM cr_forms LIMIT 1')
-    except:
-        db.execute('ALTER TABLE cr_forms ADD COLUMN record_no TEXT')
-        db.execute('ALTER TABLE cr_forms ADD COLUMN record_date TEXT')
-        db.commit()
-    
-    try:
-        db.execute('SELECT amendment_details FROM cr_forms LIMIT 1')
-    except:
-        db.execute('ALTER TABLE cr_forms ADD COLUMN amendment_details TEXT')
-        db.commit()
-    
     db.execute('''
         CREATE TABLE IF NOT EXISTS cr_form_rows (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -156,16 +935,565 @@ def init_db():
         )
     ''')
     
+    db.commit()
+    migrate_db(db)
+
+def init_db():
+    db = connect_db()
+    if USE_POSTGRES:
+        create_postgres_schema(db)
+    else:
+        create_sqlite_schema(db)
+    
     cursor = db.execute('SELECT COUNT(*) as count FROM users WHERE username = ?', ('admin',))
     if cursor.fetchone()['count'] == 0:
         db.execute(
             'INSERT INTO users (username, password_hash, name, department, is_admin) VALUES (?, ?, ?, ?, ?)',
-            ('admin', generate_password_hash('admin'), 'IT Administrator', 'it', 1)
+            ('admin', hash_password('admin'), 'IT Administrator', 'it', 1)
         )
     
     db.commit()
     db.close()
 
+def form_etag(form_id, version):
+    return f'{form_id}.{version}'
+
+def not_modified(etag):
+    response = make_response('', 304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def form_response(payload, etag):
+    response = jsonify(payload)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+FORM_HEADER_FIELDS = {
+    'customer': 'customer',
+    'bid': 'bid',
+    'po': 'po',
+    'cr': 'cr',
+    'recordNo': 'record_no',
+    'recordDate': 'record_date'
+}
+
+# Check states a cycle cell can hold, in 2-bit code order. Packing goes through
+# lookup tables between one byte and the four states it holds.
+CYCLE_STATES = ('', '✓', 'x', 'NA')
+_CYCLE_BYTE_STATES = [tuple(CYCLE_STATES[(byte >> shift) & 3] for shift in (0, 2, 4, 6)) for byte in range(256)]
+_CYCLE_STATES_BYTE = {states: byte for byte, states in enumerate(_CYCLE_BYTE_STATES)}
+CYCLES_JSON_MARKER = b'\x00'
+
+def encode_cycles(cycles):
+    """Pack a row's cycle states into a BLOB: a length byte, then four 2-bit states per byte.
+
+    Lists holding anything other than CYCLE_STATES (or more than 255 cells) are
+    stored as a zero byte followed by their JSON instead, so every value
+    round-trips through decode_cycles. (A packed empty list is the single byte 0.)
+    """
+    if isinstance(cycles, list) and len(cycles) <= 255:
+        cells = iter(cycles + [''] * (-len(cycles) % 4))
+        try:
+            return bytes([len(cycles)]) + bytes(map(_CYCLE_STATES_BYTE.__getitem__, zip(cells, cells, cells, cells)))
+        except (KeyError, TypeError):
+            pass
+    return CYCLES_JSON_MARKER + json.dumps(cycles).encode('utf-8')
+
+def decode_cycles(value):
+    """Inverse of encode_cycles; also reads the JSON text of rows saved before packing."""
+    if not value:
+        return []
+    if isinstance(value, bytes):
+        if value[:1] == CYCLES_JSON_MARKER and len(value) > 1:
+            return json.loads(value[1:])
+        return list(itertools.chain.from_iterable(map(_CYCLE_BYTE_STATES.__getitem__, value[1:])))[:value[0]]
+    return json.loads(value)
+
+def cycle_values(cycles):
+    # (encoded cycles, cycle_count, filled_count) as stored on a row
+    if not isinstance(cycles, list):
+        return (encode_cycles(cycles), 0, 0)
+    return (encode_cycles(cycles), len(cycles), len(cycles) - cycles.count('') - cycles.count(None))
+
+class FormType:
+    """Describes one kind of PO form for the generic save/load/patch handlers.
+
+    ``row_fields`` lists ``(json_key, column, codec)`` for the child rows, where
+    codec is ``'text'``, ``'json'`` or ``'cycles'`` (packed cycle states plus
+    the row's cycle_count/filled_count). ``admin_fields`` are header fields only
+    admins may change. All SQL is built once here.
+    """
+    def __init__(self, name, table, rows_table, fk_column, row_key, row_fields, admin_fields=None, key_separator='|'):
+        self.name = name
+        self.key_separator = key_separator
+        self.table = table
+        self.rows_table = rows_table
+        self.row_key = row_key
+        self.row_fields = row_fields
+        self.header_fields = dict(FORM_HEADER_FIELDS)
+        self.admin_fields = dict(admin_fields or {})
+        
+        self.row_columns = tuple(stored for _, column, codec in row_fields
+                                 for stored in ((column, 'cycle_count', 'filled_count') if codec == 'cycles' else (column,)))
+        header_columns = ', '.join((*self.header_fields.values(), *self.admin_fields.values()))
+        self.select_sql = (f'SELECT id, po_key, {header_columns}, last_modified_by, last_modified_at, version '
+                           f'FROM {table}')
+        self.load_sql = f'{self.select_sql} WHERE po_key = ?'
+        self.version_sql = f"SELECT id, version FROM {table} WHERE po_key = ?{' FOR UPDATE' if USE_POSTGRES else ''}"
+        self.fk_column = fk_column
+        self.rows_select_sql = (f'SELECT {fk_column} AS form_id, item_no, {", ".join(column for _, column, _ in row_fields)} '
+                                f'FROM {rows_table}')
+        self.rows_sql = f'{self.rows_select_sql} WHERE {fk_column} = ? ORDER BY id'
+        self.existing_rows_sql = (f'SELECT id, item_no, {", ".join(self.row_columns)} '
+                                  f'FROM {rows_table} WHERE {fk_column} = ? ORDER BY id')
+        self.update_row_sql = f'UPDATE {rows_table} SET {", ".join(f"{column} = ?" for column in self.row_columns)} WHERE id = ?'
+        self.insert_row_sql = (f'INSERT INTO {rows_table} ({fk_column}, item_no, {", ".join(self.row_columns)}) '
+                               f'VALUES (?, ?, {", ".join("?" for _ in self.row_columns)})')
+        self.delete_row_sql = f'DELETE FROM {rows_table} WHERE id = ?'
+        self._header_sql = {}
+    
+    def header_sql(self, columns, insert=False):
+        """UPDATE (by id) or INSERT statement for a given set of header columns, cached."""
+        key = (columns, insert)
+        if key not in self._header_sql:
+            if insert:
+                names = ('po_key',) + columns + ('last_modified_by', 'version')
+                sql = (f'INSERT INTO {self.table} ({", ".join(names)}) VALUES ({", ".join("?" for _ in names)}) '
+                       f'ON CONFLICT (po_key) DO NOTHING RETURNING id')
+            else:
+                assignments = ''.join(f'{column} = ?, ' for column in columns)
+                sql = (f'UPDATE {self.table} SET {assignments}last_modified_by = ?, '
+                       f'last_modified_at = CURRENT_TIMESTAMP, version = ? WHERE id = ?')
+            self._header_sql[key] = sql
+        return self._header_sql[key]
+    
+    def po_key(self, customer, bid, po, cr):
+        """The key the form's page saves it under for a PO."""
+        return self.key_separator.join((customer, bid, po, cr))
+    
+    def po_key_sql(self, alias):
+        """``po_key`` as an SQL expression over a pos row."""
+        return f" || '{self.key_separator}' || ".join(f'{alias}.{column}' for column in ('customer', 'bid', 'po', 'cr'))
+    
+    def row_values(self, row):
+        values = []
+        for key, _, codec in self.row_fields:
+            if codec == 'cycles':
+                values.extend(cycle_values(row.get(key, [])))
+            elif codec == 'json':
+                values.append(json.dumps(row.get(key, [])))
+            else:
+                values.append(row.get(key, ''))
+        return tuple(values)
+    
+    def row_payload(self, row):
+        payload = {self.row_key: row['item_no']}
+        for key, column, codec in self.row_fields:
+            if codec == 'cycles':
+                payload[key] = decode_cycles(row[column])
+            elif codec == 'json':
+                payload[key] = json.loads(row[column]) if row[column] else []
+            else:
+                payload[key] = row[column] or ''
+        return payload
+    
+    def payload(self, record, rows):
+        payload = {'exists': True}
+        for key, column in (*self.header_fields.items(), *self.admin_fields.items()):
+            payload[key] = record[column] or ''
+        payload.update({
+            'rows': [self.row_payload(row) for row in rows],
+            'version': record['version'],
+            'lastModifiedBy': record['last_modified_by'] or '',
+            'lastModifiedAt': record['last_modified_at'] or ''
+        })
+        return payload
+    
+    def read_header(self, data, partial=False):
+        """Header columns to write from a save body, or from a patch's ``header`` when ``partial``.
+
+        A full save writes every header field; admin-only fields are written
+        only for admins, so other users leave the stored values untouched.
+        """
+        source = (data.get('header') or {}) if partial else data
+        fields = dict(self.header_fields)
+        if current_user_is_admin():
+            fields.update(self.admin_fields)
+        return {column: str(source.get(key) or '').strip()
+                for key, column in fields.items() if not partial or key in source}
+
+ITEM_FIELDS = [
+    ('part', 'part_number', 'text'),
+    ('desc', 'part_description', 'text'),
+    ('rev', 'rev', 'text'),
+    ('qty', 'qty', 'text')
+]
+
+FORMS = {
+    'cr': FormType('cr', 'cr_forms', 'cr_form_rows', 'cr_form_id', 'key', ITEM_FIELDS + [
+        ('cycles', 'cycles', 'cycles'),
+        ('remarks', 'remarks', 'text')
+    ], admin_fields={'amendmentDetails': 'amendment_details'}),
+    'ped': FormType('ped', 'ped_forms', 'ped_form_rows', 'ped_form_id', 'key', ITEM_FIELDS + [
+        ('pedCycles', 'ped_cycles', 'cycles'),
+        ('notes', 'notes', 'json'),
+        ('remarks', 'remarks', 'text')
+    ], admin_fields={'amendmentDetails': 'amendment_details'}),
+    # The Lead page keys its forms customer_bid_po_cr; CR and PED use '|'.
+    'lead': FormType('lead', 'lead_forms', 'lead_form_rows', 'lead_form_id', 'itemNo', ITEM_FIELDS + [
+        ('customerRequiredDate', 'customer_required_date', 'text'),
+        ('standardLeadTime', 'standard_lead_time', 'text'),
+        ('gtnAgreedDate', 'gtn_agreed_date', 'text'),
+        ('remarks', 'remarks', 'text')
+    ], key_separator='_')
+}
+
+def sync_form_rows(db, form, form_id, rows, deleted_keys=(), replace=False, order=None):
+    """Bring a form's child rows in line with ``rows`` ([(item_no, values), ...], item numbers unique).
+
+    Rows are read back in id order. A full save (``replace``) lists every row
+    in page order and drops stored rows it does not list; a patch removes
+    ``deleted_keys``, appends new item numbers and may pass ``order``, the
+    page's item numbers in order. While that keeps the stored order, unchanged
+    rows are left alone, changed rows are updated in place and new ones
+    appended; otherwise all of the form's rows are rewritten in the new order.
+    """
+    existing = {}
+    stale_ids = []
+    for row in db.execute(form.existing_rows_sql, (form_id,)):
+        if row['item_no'] in existing:
+            stale_ids.append(row['id'])
+        else:
+            existing[row['item_no']] = row
+    
+    values_by_key = {item_no: values for item_no, values in rows if item_no}
+    if replace:
+        keys = list(values_by_key)
+    else:
+        removed = set(deleted_keys) - values_by_key.keys()
+        keys = [item_no for item_no in existing if item_no not in removed]
+        keys += [item_no for item_no in values_by_key if item_no not in existing]
+        if order:
+            # Rows the page does not know about (saved by someone else) stay at the end.
+            position = {item_no: i for i, item_no in enumerate(order)}
+            keys.sort(key=lambda item_no: position.get(item_no, len(position)))
+    
+    kept = set(keys)
+    stale_ids.extend(row['id'] for item_no, row in existing.items() if item_no not in kept)
+    in_place = [item_no for item_no in existing if item_no in kept] + [item_no for item_no in keys if item_no not in existing]
+    if keys != in_place:
+        db.executemany(form.delete_row_sql, [(row_id,) for row_id in stale_ids] +
+                       [(existing[item_no]['id'],) for item_no in keys if item_no in existing])
+        db.executemany(form.insert_row_sql, [
+            (form_id, item_no) + (values_by_key[item_no] if item_no in values_by_key else tuple(existing[item_no])[2:])
+            for item_no in keys
+        ])
+        return
+    
+    updates = []
+    inserts = []
+    for item_no, values in values_by_key.items():
+        current = existing.get(item_no)
+        if current is None:
+            inserts.append((form_id, item_no) + values)
+        elif tuple(current)[2:] != values:
+            updates.append(values + (current['id'],))
+    
+    if stale_ids:
+        db.executemany(form.delete_row_sql, [(row_id,) for row_id in stale_ids])
+    if updates:
+        db.executemany(form.update_row_sql, updates)
+    if inserts:
+        db.executemany(form.insert_row_sql, inserts)
+
+def first_duplicate(values):
+    seen = set()
+    for value in values:
+        if value in seen:
+            return value
+        seen.add(value)
+    return None
+
+def write_form_header(db, form, po_key, header, username):
+    """Write ``header`` ({column: value}) to a form, creating it if needed.
+
+    Returns ``(form_id, version)`` after bumping the form version. The caller
+    holds the SQLite write lock; on PostgreSQL the form row is locked with FOR
+    UPDATE instead, and a concurrent first save of the same form falls back to
+    updating the row the other one created.
+    """
+    columns = tuple(header)
+    current = db.execute(form.version_sql, (po_key,)).fetchone()
+    if not current:
+        created = db.execute(form.header_sql(columns, insert=True),
+                             (po_key,) + tuple(header.values()) + (username, 1)).fetchone()
+        if created:
+            return created['id'], 1
+        current = db.execute(form.version_sql, (po_key,)).fetchone()
+    version = current['version'] + 1
+    db.execute(form.header_sql(columns), tuple(header.values()) + (username, version, current['id']))
+    return current['id'], version
+
+def save_form(form, partial=False):
+    """Handle a full save (every row in ``rows``) or, with ``partial``, a delta patch."""
+    data = request.get_json()
+    
+    po_key = data.get('poKey', '').strip()
+    if not po_key:
+        return jsonify({'error': 'PO key required'}), 400
+    
+    header = form.read_header(data, partial)
+    rows = [(row.get(form.row_key, ''), form.row_values(row)) for row in data.get('rows', [])]
+    deleted_keys = data.get('deletedKeys', []) if partial else ()
+    order = data.get('order') if partial else None
+    if order is not None and not (isinstance(order, list) and all(isinstance(item_no, str) for item_no in order)):
+        return jsonify({'error': 'order must be a list of item numbers'}), 400
+    duplicate = first_duplicate(item_no for item_no, _ in rows if item_no)
+    if duplicate is None and order:
+        duplicate = first_duplicate(order)
+    if duplicate is not None:
+        return jsonify({'error': f'Duplicate item number: {duplicate}'}), 400
+    
+    username = session.get('username', 'unknown')
+    
+    db = get_db()
+    if partial and not (header or rows or deleted_keys or order):
+        # Nothing to change: report the stored version without bumping it or
+        # notifying the open pages.
+        record = db.execute(form.load_sql, (po_key,)).fetchone()
+        if record:
+            return jsonify({
+                'success': True,
+                'version': record['version'],
+                'etag': form_etag(record['id'], record['version']),
+                'lastModifiedBy': record['last_modified_by'] or '',
+                'lastModifiedAt': record['last_modified_at'] or ''
+            })
+    try:
+        db.execute('BEGIN IMMEDIATE')
+        
+        form_id, version = write_form_header(db, form, po_key, header, username)
+        sync_form_rows(db, form, form_id, rows, deleted_keys, replace=not partial, order=order)
+        
+        publish_form_change(db, form.name, po_key, version, username)
+        
+        db.commit()
+        
+        return jsonify({
+            'success': True,
+            'version': version,
+            'etag': form_etag(form_id, version),
+            'lastModifiedBy': username,
+            'lastModifiedAt': datetime.utcnow().isoformat()
+        })
+    except Exception as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 500
+
+def load_form(form):
+    po_key = request.args.get('poKey', '').strip()
+    if not po_key:
+        return jsonify({'error': 'PO key required'}), 400
+    
+    db = get_db()
+    try:
+        record = db.execute(form.load_sql, (po_key,)).fetchone()
+        
+        if not record:
+            return jsonify({'exists': False})
+        
+        etag = form_etag(record['id'], record['version'])
+        if request.if_none_match.contains(etag):
+            return not_modified(etag)
+        
+        return form_response(form.payload(record, db.execute(form.rows_sql, (record['id'],))), etag)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def read_forms(db, form, po_keys):
+    """Return ``{po_key: payload}`` for the stored forms of one type, two queries per chunk of keys."""
+    payloads = {}
+    for start in range(0, len(po_keys), FORMS_LOAD_CHUNK):
+        chunk = po_keys[start:start + FORMS_LOAD_CHUNK]
+        records = db.execute(f"{form.select_sql} WHERE po_key IN ({', '.join('?' for _ in chunk)})", chunk).fetchall()
+        if not records:
+            continue
+        rows_by_form = {record['id']: [] for record in records}
+        for row in db.execute(
+            f"{form.rows_select_sql} WHERE {form.fk_column} IN ({', '.join('?' for _ in records)}) "
+            f"ORDER BY {form.fk_column}, id",
+            [record['id'] for record in records]
+        ):
+            rows_by_form[row['form_id']].append(row)
+        for record in records:
+            payload = form.payload(record, rows_by_form[record['id']])
+            payload['etag'] = form_etag(record['id'], record['version'])
+            payloads[record['po_key']] = payload
+    return payloads
+
+def publish_form_change(db, form_type, po_key, version, username):
+    change_id = db.execute(
+        'INSERT INTO form_changes (form_type, po_key, version, changed_by) VALUES (?, ?, ?, ?) RETURNING id',
+        (form_type, po_key, version, username)
+    ).fetchone()['id']
+    db.execute('DELETE FROM form_changes WHERE id <= ?', (change_id - FORM_CHANGES_RETAINED,))
+
+# Every gunicorn worker tails form_changes from a single background thread and
+# fans new entries out to its own SSE subscribers, so the database sees one
+# cheap query per poll interval per worker no matter how many pages are open.
+# SQLite commits ids in order, so reading past the highest id seen is enough.
+# PostgreSQL hands out ids at insert, and a save can commit after one with a
+# higher id: ids skipped over are kept in _form_changes_gaps and asked for
+# again until they turn up or FORM_CHANGES_GAP_SECONDS pass (rolled-back saves
+# never do). Entries are numbered in the order this worker saw them ("seq"),
+# which is what the streams follow.
+_form_changes = deque(maxlen=1000)
+_form_changes_cond = threading.Condition()
+_form_changes_last_id = 0
+_form_changes_seq = 0
+_form_changes_gaps = {}  # id -> time.monotonic() when skipped, oldest first
+_form_changes_watcher = None
+_form_events_slots = threading.BoundedSemaphore(FORM_EVENTS_MAX_STREAMS) if FORM_EVENTS_MAX_STREAMS > 0 else None
+
+def track_form_change_gaps(last_id, change_ids):
+    """Forget the gaps in ``change_ids`` (ascending) and record the ids they skip past ``last_id``."""
+    now = time.monotonic()
+    for change_id in change_ids:
+        _form_changes_gaps.pop(change_id, None)
+        if change_id > last_id:
+            for missing in range(max(last_id + 1, change_id - FORM_CHANGES_MAX_GAPS), change_id):
+                _form_changes_gaps[missing] = now
+            last_id = change_id
+    while _form_changes_gaps and (
+        len(_form_changes_gaps) > FORM_CHANGES_MAX_GAPS
+        or next(iter(_form_changes_gaps.values())) < now - FORM_CHANGES_GAP_SECONDS
+    ):
+        del _form_changes_gaps[next(iter(_form_changes_gaps))]
+
+def _watch_form_changes():
+    global _form_changes_last_id, _form_changes_seq
+    db = None
+    while True:
+        gaps = list(_form_changes_gaps)
+        try:
+            db = db or connect_db()
+            changes = db.execute(
+                'SELECT id, form_type, po_key, version, changed_by FROM form_changes WHERE id > ?'
+                + (f" OR id IN ({', '.join('?' for _ in gaps)})" if gaps else '') + ' ORDER BY id',
+                (_form_changes_last_id, *gaps)
+            ).fetchall()
+        except (*DB_ERRORS, RuntimeError):
+            # Reconnect on the next poll, e.g. after a PostgreSQL restart.
+            if db is not None:
+                db.close()
+            db = None
+            changes = []
+        if USE_POSTGRES:
+            track_form_change_gaps(_form_changes_last_id, [change['id'] for change in changes])
+        if changes:
+            with _form_changes_cond:
+                for change in changes:
+                    _form_changes_seq += 1
+                    _form_changes.append(dict(change, seq=_form_changes_seq))
+                _form_changes_last_id = max(_form_changes_last_id, changes[-1]['id'])
+                _form_changes_cond.notify_all()
+        time.sleep(FORM_EVENTS_POLL_INTERVAL)
+
+def start_form_changes_watcher():
+    global _form_changes_watcher, _form_changes_last_id
+    with _form_changes_cond:
+        if _form_changes_watcher and _form_changes_watcher.is_alive():
+            return
+        db = get_db()
+        _form_changes_last_id = db.execute('SELECT COALESCE(MAX(id), 0) AS id FROM form_changes').fetchone()['id']
+        if USE_POSTGRES:
+            # Saves still in flight below the current highest id.
+            _form_changes_gaps.clear()
+            recent = [row['id'] for row in db.execute(
+                'SELECT id FROM form_changes WHERE id > ? ORDER BY id', (_form_changes_last_id - FORM_CHANGES_MAX_GAPS,)
+            )]
+            track_form_change_gaps(max(_form_changes_last_id - FORM_CHANGES_MAX_GAPS, 0), recent)
+        _form_changes_watcher = threading.Thread(target=_watch_form_changes, name='form-changes-watcher', daemon=True)
+        _form_changes_watcher.start()
+
+def form_changes_seq_after(change_id):
+    """The seq a stream resuming after form_changes id ``change_id`` starts from."""
+    with _form_changes_cond:
+        for change in _form_changes:
+            if change['id'] == change_id:
+                return change['seq']
+        # Not (or no longer) in the buffer: replay what is newer by id.
+        return min((change['seq'] for change in _form_changes if change['id'] > change_id),
+                   default=_form_changes_seq + 1) - 1
+
+# Password KDFs are deliberately slow and memory hungry. They run on a small
+# shared pool (hashlib releases the GIL) so a burst of logins cannot take every
+# CPU away from the request threads serving autosaves.
+_password_pool = ThreadPoolExecutor(max_workers=PASSWORD_HASH_THREADS, thread_name_prefix='password-hash')
+_password_hash_prefix = None
+
+def hash_password(password):
+    return _password_pool.submit(generate_password_hash, password, method=PASSWORD_HASH_METHOD).result()
+
+def verify_password(password_hash, password):
+    return _password_pool.submit(check_password_hash, password_hash, password).result()
+
+def password_needs_rehash(password_hash):
+    """True when a stored hash was made with other parameters than PASSWORD_HASH_METHOD."""
+    global _password_hash_prefix
+    if _password_hash_prefix is None:
+        # werkzeug fills in default parameters ("scrypt" -> "scrypt:32768:8:1").
+        _password_hash_prefix = hash_password('').split('$', 1)[0]
+    return password_hash.split('$', 1)[0] != _password_hash_prefix
+
+# Admin lookups are cached per user id for AUTH_CACHE_TTL seconds. Writes to
+# users call invalidate_user_permissions() after committing, which moves the
+# mtime of a marker file forward; every lookup stats it, so entries cached
+# under an older mtime are ignored in all worker processes, and a lookup that
+# raced with the write is not cached.
+_auth_cache = {}
+_auth_cache_lock = threading.Lock()
+
+def users_version_path():
+    return USERS_VERSION_PATH or f'{DATABASE}.users-version'
+
+def users_version():
+    try:
+        return os.stat(users_version_path()).st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+def invalidate_user_permissions():
+    path = users_version_path()
+    with _auth_cache_lock:
+        with open(path, 'a'):
+            pass
+        # Strictly later than the old mtime, even within one clock tick.
+        mtime = max(time.time_ns(), users_version() + 1)
+        os.utime(path, ns=(mtime, mtime))
+        _auth_cache.clear()
+
+def user_permissions(user_id):
+    """Return ``{'is_admin'}`` for a user, or None if the user no longer exists."""
+    now = time.monotonic()
+    version = users_version()
+    entry = _auth_cache.get(user_id)
+    if entry and entry[0] > now and entry[1] == version:
+        return entry[2]
+    
+    user = get_db().execute('SELECT is_admin FROM users WHERE id = ?', (user_id,)).fetchone()
+    permissions = {'is_admin': bool(user['is_admin'])} if user else None
+    with _auth_cache_lock:
+        if version == users_version():
+            _auth_cache[user_id] = (now + AUTH_CACHE_TTL, version, permissions)
+    return permissions
+
+def current_user_is_admin():
+    permissions = user_permissions(session['user_id']) if 'user_id' in session else None
+    return bool(permissions and permissions['is_admin'])
+
 def login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -179,10 +1507,7 @@ def admin_required(f):
     def decorated_function(*args, **kwargs):
         if 'user_id' not in session:
             return jsonify({'error': 'Unauthorized'}), 401
-        db = get_db()
-        user = db.execute('SELECT is_admin FROM users WHERE id = ?', (session['user_id'],)).fetchone()
-        db.close()
-        if not user or not user['is_admin']:
+        if not current_user_is_admin():
             return jsonify({'error': 'Admin access required'}), 403
         return f(*args, **kwargs)
     return decorated_function
@@ -206,9 +1531,13 @@ def login():
     
     db = get_db()
     user = db.execute('SELECT * FROM users WHERE username = ?', (username,)).fetchone()
-    db.close()
     
-    if user and check_password_hash(user['password_hash'], password):
+    if user and verify_password(user['password_hash'], password):
+        if password_needs_rehash(user['password_hash']):
+            db.execute('UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                       (hash_password(password), user['id'], user['password_hash']))
+            db.commit()
+        
         session['user_id'] = user['id']
         session['username'] = user['username']
         session['user_department'] = user['department']
@@ -241,7 +1570,7 @@ def get_session():
                 'username': session.get('username'),
                 'name': session.get('user_name'),
                 'department': session.get('user_department'),
-                'isAdmin': session.get('user_is_admin', False)
+                'isAdmin': current_user_is_admin()
             }
         })
     return jsonify({'loggedIn': False})
@@ -251,7 +1580,6 @@ def get_session():
 def get_users():
     db = get_db()
     users = db.execute('SELECT id, username, name, department, is_admin, lead_form_access FROM users ORDER BY id').fetchall()
-    db.close()
     
     return jsonify([{
         'id': user['id'],
@@ -280,17 +1608,15 @@ def create_user():
     
     existing = db.execute('SELECT id FROM users WHERE username = ?', (username,)).fetchone()
     if existing:
-        db.close()
         return jsonify({'error': 'Username already exists'}), 400
     
     try:
-        db.execute(
-            'INSERT INTO users (username, password_hash, name, department, is_admin, lead_form_access) VALUES (?, ?, ?, ?, ?, ?)',
-            (username, generate_password_hash(password), name, department, 1 if is_admin else 0, 1 if lead_form_access else 0)
-        )
+        user_id = db.execute(
+            'INSERT INTO users (username, password_hash, name, department, is_admin, lead_form_access) '
+            'VALUES (?, ?, ?, ?, ?, ?) RETURNING id',
+            (username, hash_password(password), name, department, 1 if is_admin else 0, 1 if lead_form_access else 0)
+        ).fetchone()['id']
         db.commit()
-        user_id = db.execute('SELECT last_insert_rowid() as id').fetchone()['id']
-        db.close()
         
         return jsonify({
             'success': True,
@@ -304,7 +1630,6 @@ def create_user():
             }
         })
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/users/<int:user_id>', methods=['PUT'])
@@ -324,20 +1649,18 @@ def update_user(user_id):
     
     user = db.execute('SELECT username, is_admin FROM users WHERE id = ?', (user_id,)).fetchone()
     if not user:
-        db.close()
         return jsonify({'error': 'User not found'}), 404
     
     if user['username'] == 'admin' and user['is_admin'] and not is_admin:
         admin_count = db.execute('SELECT COUNT(*) as count FROM users WHERE is_admin = 1').fetchone()['count']
         if admin_count <= 1:
-            db.close()
             return jsonify({'error': 'Cannot remove admin status from last admin user'}), 400
     
     try:
         if password:
             db.execute(
                 'UPDATE users SET name = ?, department = ?, is_admin = ?, lead_form_access = ?, password_hash = ? WHERE id = ?',
-                (name, department, 1 if is_admin else 0, 1 if lead_form_access else 0, generate_password_hash(password), user_id)
+                (name, department, 1 if is_admin else 0, 1 if lead_form_access else 0, hash_password(password), user_id)
             )
         else:
             db.execute(
@@ -345,7 +1668,7 @@ def update_user(user_id):
                 (name, department, 1 if is_admin else 0, 1 if lead_form_access else 0, user_id)
             )
         db.commit()
-        db.close()
+        invalidate_user_permissions()
         
         return jsonify({
             'success': True,
@@ -359,7 +1682,6 @@ def update_user(user_id):
             }
         })
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/users/<int:user_id>', methods=['DELETE'])
@@ -369,38 +1691,181 @@ def delete_user(user_id):
     
     user = db.execute('SELECT username, is_admin FROM users WHERE id = ?', (user_id,)).fetchone()
     if not user:
-        db.close()
         return jsonify({'error': 'User not found'}), 404
     
     if user['username'] == 'admin' and user['is_admin']:
-        db.close()
         return jsonify({'error': 'Cannot delete default admin user'}), 400
     
     admin_count = db.execute('SELECT COUNT(*) as count FROM users WHERE is_admin = 1').fetchone()['count']
     if user['is_admin'] and admin_count <= 1:
-        db.close()
         return jsonify({'error': 'Cannot delete last admin user'}), 400
     
     db.execute('DELETE FROM users WHERE id = ?', (user_id,))
     db.commit()
-    db.close()
+    invalidate_user_permissions()
     
     return jsonify({'success': True})
 
-@app.route('/api/pos', methods=['GET'])
-@login_required
-def get_pos():
-    db = get_db()
-    pos_list = db.execute('SELECT * FROM pos ORDER BY id DESC').fetchall()
-    db.close()
-    
-    return jsonify([{
+if USE_POSTGRES:
+    POS_SEARCH_CLAUSE = f"{POS_SEARCH_DOCUMENT} @@ to_tsquery('simple', ?)"
+else:
+    POS_SEARCH_CLAUSE = 'id IN (SELECT rowid FROM pos_fts WHERE pos_fts MATCH ?)'
+
+def pos_search_query(text):
+    # Every word must match as a prefix; quoting keeps FTS5 operators and
+    # punctuation in user input literal. On PostgreSQL a word with punctuation
+    # becomes a phrase of its parts, like an FTS5 quoted string.
+    if USE_POSTGRES:
+        phrases = [re.findall(r'[^\W_]+', term) for term in text.split()]
+        return ' & '.join('(' + ' <-> '.join(f"'{part}'" for part in parts) + ':*)' for parts in phrases if parts)
+    terms = ['"' + term.replace('"', '""') + '"*' for term in text.split()]
+    return ' '.join(terms)
+
+def read_pos_page_args():
+    limit = min(max(int(request.args.get('limit', POS_PAGE_SIZE)), 1), POS_MAX_PAGE_SIZE)
+    return limit, request.args.get('cursor', type=int), pos_search_query(request.args.get('q', ''))
+
+def fetch_pos_page(db, limit, cursor=None, query=''):
+    """Return ``(rows, total, next_cursor)`` for one page of POs, newest first."""
+    clauses, args = [], []
+    if query:
+        clauses.append(POS_SEARCH_CLAUSE)
+        args.append(query)
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    total = db.execute(f'SELECT COUNT(*) FROM pos{where}', args).fetchone()[0]
+    if cursor is not None:
+        clauses.append('id < ?')
+        args.append(cursor)
+    where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+    rows = db.execute(
+        f'SELECT id, customer, bid, po, cr FROM pos{where} ORDER BY id DESC LIMIT ?',
+        args + [limit + 1]
+    ).fetchall()
+    next_cursor = rows[limit - 1]['id'] if len(rows) > limit else None
+    return rows[:limit], total, next_cursor
+
+def po_payload(po):
+    return {
         'id': po['id'],
         'customer': po['customer'],
         'bid': po['bid'],
         'po': po['po'],
         'cr': po['cr']
-    } for po in pos_list])
+    }
+
+@app.route('/api/pos', methods=['GET'])
+@login_required
+def get_pos():
+    """One page of POs, newest first.
+
+    ``limit`` sets the page size and ``cursor`` (the previous page's
+    ``nextCursor``) continues after the last id returned; ``q`` filters by
+    words in customer, BID, PO or CR. ``total`` counts every matching PO.
+    """
+    try:
+        limit, cursor, query = read_pos_page_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    db = get_db()
+    pos_list, total, next_cursor = fetch_pos_page(db, limit, cursor, query)
+    return jsonify({
+        'pos': [po_payload(po) for po in pos_list],
+        'total': total,
+        'nextCursor': next_cursor
+    })
+
+# Per-form completion for a page of POs in one query. Forms are matched on
+# their type's po_key (see FormType.po_key); CR and PED sum the cycle counts kept on each row,
+# Lead counts its three date/lead-time cells per row.
+PO_SUMMARY_SQL = f'''
+    WITH page AS (
+        SELECT p.id, {FORMS['cr'].po_key_sql('p')} AS cr_key, {FORMS['ped'].po_key_sql('p')} AS ped_key,
+               {FORMS['lead'].po_key_sql('p')} AS lead_key
+        FROM pos p
+        WHERE p.id IN ({{ids}})
+    ),
+    cr AS (
+        SELECT f.po_key, f.last_modified_by, f.last_modified_at,
+               COUNT(r.id) AS row_count, COALESCE(SUM(r.cycle_count), 0) AS cells,
+               COALESCE(SUM(r.filled_count), 0) AS filled
+        FROM cr_forms f
+        JOIN page p ON p.cr_key = f.po_key
+        LEFT JOIN cr_form_rows r ON r.cr_form_id = f.id
+        GROUP BY f.id
+    ),
+    ped AS (
+        SELECT f.po_key, f.last_modified_by, f.last_modified_at,
+               COUNT(r.id) AS row_count, COALESCE(SUM(r.cycle_count), 0) AS cells,
+               COALESCE(SUM(r.filled_count), 0) AS filled
+        FROM ped_forms f
+        JOIN page p ON p.ped_key = f.po_key
+        LEFT JOIN ped_form_rows r ON r.ped_form_id = f.id
+        GROUP BY f.id
+    ),
+    lead AS (
+        SELECT f.po_key, f.last_modified_by, f.last_modified_at,
+               COUNT(r.id) AS row_count, COUNT(r.id) * 3 AS cells,
+               COALESCE(SUM(CASE WHEN COALESCE(r.customer_required_date, '') <> '' THEN 1 ELSE 0 END
+                          + CASE WHEN COALESCE(r.standard_lead_time, '') <> '' THEN 1 ELSE 0 END
+                          + CASE WHEN COALESCE(r.gtn_agreed_date, '') <> '' THEN 1 ELSE 0 END), 0) AS filled
+        FROM lead_forms f
+        JOIN page p ON p.lead_key = f.po_key
+        LEFT JOIN lead_form_rows r ON r.lead_form_id = f.id
+        GROUP BY f.id
+    )
+    SELECT p.id,
+           cr.po_key AS cr_exists, cr.row_count AS cr_rows, cr.cells AS cr_cells, cr.filled AS cr_filled,
+           cr.last_modified_by AS cr_by, cr.last_modified_at AS cr_at,
+           ped.po_key AS ped_exists, ped.row_count AS ped_rows, ped.cells AS ped_cells, ped.filled AS ped_filled,
+           ped.last_modified_by AS ped_by, ped.last_modified_at AS ped_at,
+           lead.po_key AS lead_exists, lead.row_count AS lead_rows, lead.cells AS lead_cells, lead.filled AS lead_filled,
+           lead.last_modified_by AS lead_by, lead.last_modified_at AS lead_at
+    FROM page p
+    LEFT JOIN cr ON cr.po_key = p.cr_key
+    LEFT JOIN ped ON ped.po_key = p.ped_key
+    LEFT JOIN lead ON lead.po_key = p.lead_key
+'''
+
+def form_summary(row, form_type):
+    if row[f'{form_type}_exists'] is None:
+        return {'exists': False, 'status': 'missing', 'rows': 0, 'filledCells': 0, 'totalCells': 0,
+                'filledRatio': 0.0, 'lastModifiedBy': '', 'lastModifiedAt': ''}
+    cells, filled = row[f'{form_type}_cells'], row[f'{form_type}_filled']
+    return {
+        'exists': True,
+        'status': 'complete' if cells and filled == cells else 'started',
+        'rows': row[f'{form_type}_rows'],
+        'filledCells': filled,
+        'totalCells': cells,
+        'filledRatio': round(filled / cells, 3) if cells else 0.0,
+        'lastModifiedBy': row[f'{form_type}_by'] or '',
+        'lastModifiedAt': row[f'{form_type}_at'] or ''
+    }
+
+@app.route('/api/pos/summary', methods=['GET'])
+@login_required
+def get_pos_summary():
+    """The ``/api/pos`` page (same parameters) with CR, PED and Lead form progress for each PO."""
+    try:
+        limit, cursor, query = read_pos_page_args()
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    
+    db = get_db()
+    pos_list, total, next_cursor = fetch_pos_page(db, limit, cursor, query)
+    summaries = {}
+    if pos_list:
+        sql = PO_SUMMARY_SQL.format(ids=', '.join('?' for _ in pos_list))
+        summaries = {row['id']: row for row in db.execute(sql, [po['id'] for po in pos_list])}
+    
+    return jsonify({
+        'pos': [dict(po_payload(po), forms={
+            form_type: form_summary(summaries[po['id']], form_type) for form_type in FORM_TYPES
+        }) for po in pos_list],
+        'total': total,
+        'nextCursor': next_cursor
+    })
 
 @app.route('/api/pos', methods=['POST'])
 @admin_required
@@ -416,13 +1881,11 @@ def create_po():
     
     db = get_db()
     try:
-        db.execute(
-            'INSERT INTO pos (customer, bid, po, cr) VALUES (?, ?, ?, ?)',
+        po_id = db.execute(
+            'INSERT INTO pos (customer, bid, po, cr) VALUES (?, ?, ?, ?) RETURNING id',
             (customer, bid, po, cr)
-        )
+        ).fetchone()['id']
         db.commit()
-        po_id = db.execute('SELECT last_insert_rowid() as id').fetchone()['id']
-        db.close()
         
         return jsonify({
             'success': True,
@@ -435,7 +1898,6 @@ def create_po():
             }
         })
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/pos/<int:po_id>', methods=['PUT'])
@@ -456,7 +1918,6 @@ def update_po(po_id):
         (customer, bid, po, cr, po_id)
     )
     db.commit()
-    db.close()
     
     return jsonify({
         'success': True,
@@ -475,694 +1936,1737 @@ def delete_po(po_id):
     db = get_db()
     db.execute('DELETE FROM pos WHERE id = ?', (po_id,))
     db.commit()
-    db.close()
     
     return jsonify({'success': True})
 
-@app.route('/api/backup', methods=['GET'])
-@admin_required
-def backup_data():
-    db = get_db()
-    users = db.execute('SELECT id, username, password_hash, name, department, is_admin FROM users').fetchall()
-    pos_list = db.execute('SELECT * FROM pos').fetchall()
-    db.close()
-    
-    return jsonify({
-        'meta': {
-            'app': 'GTN-ContractReview',
-            'version': '1.0',
-            'exportedAt': datetime.utcnow().isoformat(),
-            'by': session.get('username', '')
-        },
-        'users': [{
-            'username': u['username'],
-            'password_hash': u['password_hash'],
-            'name': u['name'],
-            'department': u['department'],
-            'isAdmin': bool(u['is_admin'])
-        } for u in users],
-        'pos': [{
-            'customer': p['customer'],
-            'bid': p['bid'],
-            'po': p['po'],
-            'cr': p['cr']
-        } for p in pos_list]
-    })
+# Parents before children, so foreign keys hold while a restore inserts in
+# file order. form_changes and export_jobs are per-deployment state and pos_fts
+# is rebuilt after a restore, so none of them are backed up.
+BACKUP_TABLES = ('users', 'pos') + tuple(table for name in FORM_TYPES
+                                         for table in (FORMS[name].table, FORMS[name].rows_table))
 
-@app.route('/api/restore', methods=['POST'])
-@admin_required
-def restore_data():
-    data = request.get_json()
-    
-    if not data or not isinstance(data, dict):
-        return jsonify({'error': 'Invalid data format'}), 400
+def backup_value(value):
+    # json.dumps fallback for BLOBs (packed cycles)
+    if isinstance(value, bytes):
+        return {'$b64': base64.b64encode(value).decode('ascii')}
+    raise TypeError(f'Cannot back up {type(value).__name__} values')
+
+def restore_value(value):
+    # json object_hook: turns the backup_value form back into bytes
+    if '$b64' in value:
+        if len(value) != 1 or not isinstance(value['$b64'], str):
+            raise ValueError('invalid value')
+        return base64.b64decode(value['$b64'], validate=True)
+    return value
+
+_backup_decoder = json.JSONDecoder(object_hook=restore_value)
+
+def backup_lines(db):
+    """Yield the NDJSON backup: a meta line, then per table a header line and
+    one JSON array per row, then an end line with the row counts."""
+    yield json.dumps({
+        'type': 'meta',
+        'app': 'GTN-ContractReview',
+        'version': '2.0',
+        'schema': schema_version(db),
+        'exportedAt': datetime.utcnow().isoformat(),
+        'by': session.get('username', '')
+    }) + '\n'
+    counts = {}
+    for table in BACKUP_TABLES:
+        columns = table_columns(db, table)
+        yield json.dumps({'type': 'table', 'name': table, 'columns': columns}) + '\n'
+        counts[table] = 0
+        # Read in keyset pages: psycopg2 buffers a whole result set client-side.
+        sql = f'SELECT {", ".join(columns)} FROM {table} WHERE id > ? ORDER BY id LIMIT {BACKUP_RESTORE_CHUNK}'
+        id_index = columns.index('id')
+        last_id = -2 ** 63
+        while True:
+            rows = db.execute(sql, (last_id,)).fetchall()
+            for row in rows:
+                yield json.dumps(tuple(row), ensure_ascii=False, default=backup_value) + '\n'
+            counts[table] += len(rows)
+            if len(rows) < BACKUP_RESTORE_CHUNK:
+                break
+            last_id = rows[-1][id_index]
+    yield json.dumps({'type': 'end', 'rows': counts}) + '\n'
+
+class BackupError(ValueError):
+    pass
+
+def read_backup_lines(stream):
+    """Split an uploaded backup (gzip or plain) into lines without reading it all."""
+    first = stream.read(BACKUP_CHUNK_SIZE)
+    decompressor = zlib.decompressobj(wbits=31) if first[:2] == b'\x1f\x8b' else None
+    pending = b''
+    chunk = first
+    while chunk:
+        if decompressor is not None:
+            try:
+                chunk = decompressor.decompress(chunk)
+            except zlib.error:
+                raise BackupError('Backup is not a valid gzip file')
+        lines = (pending + chunk).split(b'\n')
+        pending = lines.pop()
+        if len(pending) > BACKUP_MAX_LINE:
+            raise BackupError('Backup contains an overlong line')
+        yield from lines
+        chunk = stream.read(BACKUP_CHUNK_SIZE)
+    if decompressor is not None and not decompressor.eof:
+        raise BackupError('Backup is incomplete: truncated gzip stream')
+    if pending:
+        yield pending
+
+def backup_row_check(table, columns, version_offset):
+    """Return a function that validates (and fixes up) one row of a backup table."""
+    index = {column: i for i, column in enumerate(columns)}
+    if table == 'users':
+        if not {'username', 'password_hash', 'is_admin'} <= set(index):
+            raise ValueError('users must include username, password_hash and is_admin')
+        username, password_hash = index['username'], index['password_hash']
+        
+        def check(values):
+            if not values[username] or not isinstance(values[username], str):
+                raise ValueError('invalid user data: missing username')
+            if not isinstance(values[password_hash], str) or not values[password_hash].startswith(('pbkdf2:', 'scrypt:', 'bcrypt:')):
+                raise ValueError('invalid user data: password_hash must be a valid hash')
+        return check
+    
+    if table == 'pos':
+        if not {'customer', 'bid', 'po', 'cr'} <= set(index):
+            raise ValueError('invalid PO data: missing required fields')
+        fields = [index[field] for field in ('customer', 'bid', 'po', 'cr')]
+        
+        def check(values):
+            if any(not isinstance(values[i], str) for i in fields):
+                raise ValueError('invalid PO data: missing required fields')
+        return check
+    
+    # Cycles stored as JSON text by older versions are rewritten in the
+    # current BLOB form, which PostgreSQL's BYTEA columns require.
+    cycles = [index[column] for name in FORM_TYPES if FORMS[name].rows_table == table
+              for _, column, codec in FORMS[name].row_fields if codec == 'cycles' and column in index]
+    if cycles:
+        def check(values):
+            for i in cycles:
+                if isinstance(values[i], str):
+                    values[i] = CYCLES_JSON_MARKER + values[i].encode('utf-8') if values[i] else None
+        return check
+    
+    version = index.get('version')
+    if version_offset is None or version is None:
+        return None
+    
+    def check(values):
+        if not isinstance(values[version], int):
+            raise ValueError('invalid form version')
+        values[version] += version_offset
+    return check
+
+def restore_backup_stream(db, lines):
+    """Replace every backed-up table with the rows of an NDJSON backup.
+
+    Runs inside the caller's transaction. Rows are validated as they are parsed
+    and inserted with executemany in chunks of BACKUP_RESTORE_CHUNK; a
+    BackupError names the offending line. Form versions are shifted past the
+    ones being replaced, so ETags and cached workbooks never match old content.
+    """
+    schema = schema_version(db)
+    version_offsets = {FORMS[name].table: db.execute(f'SELECT COALESCE(MAX(version), 0) FROM {FORMS[name].table}').fetchone()[0]
+                       for name in FORM_TYPES}
+    for table in reversed(BACKUP_TABLES):
+        db.execute(f'DELETE FROM {table}')
+    
+    counts, batch = {}, []
+    table = sql = check = columns = ended = None
+    has_admin = False
+    
+    def flush():
+        if batch:
+            if USE_POSTGRES:
+                db.copy_rows(table, columns, batch)
+            else:
+                db.executemany(sql, batch)
+            batch.clear()
+    
+    for line_no, line in enumerate(lines, 1):
+        try:
+            if not line.strip():
+                continue
+            if ended is not None:
+                raise ValueError('data after end of backup')
+            try:
+                record = _backup_decoder.decode(line.decode('utf-8'))
+            except ValueError:
+                raise ValueError('not valid JSON')
+            
+            if isinstance(record, list):
+                if table is None:
+                    raise ValueError('row before table header')
+                if len(record) != len(columns):
+                    raise ValueError(f'expected {len(columns)} values')
+                values = record
+                if check is not None:
+                    check(values)
+                if table == 'users':
+                    has_admin = has_admin or bool(values[columns.index('is_admin')])
+                batch.append(values)
+                counts[table] += 1
+                if len(batch) >= BACKUP_RESTORE_CHUNK:
+                    flush()
+                continue
+            
+            kind = record.get('type') if isinstance(record, dict) else None
+            if line_no == 1:
+                if kind != 'meta' or record.get('app') != 'GTN-ContractReview':
+                    raise ValueError('not a GTN-ContractReview backup')
+                if record.get('schema') != schema:
+                    raise ValueError(f'backup schema {record.get("schema")} does not match database schema {schema}')
+            elif kind == 'table':
+                flush()
+                name = record.get('name')
+                if name not in BACKUP_TABLES:
+                    raise ValueError(f'unknown table {name!r}')
+                if name in counts:
+                    raise ValueError(f'table {name} appears twice')
+                known = set(table_columns(db, name))
+                columns = record.get('columns')
+                if not isinstance(columns, list) or not columns or len(set(columns)) != len(columns) \
+                        or not all(column in known for column in columns):
+                    raise ValueError(f'invalid columns for {name}')
+                table = name
+                counts[table] = 0
+                check = backup_row_check(table, columns, version_offsets.get(table))
+                sql = f'INSERT INTO {table} ({", ".join(columns)}) VALUES ({", ".join("?" for _ in columns)})'
+            elif kind == 'end':
+                flush()
+                ended = record.get('rows')
+                if ended != counts:
+                    raise ValueError('row counts do not match the backup; the file is incomplete')
+            else:
+                raise ValueError('unexpected record')
+        except (ValueError, TypeError) as e:
+            raise BackupError(f'Line {line_no}: {e}')
+        except DB_DATA_ERRORS as e:
+            raise BackupError(f'Line {line_no}: invalid {table} data: {e}')
+    
+    if ended is None:
+        raise BackupError('Backup is incomplete: missing end record')
+    missing = [name for name in BACKUP_TABLES if name not in counts]
+    if missing:
+        raise BackupError(f'Backup is missing tables: {", ".join(missing)}')
+    if not has_admin:
+        raise BackupError('Backup must contain at least one admin user')
+    return counts
+
+def restore_legacy_backup(db, data):
+    # Version 1.0 files: one JSON document with users and pos only.
+    if not data or not isinstance(data, dict):
+        raise BackupError('Invalid data format')
     
     if not data.get('users') or not isinstance(data['users'], list):
-        return jsonify({'error': 'Missing or invalid users array'}), 400
+        raise BackupError('Missing or invalid users array')
     
     if not data.get('pos') or not isinstance(data['pos'], list):
-        return jsonify({'error': 'Missing or invalid pos array'}), 400
+        raise BackupError('Missing or invalid pos array')
     
     for user in data['users']:
         if not all(key in user for key in ['username', 'password_hash', 'name', 'department']):
-            return jsonify({'error': 'Invalid user data: missing required fields'}), 400
+            raise BackupError('Invalid user data: missing required fields')
         if not user.get('password_hash') or not user['password_hash'].startswith(('pbkdf2:', 'scrypt:', 'bcrypt:')):
-            return jsonify({'error': 'Invalid user data: password_hash must be a valid hash'}), 400
+            raise BackupError('Invalid user data: password_hash must be a valid hash')
     
     has_admin = any(u.get('isAdmin') for u in data['users'])
     if not has_admin:
-        return jsonify({'error': 'Backup must contain at least one admin user'}), 400
+        raise BackupError('Backup must contain at least one admin user')
     
     for po in data['pos']:
         if not all(key in po for key in ['customer', 'bid', 'po', 'cr']):
-            return jsonify({'error': 'Invalid PO data: missing required fields'}), 400
+            raise BackupError('Invalid PO data: missing required fields')
+    
+    db.execute('DELETE FROM users')
+    db.execute('DELETE FROM pos')
+    db.executemany(
+        'INSERT INTO users (username, password_hash, name, department, is_admin) VALUES (?, ?, ?, ?, ?)',
+        [(user['username'], user['password_hash'], user['name'], user['department'], 1 if user.get('isAdmin') else 0)
+         for user in data['users']]
+    )
+    db.executemany(
+        'INSERT INTO pos (customer, bid, po, cr) VALUES (?, ?, ?, ?)',
+        [(po['customer'], po['bid'], po['po'], po['cr']) for po in data['pos']]
+    )
+    return {'users': len(data['users']), 'pos': len(data['pos'])}
+
+@app.route('/api/backup', methods=['GET'])
+@admin_required
+def backup_data():
+    # Rows are read from one snapshot and gzipped as they are produced, so
+    # memory stays flat however large the database is. stream_with_context
+    # keeps the request context alive, so get_db() in the generator returns the
+    # request's connection, which is only released once the response closes.
+    def generate():
+        db = get_db()
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        db.execute('BEGIN')
+        pending, size = [], 0
+        for line in backup_lines(db):
+            pending.append(line)
+            size += len(line)
+            if size >= BACKUP_CHUNK_SIZE:
+                yield compressor.compress(''.join(pending).encode('utf-8'))
+                pending, size = [], 0
+        db.commit()
+        yield compressor.compress(''.join(pending).encode('utf-8')) + compressor.flush()
     
+    filename = f'gtn-contract-review-backup-{datetime.now().strftime("%Y%m%d-%H%M%S")}.ndjson.gz'
+    response = Response(stream_with_context(generate()), mimetype='application/gzip')
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@app.route('/api/restore', methods=['POST'])
+@admin_required
+def restore_data():
+    """Restore a backup from /api/backup, sent as the raw (gzipped) request body.
+
+    JSON bodies in the old users/pos format are still accepted.
+    """
     db = get_db()
     try:
-        db.execute('BEGIN TRANSACTION')
-        
-        db.execute('DELETE FROM users')
-        db.execute('DELETE FROM pos')
-        
-        for user in data['users']:
-            db.execute(
-                'INSERT INTO users (username, password_hash, name, department, is_admin) VALUES (?, ?, ?, ?, ?)',
-                (user['username'], user['password_hash'], 
-                 user['name'], user['department'], 1 if user.get('isAdmin') else 0)
-            )
-        
-        for po in data['pos']:
-            db.execute(
-                'INSERT INTO pos (customer, bid, po, cr) VALUES (?, ?, ?, ?)',
-                (po['customer'], po['bid'], po['po'], po['cr'])
-            )
+        data = request.get_json(silent=True) if request.is_json else None
+        db.execute('BEGIN IMMEDIATE')
+        if not USE_POSTGRES:
+            # Maintaining the PO search index row by row is several times slower
+            # than rebuilding it once; the triggers come back before commit.
+            for trigger in ('pos_fts_insert', 'pos_fts_delete', 'pos_fts_update'):
+                db.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        if request.is_json:
+            counts = restore_legacy_backup(db, data)
+        else:
+            counts = restore_backup_stream(db, read_backup_lines(request.stream))
+        if USE_POSTGRES:
+            # Restored rows bring their own ids; move the identity sequences past them.
+            for table in BACKUP_TABLES:
+                db.execute(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                           f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)")
+        else:
+            migration_pos_search(db)
         
         db.commit()
-        db.close()
-        return jsonify({'success': True})
+        invalidate_user_permissions()
+        return jsonify({'success': True, 'rows': counts})
+    except BackupError as e:
+        db.rollback()
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         db.rollback()
-        db.close()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/cr-form/save', methods=['POST'])
-@login_required
-def save_cr_form():
-    import json
-    data = request.get_json()
-    
-    po_key = data.get('poKey', '').strip()
-    if not po_key:
-        return jsonify({'error': 'PO key required'}), 400
-    
-    customer = data.get('customer', '').strip()
-    bid = data.get('bid', '').strip()
-    po = data.get('po', '').strip()
-    cr = data.get('cr', '').strip()
-    record_no = data.get('recordNo', '').strip()
-    record_date = data.get('recordDate', '').strip()
-    rows = data.get('rows', [])
-    
-    username = session.get('username', 'unknown')
-    is_admin = session.get('user_is_admin', False)
-    
-    db = get_db()
+def list_snapshots():
+    """Snapshots in SNAPSHOT_DIR, newest first."""
+    snapshots = []
+    for path in glob.glob(os.path.join(SNAPSHOT_DIR, 'snapshot-*.db')):
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        snapshots.append({
+            'name': os.path.basename(path),
+            'size': stat.st_size,
+            'createdAt': datetime.fromtimestamp(stat.st_mtime, timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+            'mtime': stat.st_mtime
+        })
+    snapshots.sort(key=lambda snapshot: (snapshot['mtime'], snapshot['name']), reverse=True)
+    return snapshots
+
+@contextmanager
+def snapshot_lock(blocking=True):
+    # Serialises snapshots across worker processes; yields False if another
+    # process holds the lock and blocking is off.
+    import fcntl
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    with open(os.path.join(SNAPSHOT_DIR, '.lock'), 'w') as lock_file:
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def take_snapshot(keep=()):
+    """Copy the live database into SNAPSHOT_DIR with the online backup API.
+
+    In WAL mode the copy runs in SNAPSHOT_PAGES steps inside one read
+    transaction: every step sees the same snapshot and writers carry on
+    meanwhile. Without WAL a read transaction would block writers for the whole
+    copy, so it is done in a single step instead. The file only appears under
+    its final name once complete; older snapshots beyond SNAPSHOT_RETAIN are
+    removed, apart from those named in ``keep``.
+    """
+    if USE_POSTGRES:
+        raise BackupError('Snapshots are only available with SQLite; use pg_dump for PostgreSQL')
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%d-%H%M%S')
+    name = f'snapshot-{stamp}.db'
+    suffix = 1
+    while os.path.exists(os.path.join(SNAPSHOT_DIR, name)):
+        name = f'snapshot-{stamp}-{suffix}.db'
+        suffix += 1
+    path = os.path.join(SNAPSHOT_DIR, name)
+    
+    source = connect_db()
+    target = sqlite3.connect(path + '.tmp')
     try:
-        db.execute('BEGIN TRANSACTION')
-        
-        cursor = db.execute('SELECT id, amendment_details FROM cr_forms WHERE po_key = ?', (po_key,))
-        form = cursor.fetchone()
-        
-        if is_admin:
-            amendment_details = data.get('amendmentDetails', '').strip()
-        else:
-            amendment_details = form['amendment_details'] if form else ''
-        
-        if form:
-            form_id = form['id']
-            db.execute('''
-                UPDATE cr_forms 
-                SET customer = ?, bid = ?, po = ?, cr = ?, record_no = ?, record_date = ?, amendment_details = ?,
-                    last_modified_by = ?, last_modified_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (customer, bid, po, cr, record_no, record_date, amendment_details, username, form_id))
-            
-            db.execute('DELETE FROM cr_form_rows WHERE cr_form_id = ?', (form_id,))
+        if source.execute('PRAGMA journal_mode').fetchone()[0] == 'wal':
+            source.execute('BEGIN')
+            source.execute('SELECT COUNT(*) FROM sqlite_master').fetchone()
+            source.backup(target, pages=SNAPSHOT_PAGES)
+            source.rollback()
         else:
-            db.execute('''
-                INSERT INTO cr_forms (po_key, customer, bid, po, cr, record_no, record_date, amendment_details, last_modified_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (po_key, customer, bid, po, cr, record_no, record_date, amendment_details, username))
-            form_id = db.execute('SELECT last_insert_rowid() as id').fetchone()['id']
-        
-        for row in rows:
-            item_no = row.get('key', '')
-            if not item_no:
+            source.backup(target)
+        # A standalone file, without -wal/-shm companions.
+        target.execute('PRAGMA journal_mode = DELETE')
+        target.close()
+        os.replace(path + '.tmp', path)
+    except Exception:
+        target.close()
+        if os.path.exists(path + '.tmp'):
+            os.remove(path + '.tmp')
+        raise
+    finally:
+        source.close()
+    
+    if SNAPSHOT_RETAIN > 0:
+        for snapshot in list_snapshots()[SNAPSHOT_RETAIN:]:
+            if snapshot['name'] in keep:
                 continue
-            
-            cycles_json = json.dumps(row.get('cycles', []))
-            
-            db.execute('''
-                INSERT INTO cr_form_rows 
-                (cr_form_id, item_no, part_number, part_description, rev, qty, cycles, remarks)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                form_id,
-                item_no,
-                row.get('part', ''),
-                row.get('desc', ''),
-                row.get('rev', ''),
-                row.get('qty', ''),
-                cycles_json,
-                row.get('remarks', '')
-            ))
+            try:
+                os.remove(os.path.join(SNAPSHOT_DIR, snapshot['name']))
+            except FileNotFoundError:
+                pass
+    return next(snapshot for snapshot in list_snapshots() if snapshot['name'] == name)
+
+def restore_snapshot(name):
+    """Replace the live database with a snapshot; returns the safety snapshot
+    taken of the current data first.
+
+    The snapshot is copied to a scratch file, checked and brought up to the
+    current schema there, then copied over the live database in one backup
+    step, which is a single write transaction: every connection sees either
+    the old or the new data. Renaming a file over the database instead would
+    leave open connections writing to the old file while sharing its -wal.
+    Per-deployment state (form_changes, export_jobs) is kept, and form
+    versions are shifted past the current ones so ETags and cached workbooks
+    never match restored content.
+    """
+    if USE_POSTGRES:
+        raise BackupError('Snapshots are only available with SQLite; use pg_restore for PostgreSQL')
+    path = os.path.join(SNAPSHOT_DIR, name)
+    if name not in {snapshot['name'] for snapshot in list_snapshots()}:
+        raise FileNotFoundError(name)
+    
+    work_path = os.path.join(SNAPSHOT_DIR, f'.restore-{secrets.token_hex(4)}.db')
+    work = sqlite3.connect(work_path)
+    work.row_factory = sqlite3.Row
+    live = connect_db()
+    try:
+        snapshot = sqlite3.connect(f'file:{os.path.abspath(path)}?mode=ro', uri=True)
+        try:
+            snapshot.backup(work)
+            ok = work.execute('PRAGMA quick_check').fetchone()[0] == 'ok'
+        except sqlite3.DatabaseError:
+            ok = False
+        finally:
+            snapshot.close()
+        if not ok:
+            raise BackupError('Snapshot is not a valid database')
+        schema = work.execute('PRAGMA user_version').fetchone()[0]
+        if schema > len(MIGRATIONS):
+            raise BackupError(f'Snapshot schema {schema} is newer than this application')
+        migrate_db(work)
+        if not work.execute('SELECT 1 FROM users WHERE is_admin = 1 LIMIT 1').fetchone():
+            raise BackupError('Snapshot must contain at least one admin user')
         
-        db.commit()
-        db.close()
+        work.execute('BEGIN IMMEDIATE')
+        for form_name in FORM_TYPES:
+            table = FORMS[form_name].table
+            offset = live.execute(f'SELECT COALESCE(MAX(version), 0) FROM {table}').fetchone()[0]
+            work.execute(f'UPDATE {table} SET version = version + ?', (offset,))
+        for table in ('form_changes', 'export_jobs'):
+            work.execute(f'DELETE FROM {table}')
+            rows = live.execute(f'SELECT * FROM {table}').fetchall()
+            if rows:
+                work.executemany(f'INSERT INTO {table} ({", ".join(rows[0].keys())}) '
+                                 f'VALUES ({", ".join("?" for _ in rows[0].keys())})', rows)
+        work.commit()
         
-        return jsonify({
-            'success': True,
-            'lastModifiedBy': username,
-            'lastModifiedAt': datetime.utcnow().isoformat()
-        })
+        # Pruning must not remove the snapshot being restored.
+        safety = take_snapshot(keep=(name,))
+        work.backup(live)
+    finally:
+        work.close()
+        live.close()
+        os.remove(work_path)
+    
+    invalidate_user_permissions()
+    return safety
+
+_snapshot_scheduler = None
+_snapshot_scheduler_lock = threading.Lock()
+
+def run_snapshot_scheduler():
+    # Every worker process runs one of these; the lock and the age check make
+    # sure only one snapshot is taken per interval.
+    while True:
+        snapshots = list_snapshots()
+        due = (snapshots[0]['mtime'] if snapshots else 0) + SNAPSHOT_INTERVAL - time.time()
+        if due <= 0:
+            try:
+                with snapshot_lock(blocking=False) as locked:
+                    snapshots = list_snapshots()
+                    if locked and (not snapshots or snapshots[0]['mtime'] + SNAPSHOT_INTERVAL <= time.time()):
+                        take_snapshot()
+            except Exception as e:
+                app.logger.error('Scheduled snapshot failed: %s', e)
+            due = SNAPSHOT_INTERVAL
+        time.sleep(min(max(due, 1), SNAPSHOT_INTERVAL))
+
+@app.before_request
+def start_snapshot_scheduler():
+    global _snapshot_scheduler
+    if SNAPSHOT_INTERVAL <= 0 or USE_POSTGRES or _snapshot_scheduler is not None:
+        return
+    with _snapshot_scheduler_lock:
+        if _snapshot_scheduler is None:
+            _snapshot_scheduler = threading.Thread(target=run_snapshot_scheduler, name='snapshot-scheduler', daemon=True)
+            _snapshot_scheduler.start()
+
+def snapshot_payload(snapshot):
+    return {
+        'name': snapshot['name'],
+        'size': snapshot['size'],
+        'createdAt': snapshot['createdAt'],
+        'downloadUrl': f"/api/snapshots/{snapshot['name']}/download"
+    }
+
+@app.route('/api/snapshots', methods=['GET'])
+@admin_required
+def get_snapshots():
+    return jsonify({'snapshots': [snapshot_payload(snapshot) for snapshot in list_snapshots()]})
+
+@app.route('/api/snapshots', methods=['POST'])
+@admin_required
+def create_snapshot():
+    try:
+        with snapshot_lock():
+            snapshot = take_snapshot()
+    except BackupError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        db.rollback()
-        db.close()
         return jsonify({'error': str(e)}), 500
+    return jsonify(snapshot_payload(snapshot)), 201
 
-@app.route('/api/cr-form/load', methods=['GET'])
-@login_required
-def load_cr_form():
-    import json
-    po_key = request.args.get('poKey', '').strip()
-    if not po_key:
-        return jsonify({'error': 'PO key required'}), 400
-    
-    db = get_db()
+@app.route('/api/snapshots/<name>/download', methods=['GET'])
+@admin_required
+def download_snapshot(name):
+    if name not in {snapshot['name'] for snapshot in list_snapshots()}:
+        return jsonify({'error': 'Snapshot not found'}), 404
+    return send_from_directory(os.path.abspath(SNAPSHOT_DIR), name, as_attachment=True)
+
+@app.route('/api/snapshots/<name>/restore', methods=['POST'])
+@admin_required
+def restore_snapshot_route(name):
     try:
-        cursor = db.execute('''
-            SELECT id, customer, bid, po, cr, record_no, record_date, amendment_details, last_modified_by, last_modified_at
-            FROM cr_forms
-            WHERE po_key = ?
-        ''', (po_key,))
-        form = cursor.fetchone()
-        
-        if not form:
-            db.close()
-            return jsonify({'exists': False})
-        
-        form_id = form['id']
-        
-        rows_cursor = db.execute('''
-            SELECT item_no, part_number, part_description, rev, qty, cycles, remarks
-            FROM cr_form_rows
-            WHERE cr_form_id = ?
-            ORDER BY id
-        ''', (form_id,))
-        
-        rows = []
-        for row in rows_cursor.fetchall():
-            cycles = json.loads(row['cycles']) if row['cycles'] else []
-            rows.append({
-                'key': row['item_no'],
-                'part': row['part_number'] or '',
-                'desc': row['part_description'] or '',
-                'rev': row['rev'] or '',
-                'qty': row['qty'] or '',
-                'cycles': cycles,
-                'remarks': row['remarks'] or ''
-            })
-        
-        db.close()
-        
-        return jsonify({
-            'exists': True,
-            'customer': form['customer'] or '',
-            'bid': form['bid'] or '',
-            'po': form['po'] or '',
-            'cr': form['cr'] or '',
-            'recordNo': form['record_no'] or '',
-            'recordDate': form['record_date'] or '',
-            'amendmentDetails': form['amendment_details'] or '',
-            'rows': rows,
-            'lastModifiedBy': form['last_modified_by'] or '',
-            'lastModifiedAt': form['last_modified_at'] or ''
-        })
+        with snapshot_lock():
+            safety = restore_snapshot(name)
+    except FileNotFoundError:
+        return jsonify({'error': 'Snapshot not found'}), 404
+    except BackupError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
-        db.close()
         return jsonify({'error': str(e)}), 500
+    return jsonify({'success': True, 'restored': name, 'safetySnapshot': snapshot_payload(safety)})
+
+@app.cli.command('snapshot')
+def snapshot_command():
+    """Take a snapshot of the database."""
+    try:
+        with snapshot_lock():
+            snapshot = take_snapshot()
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{snapshot['name']} ({snapshot['size']} bytes)")
+
+@app.cli.command('snapshots')
+def snapshots_command():
+    """List snapshots, newest first."""
+    for snapshot in list_snapshots():
+        click.echo(f"{snapshot['name']}  {snapshot['createdAt']}  {snapshot['size']} bytes")
+
+@app.cli.command('restore-snapshot')
+@click.argument('name')
+def restore_snapshot_command(name):
+    """Replace the database with snapshot NAME."""
+    try:
+        with snapshot_lock():
+            safety = restore_snapshot(name)
+    except FileNotFoundError:
+        raise click.ClickException(f'Snapshot {name} not found')
+    except BackupError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Restored {name}; previous data saved as {safety['name']}")
+
+@app.route('/api/cr-form/save', methods=['POST'])
+@login_required
+def save_cr_form():
+    return save_form(FORMS['cr'])
+
+@app.route('/api/cr-form/load', methods=['GET'])
+@login_required
+def load_cr_form():
+    return load_form(FORMS['cr'])
+
+@app.route('/api/cr-form/patch', methods=['POST'])
+@login_required
+def patch_cr_form():
+    return save_form(FORMS['cr'], partial=True)
 
 @app.route('/api/ped-form/save', methods=['POST'])
 @login_required
 def save_ped_form():
-    import json
-    data = request.get_json()
-    
-    po_key = data.get('poKey', '').strip()
-    if not po_key:
-        return jsonify({'error': 'PO key required'}), 400
-    
-    customer = data.get('customer', '').strip()
-    bid = data.get('bid', '').strip()
-    po = data.get('po', '').strip()
-    cr = data.get('cr', '').strip()
-    record_no = data.get('recordNo', '').strip()
-    record_date = data.get('recordDate', '').strip()
-    rows = data.get('rows', [])
-    
-    username = session.get('username', 'unknown')
-    is_admin = session.get('user_is_admin', False)
+    return save_form(FORMS['ped'])
+
+@app.route('/api/ped-form/load', methods=['GET'])
+@login_required
+def load_ped_form():
+    return load_form(FORMS['ped'])
+
+@app.route('/api/ped-form/patch', methods=['POST'])
+@login_required
+def patch_ped_form():
+    return save_form(FORMS['ped'], partial=True)
+
+@app.route('/api/lead-form/save', methods=['POST'])
+@login_required
+def save_lead_form():
+    return save_form(FORMS['lead'])
+
+@app.route('/api/lead-form/load', methods=['GET'])
+@login_required
+def load_lead_form():
+    return load_form(FORMS['lead'])
+
+@app.route('/api/lead-form/patch', methods=['POST'])
+@login_required
+def patch_lead_form():
+    return save_form(FORMS['lead'], partial=True)
+
+@app.route('/api/forms/load', methods=['GET', 'POST'])
+@login_required
+def load_forms():
+    """Load several form types for one or more POs from a single snapshot.
+
+    GET takes repeated ``poId`` (or ``poKey`` as ``customer|bid|po|cr``) and
+    ``types=cr,ped,lead``; POST takes ``{"poIds": [...], "poKeys": [...],
+    "types": [...]}`` for long lists. Each type is looked up under its own key
+    format (see FormType.po_key), and the result is keyed by the id or key as
+    sent. Forms that do not exist come back as ``{"exists": false}``.
+    """
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        po_ids = data.get('poIds') or []
+        po_keys = data.get('poKeys') or []
+        types = data.get('types') or list(FORM_TYPES)
+    else:
+        po_ids = request.args.getlist('poId')
+        po_keys = request.args.getlist('poKey')
+        types = request.args.get('types', ','.join(FORM_TYPES)).split(',')
+    
+    po_ids = list(dict.fromkeys(str(po_id).strip() for po_id in po_ids if str(po_id).strip()))
+    po_keys = list(dict.fromkeys(str(key).strip() for key in po_keys if str(key).strip()))
+    types = list(dict.fromkeys(str(name).strip() for name in types if str(name).strip()))
+    if not po_ids and not po_keys:
+        return jsonify({'error': 'PO id or key required'}), 400
+    if len(po_ids) + len(po_keys) > FORMS_LOAD_MAX_KEYS:
+        return jsonify({'error': f'At most {FORMS_LOAD_MAX_KEYS} POs per request'}), 400
+    if not all(po_id.isdigit() for po_id in po_ids):
+        return jsonify({'error': 'Invalid PO id'}), 400
+    # customer|bid|po|cr, the CR/PED key; the other types' keys are built from the parts.
+    pos_parts = {}
+    for po_key in po_keys:
+        parts = po_key.split('|')
+        if len(parts) != 4:
+            return jsonify({'error': f'Invalid PO key: {po_key}'}), 400
+        pos_parts[po_key] = parts
+    unknown = [name for name in types if name not in FORMS]
+    if unknown:
+        return jsonify({'error': f'Unknown form type: {unknown[0]}'}), 400
     
     db = get_db()
     try:
-        db.execute('BEGIN TRANSACTION')
-        
-        cursor = db.execute('SELECT id, amendment_details FROM ped_forms WHERE po_key = ?', (po_key,))
-        form = cursor.fetchone()
-        
-        if is_admin:
-            amendment_details = data.get('amendmentDetails', '').strip()
-        else:
-            amendment_details = form['amendment_details'] if form else ''
-        
-        if form:
-            form_id = form['id']
-            db.execute('''
-                UPDATE ped_forms 
-                SET customer = ?, bid = ?, po = ?, cr = ?, record_no = ?, record_date = ?, amendment_details = ?,
-                    last_modified_by = ?, last_modified_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (customer, bid, po, cr, record_no, record_date, amendment_details, username, form_id))
-            
-            db.execute('DELETE FROM ped_form_rows WHERE ped_form_id = ?', (form_id,))
-        else:
-            db.execute('''
-                INSERT INTO ped_forms (po_key, customer, bid, po, cr, record_no, record_date, amendment_details, last_modified_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (po_key, customer, bid, po, cr, record_no, record_date, amendment_details, username))
-            form_id = db.execute('SELECT last_insert_rowid() as id').fetchone()['id']
-        
-        for row in rows:
-            item_no = row.get('key', '')
-            if not item_no:
-                continue
-            
-            ped_cycles_json = json.dumps(row.get('pedCycles', []))
-            notes_json = json.dumps(row.get('notes', []))
-            
-            db.execute('''
-                INSERT INTO ped_form_rows 
-                (ped_form_id, item_no, part_number, part_description, rev, qty, ped_cycles, notes, remarks)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                form_id,
-                item_no,
-                row.get('part', ''),
-                row.get('desc', ''),
-                row.get('rev', ''),
-                row.get('qty', ''),
-                ped_cycles_json,
-                notes_json,
-                row.get('remarks', '')
-            ))
-        
+        # One read transaction, so every form comes from the same WAL snapshot
+        # even while saves commit in between the queries.
+        db.execute('BEGIN')
+        if po_ids:
+            found = {
+                str(row['id']): [row['customer'], row['bid'], row['po'], row['cr']]
+                for row in db.execute(
+                    f"SELECT id, customer, bid, po, cr FROM pos WHERE id IN ({', '.join('?' for _ in po_ids)})",
+                    [int(po_id) for po_id in po_ids]
+                )
+            }
+            missing = [po_id for po_id in po_ids if po_id not in found]
+            if missing:
+                db.rollback()
+                return jsonify({'error': f'PO not found: {missing[0]}'}), 404
+            pos_parts = {**{po_id: found[po_id] for po_id in po_ids}, **pos_parts}
+        forms = {label: {} for label in pos_parts}
+        for name in types:
+            form = FORMS[name]
+            keys = {label: form.po_key(*parts) for label, parts in pos_parts.items()}
+            payloads = read_forms(db, form, list(dict.fromkeys(keys.values())))
+            for label, key in keys.items():
+                forms[label][name] = payloads.get(key, {'exists': False})
         db.commit()
-        db.close()
-        
-        return jsonify({
-            'success': True,
-            'lastModifiedBy': username,
-            'lastModifiedAt': datetime.utcnow().isoformat()
-        })
     except Exception as e:
         db.rollback()
-        db.close()
         return jsonify({'error': str(e)}), 500
+    
+    return jsonify({'forms': forms})
 
-@app.route('/api/ped-form/load', methods=['GET'])
+@app.route('/api/form-events', methods=['GET'])
 @login_required
-def load_ped_form():
-    import json
+def form_events():
+    form_type = request.args.get('type', '').strip()
     po_key = request.args.get('poKey', '').strip()
+    if form_type not in FORM_TYPES:
+        return jsonify({'error': 'Invalid form type'}), 400
     if not po_key:
         return jsonify({'error': 'PO key required'}), 400
     
-    db = get_db()
+    if _form_events_slots is None or not _form_events_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many open form event streams'})
+        response.status_code = 503
+        response.headers['Retry-After'] = str(FORM_EVENTS_STREAM_SECONDS)
+        return response
     try:
-        cursor = db.execute('''
-            SELECT id, customer, bid, po, cr, record_no, record_date, amendment_details, last_modified_by, last_modified_at
-            FROM ped_forms
-            WHERE po_key = ?
-        ''', (po_key,))
-        form = cursor.fetchone()
+        start_form_changes_watcher()
+    except Exception:
+        _form_events_slots.release()
+        raise
+    
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    last_seq = form_changes_seq_after(int(last_event_id)) if last_event_id.isdigit() else _form_changes_seq
+    
+    def stream(last_seq):
+        deadline = time.monotonic() + FORM_EVENTS_STREAM_SECONDS
+        yield 'retry: 1000\n\n'
+        while time.monotonic() < deadline:
+            with _form_changes_cond:
+                if _form_changes_seq <= last_seq:
+                    _form_changes_cond.wait(timeout=min(15, max(deadline - time.monotonic(), 0)))
+                pending = [c for c in _form_changes if c['seq'] > last_seq]
+            if not pending:
+                yield ': keep-alive\n\n'
+                continue
+            for change in pending:
+                last_seq = change['seq']
+                if change['form_type'] == form_type and change['po_key'] == po_key:
+                    payload = json.dumps({'version': change['version'], 'by': change['changed_by'] or ''})
+                    yield f"id: {change['id']}\nevent: change\ndata: {payload}\n\n"
+    
+    response = Response(stream(last_seq), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # The server closes the body when the stream ends or the client goes away.
+    response.call_on_close(_form_events_slots.release)
+    return response
+
+CR_TEMPLATES = {
+    'CR_1': 'attached_assets/CR_1762338481711.xlsx',
+    'CR_2': 'attached_assets/CR 2_1762338481710.xlsx',
+    'CR_3': 'attached_assets/CR 3_1762338481711.xlsx'
+}
+
+CR_LOGO_PATH = 'attached_assets/GTN_LOGO_1762400078631.png'
+
+# Bump when render_cr_workbook output changes so cached workbooks are redone.
+CR_RENDER_VERSION = 1
+
+_cr_template_cache = {}
+_cr_template_lock = threading.RLock()
+
+def build_merged_cell_map(ws):
+    merged_map = {}
+    for merged_range in ws.merged_cells.ranges:
+        min_row, min_col = merged_range.min_row, merged_range.min_col
+        for row in range(merged_range.min_row, merged_range.max_row + 1):
+            for col in range(merged_range.min_col, merged_range.max_col + 1):
+                merged_map[(row, col)] = (min_row, min_col)
+    return merged_map
+
+def write_cell(ws, row, col, value, merged_map):
+    if (row, col) in merged_map:
+        anchor_row, anchor_col = merged_map[(row, col)]
+        cell = ws.cell(row=anchor_row, column=anchor_col)
+        cell.value = value
+    else:
+        ws.cell(row=row, column=col, value=value)
+
+def _cached_asset(key, path, parse):
+    mtime = os.path.getmtime(path)
+    with _cr_template_lock:
+        cached = _cr_template_cache.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, parse(path))
+            _cr_template_cache[key] = cached
+    return cached[1]
+
+def _restore_indexed_list(items, clean, entries):
+    from openpyxl.utils.indexed_list import IndexedList
+    restored = IndexedList()
+    list.extend(restored, items)
+    restored.clean = clean
+    restored._dict = dict(entries)
+    return restored
+
+class _TemplatePickler(pickle.Pickler):
+    # openpyxl's IndexedList drops duplicates when unpickled through append(),
+    # and the reader leaves some style keys hashed under stale values, so copy
+    # the list verbatim and keep only the index entries a lookup can reach.
+    # Anything else would renumber cell styles in the saved workbook.
+    def reducer_override(self, obj):
+        from openpyxl.utils.indexed_list import IndexedList
+        if isinstance(obj, IndexedList):
+            entries = [(key, index) for key, index in obj._dict.items() if key in obj._dict]
+            return _restore_indexed_list, (list(obj), obj.clean, entries)
+        return NotImplemented
+
+def _parse_cr_template(path):
+    import openpyxl
+    wb = openpyxl.load_workbook(path)
+    ws = wb.active
+    ws.title = "CR"
+    buffer = BytesIO()
+    _TemplatePickler(buffer, pickle.HIGHEST_PROTOCOL).dump(wb)
+    return buffer.getvalue(), build_merged_cell_map(ws)
+
+def _read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+def load_cr_template(template_key):
+    """Return a private copy of a CR template workbook and its merged-cell map.
+
+    Templates are parsed once per process and re-parsed when the file's mtime
+    changes; each caller gets a copy unpickled from the parsed workbook, which
+    is far cheaper than running openpyxl's XLSX reader again.
+    """
+    pickled, merged_map = _cached_asset(template_key, CR_TEMPLATES[template_key], _parse_cr_template)
+    return pickle.loads(pickled), merged_map
+
+def load_cr_logo():
+    from openpyxl.drawing.image import Image
+    img = Image(BytesIO(_cached_asset('logo', CR_LOGO_PATH, _read_bytes)))
+    img.width = 80
+    img.height = 60
+    return img
+
+CR_CYCLE_RANGES = {
+    'CR_1': (0, 21),
+    'CR_2': (21, 48),
+    'CR_3': (48, 72)
+}
+
+CR_REMARKS_COLUMNS = {
+    'CR_1': 27,
+    'CR_2': 29,
+    'CR_3': 26
+}
+
+def cr_workbook_cells(template_key, form, rows):
+    """Yield ``(row, column, value)`` for every cell a CR template is filled with, in write order."""
+    record_col = 25 if template_key == 'CR_2' else 26
+    yield 1, record_col, form['record_no'] or 'SAL/R02/Y'
+    yield 2, record_col, form['record_date'] or ''
+    
+    yield 3, 2, form['customer'] or ''
+    yield 3, 5, form['bid'] or ''
+    yield 3, 8, form['po'] or ''
+    yield 3, 9, form['cr'] or ''
+    
+    yield 16, 1, form['amendment_details'] or ''
+    
+    data_start_row = 8
+    
+    cycle_start, cycle_end = CR_CYCLE_RANGES[template_key]
+    remarks_col = CR_REMARKS_COLUMNS[template_key]
+    
+    for row_idx, row in enumerate(rows):
+        excel_row = data_start_row + row_idx
         
-        if not form:
-            db.close()
-            return jsonify({'exists': False})
+        if excel_row > 12:
+            break
         
-        form_id = form['id']
+        yield excel_row, 1, row['item_no'] or ''
+        yield excel_row, 2, row['part_number'] or ''
+        yield excel_row, 3, row['part_description'] or ''
+        yield excel_row, 4, row['rev'] or ''
+        yield excel_row, 5, row['qty'] or ''
         
-        rows_cursor = db.execute('''
-            SELECT item_no, part_number, part_description, rev, qty, ped_cycles, notes, remarks
-            FROM ped_form_rows
-            WHERE ped_form_id = ?
-            ORDER BY id
-        ''', (form_id,))
+        relevant_cycles = row['cycles'][cycle_start:cycle_end]
+        for cycle_idx, cycle_val in enumerate(relevant_cycles):
+            yield excel_row, 6 + cycle_idx, cycle_val if cycle_val else ''
         
-        rows = []
-        for row in rows_cursor.fetchall():
-            ped_cycles = json.loads(row['ped_cycles']) if row['ped_cycles'] else []
-            notes = json.loads(row['notes']) if row['notes'] else []
-            rows.append({
-                'key': row['item_no'],
-                'part': row['part_number'] or '',
-                'desc': row['part_description'] or '',
-                'rev': row['rev'] or '',
-                'qty': row['qty'] or '',
-                'pedCycles': ped_cycles,
-                'notes': notes,
-                'remarks': row['remarks'] or ''
-            })
+        yield excel_row, remarks_col, row['remarks'] or ''
+
+def render_cr_workbook_openpyxl(template_key, form, rows):
+    """Fill one CR template through openpyxl and return the XLSX bytes."""
+    wb, merged_map = load_cr_template(template_key)
+    ws = wb.active
+    ws.add_image(load_cr_logo(), 'A1')
+    for row, col, value in cr_workbook_cells(template_key, form, rows):
+        write_cell(ws, row, col, value, merged_map)
+    
+    excel_buffer = BytesIO()
+    wb.save(excel_buffer)
+    return excel_buffer.getvalue()
+
+class CRTemplateSplice:
+    """A CR template saved once through openpyxl and cut up around every cell it can be filled with.
+
+    The sheet XML is kept as static chunks between those cells. For each cell
+    the openpyxl output is known for no write, an empty string, and text
+    (with and without ``xml:space="preserve"``), so a render only joins
+    strings, compresses the sheet and writes a ZIP around the other parts,
+    which are compressed once here. Output matches ``render_cr_workbook_openpyxl``
+    apart from ZIP timestamps; ``__init__`` raises ValueError if it would not.
+    """
+    MARK = '\ue000{}\ue001'
+    
+    def __init__(self, template_key):
+        import zipfile
+        from openpyxl.utils import get_column_letter
         
-        db.close()
+        self.template_key = template_key
+        self.merged_map = load_cr_template(template_key)[1]
+        full_form = dict.fromkeys(('record_no', 'record_date', 'customer', 'bid', 'po', 'cr', 'amendment_details'), 'x')
+        full_rows = [{'item_no': 'x', 'part_number': 'x', 'part_description': 'x', 'rev': 'x', 'qty': 'x',
+                      'cycles': ['x'] * max(end for _, end in CR_CYCLE_RANGES.values()), 'remarks': 'x'}] * 5
+        self.anchors = list(dict.fromkeys(self.merged_map.get((row, col), (row, col))
+                                          for row, col, _ in cr_workbook_cells(template_key, full_form, full_rows)))
         
-        return jsonify({
-            'exists': True,
-            'customer': form['customer'] or '',
-            'bid': form['bid'] or '',
-            'po': form['po'] or '',
-            'cr': form['cr'] or '',
-            'recordNo': form['record_no'] or '',
-            'recordDate': form['record_date'] or '',
-            'amendmentDetails': form['amendment_details'] or '',
-            'rows': rows,
-            'lastModifiedBy': form['last_modified_by'] or '',
-            'lastModifiedAt': form['last_modified_at'] or ''
-        })
-    except Exception as e:
-        db.close()
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/lead-form/save', methods=['POST'])
-@login_required
-def save_lead_form():
-    import json
-    data = request.get_json()
-    
-    po_key = data.get('poKey', '').strip()
-    if not po_key:
-        return jsonify({'error': 'PO key required'}), 400
-    
-    customer = data.get('customer', '').strip()
-    bid = data.get('bid', '').strip()
-    po = data.get('po', '').strip()
-    cr = data.get('cr', '').strip()
-    record_no = data.get('recordNo', '').strip()
-    record_date = data.get('recordDate', '').strip()
-    rows = data.get('rows', [])
-    
-    username = session.get('username', 'unknown')
-    
-    db = get_db()
-    try:
-        db.execute('BEGIN TRANSACTION')
+        def save(values):
+            wb, _ = load_cr_template(template_key)
+            ws = wb.active
+            ws.add_image(load_cr_logo(), 'A1')
+            for (row, col), value in values.items():
+                ws.cell(row=row, column=col).value = value
+            buffer = BytesIO()
+            wb.save(buffer)
+            archive = zipfile.ZipFile(buffer)
+            return archive.namelist(), {name: archive.read(name) for name in archive.namelist()}
         
-        cursor = db.execute('SELECT id FROM lead_forms WHERE po_key = ?', (po_key,))
-        form = cursor.fetchone()
+        names, untouched = save({})
+        _, marked = save({anchor: self.MARK.format(i) for i, anchor in enumerate(self.anchors)})
+        _, padded = save({anchor: f' {self.MARK.format(i)} ' for i, anchor in enumerate(self.anchors)})
+        _, empty = save(dict.fromkeys(self.anchors, ''))
         
-        if form:
-            form_id = form['id']
-            db.execute('''
-                UPDATE lead_forms 
-                SET customer = ?, bid = ?, po = ?, cr = ?, record_no = ?, record_date = ?,
-                    last_modified_by = ?, last_modified_at = CURRENT_TIMESTAMP
-                WHERE id = ?
-            ''', (customer, bid, po, cr, record_no, record_date, username, form_id))
-            
-            db.execute('DELETE FROM lead_form_rows WHERE lead_form_id = ?', (form_id,))
-        else:
-            db.execute('''
-                INSERT INTO lead_forms (po_key, customer, bid, po, cr, record_no, record_date, last_modified_by)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (po_key, customer, bid, po, cr, record_no, record_date, username))
-            form_id = db.execute('SELECT last_insert_rowid() as id').fetchone()['id']
+        sheets = [name for name in names if re.fullmatch(r'xl/worksheets/sheet\d+\.xml', name)]
+        if len(sheets) != 1:
+            raise ValueError(f'{template_key}: expected one worksheet, found {len(sheets)}')
+        self.sheet_name = sheets[0]
         
-        for row in rows:
-            item_no = row.get('itemNo', '')
-            if not item_no:
-                continue
-            
-            db.execute('''
-                INSERT INTO lead_form_rows 
-                (lead_form_id, item_no, part_number, part_description, rev, qty, 
-                 customer_required_date, standard_lead_time, gtn_agreed_date, remarks)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                form_id,
-                item_no,
-                row.get('part', ''),
-                row.get('desc', ''),
-                row.get('rev', ''),
-                row.get('qty', ''),
-                row.get('customerRequiredDate', ''),
-                row.get('standardLeadTime', ''),
-                row.get('gtnAgreedDate', ''),
-                row.get('remarks', '')
-            ))
+        def cell_span(xml, coordinate):
+            start = xml.find(f'<c r="{coordinate}"')
+            if start < 0:
+                return None
+            tag_end = xml.index('>', start) + 1
+            return start, tag_end if xml[tag_end - 2] == '/' else xml.index('</c>', tag_end) + 4
         
-        db.commit()
-        db.close()
+        def text_parts(xml, value):
+            at = xml.index(value)
+            start, end = xml.rfind('<c ', 0, at), xml.index('</c>', at) + 4
+            return start, end, xml[start:at], xml[at + len(value):end]
         
-        return jsonify({
-            'success': True,
-            'lastModifiedBy': username,
-            'lastModifiedAt': datetime.utcnow().isoformat()
-        })
-    except Exception as e:
-        db.rollback()
-        db.close()
-        return jsonify({'error': str(e)}), 500
-
-@app.route('/api/lead-form/load', methods=['GET'])
-@login_required
-def load_lead_form():
-    import json
-    po_key = request.args.get('poKey', '').strip()
-    if not po_key:
-        return jsonify({'error': 'PO key required'}), 400
-    
-    db = get_db()
-    try:
-        cursor = db.execute('''
-            SELECT id, customer, bid, po, cr, record_no, record_date, last_modified_by, last_modified_at
-            FROM lead_forms
-            WHERE po_key = ?
-        ''', (po_key,))
-        form = cursor.fetchone()
+        sheet = {name: parts[self.sheet_name].decode('utf-8') for name, parts in
+                 (('untouched', untouched), ('marked', marked), ('padded', padded), ('empty', empty))}
+        spans, self.untouched, self.empty, self.text, self.preserved = [], [], [], [], []
+        for i, (row, col) in enumerate(self.anchors):
+            coordinate = f'{get_column_letter(col)}{row}'
+            start, end, prefix, suffix = text_parts(sheet['marked'], self.MARK.format(i))
+            spans.append((start, end, i))
+            self.text.append((prefix, suffix))
+            self.preserved.append(text_parts(sheet['padded'], f' {self.MARK.format(i)} ')[2:])
+            span = cell_span(sheet['empty'], coordinate)
+            if span is None:
+                raise ValueError(f'{template_key}: {coordinate} missing from the empty render')
+            self.empty.append(sheet['empty'][span[0]:span[1]])
+            span = cell_span(sheet['untouched'], coordinate)
+            self.untouched.append('' if span is None else sheet['untouched'][span[0]:span[1]])
         
-        if not form:
-            db.close()
-            return jsonify({'exists': False})
+        spans.sort()
+        self.chunks, self.order, position = [], [], 0
+        for start, end, i in spans:
+            self.chunks.append(sheet['marked'][position:start])
+            self.order.append(i)
+            position = end
+        self.chunks.append(sheet['marked'][position:])
         
-        form_id = form['id']
+        if self.assemble(self.untouched) != sheet['untouched'] or self.assemble(self.empty) != sheet['empty']:
+            raise ValueError(f'{template_key}: cells do not splice back into the openpyxl output')
         
-        rows_cursor = db.execute('''
-            SELECT item_no, part_number, part_description, rev, qty, 
-                   customer_required_date, standard_lead_time, gtn_agreed_date, remarks
-            FROM lead_form_rows
-            WHERE lead_form_id = ?
-            ORDER BY id
-        ''', (form_id,))
+        core = untouched.get('docProps/core.xml', b'').decode('utf-8')
+        modified = re.search(r'(<dcterms:modified[^>]*>)[^<]*(</dcterms:modified>)', core)
+        if modified is None:
+            raise ValueError(f'{template_key}: no modified date in docProps/core.xml')
+        self.core = (core[:modified.end(1)], core[modified.start(2):])
         
-        rows = []
-        for row in rows_cursor.fetchall():
-            rows.append({
-                'itemNo': row['item_no'],
-                'part': row['part_number'] or '',
-                'desc': row['part_description'] or '',
-                'rev': row['rev'] or '',
-                'qty': row['qty'] or '',
-                'customerRequiredDate': row['customer_required_date'] or '',
-                'standardLeadTime': row['standard_lead_time'] or '',
-                'gtnAgreedDate': row['gtn_agreed_date'] or '',
-                'remarks': row['remarks'] or ''
-            })
+        self.parts = []
+        for name in names:
+            if name == 'docProps/core.xml' or name == self.sheet_name:
+                self.parts.append(name)
+                continue
+            if not untouched[name] == marked[name] == padded[name] == empty[name]:
+                raise ValueError(f'{template_key}: {name} changes with the cell values')
+            self.parts.append(zip_member(name, untouched[name]))
+    
+    def assemble(self, cells):
+        parts = [self.chunks[0]]
+        for i, chunk in zip(self.order, self.chunks[1:]):
+            parts.append(cells[i])
+            parts.append(chunk)
+        return ''.join(parts)
+    
+    def render(self, form, rows):
+        """Return the XLSX bytes, or None when a value needs openpyxl (formulas, control or carriage-return characters, non-strings)."""
+        values = {}
+        for row, col, value in cr_workbook_cells(self.template_key, form, rows):
+            values[self.merged_map.get((row, col), (row, col))] = value
         
-        db.close()
+        cells = list(self.untouched)
+        for i, anchor in enumerate(self.anchors):
+            if anchor not in values:
+                continue
+            value = values[anchor]
+            if not isinstance(value, str) or value.startswith('=') and len(value) > 1 or CR_SPLICE_UNSAFE.search(value):
+                return None
+            if value == '':
+                cells[i] = self.empty[i]
+            elif not value.strip():
+                return None
+            else:
+                prefix, suffix = self.preserved[i] if value != value.strip() else self.text[i]
+                cells[i] = prefix + value.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;') + suffix
         
-        return jsonify({
-            'exists': True,
-            'customer': form['customer'] or '',
-            'bid': form['bid'] or '',
-            'po': form['po'] or '',
-            'cr': form['cr'] or '',
-            'recordNo': form['record_no'] or '',
-            'recordDate': form['record_date'] or '',
-            'rows': rows,
-            'lastModifiedBy': form['last_modified_by'] or '',
-            'lastModifiedAt': form['last_modified_at'] or ''
-        })
-    except Exception as e:
-        db.close()
-        return jsonify({'error': str(e)}), 500
+        modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+        members = []
+        for part in self.parts:
+            if part == self.sheet_name:
+                part = zip_member(part, self.assemble(cells).encode('utf-8'))
+            elif part == 'docProps/core.xml':
+                part = zip_member(part, f'{self.core[0]}{modified}{self.core[1]}'.encode('utf-8'))
+            members.append(part)
+        return zip_archive(members)
+
+# openpyxl rejects control characters, and lxml and ElementTree escape
+# carriage returns differently; such values go through openpyxl instead.
+CR_SPLICE_UNSAFE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\r]')
+
+def zip_member(name, data):
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    return name.encode('utf-8'), zlib.crc32(data), len(data), compressor.compress(data) + compressor.flush()
+
+def zip_archive(members):
+    """Build a ZIP from ``zip_member`` tuples (already deflated), as zipfile would write it."""
+    import struct
+    now = time.localtime()
+    dos_time = now.tm_hour << 11 | now.tm_min << 5 | now.tm_sec // 2
+    dos_date = (now.tm_year - 1980) << 9 | now.tm_mon << 5 | now.tm_mday
+    output, directory, offset = [], [], 0
+    for name, crc, size, compressed in members:
+        header = struct.pack('<4s2B4HL2L2H', b'PK\x03\x04', 20, 0, 0, zlib.DEFLATED, dos_time, dos_date,
+                             crc, len(compressed), size, len(name), 0)
+        directory.append(struct.pack('<4s4B4HL2L5H2L', b'PK\x01\x02', 20, 3, 20, 0, 0, zlib.DEFLATED, dos_time,
+                                     dos_date, crc, len(compressed), size, len(name), 0, 0, 0, 0, 0o600 << 16, offset)
+                         + name)
+        output += (header, name, compressed)
+        offset += len(header) + len(name) + len(compressed)
+    directory = b''.join(directory)
+    end = struct.pack('<4s4H2LH', b'PK\x05\x06', 0, 0, len(members), len(members), len(directory), offset, 0)
+    return b''.join(output) + directory + end
+
+def _parse_cr_splice(path, template_key):
+    try:
+        return CRTemplateSplice(template_key)
+    except (ValueError, KeyError) as e:
+        app.logger.warning('CR template %s cannot be spliced, using openpyxl: %s', template_key, e)
+        return None
+
+def load_cr_splice(template_key):
+    """Return the CRTemplateSplice for a template, or None if it is rendered through openpyxl."""
+    if CR_RENDER_ENGINE != 'template':
+        return None
+    # Keyed by the logo's mtime too, since the logo is part of the saved output.
+    return _cached_asset(f'{template_key}:splice:{os.path.getmtime(CR_LOGO_PATH)}', CR_TEMPLATES[template_key],
+                         lambda path: _parse_cr_splice(path, template_key))
+
+def render_cr_workbook(template_key, form, rows):
+    """Fill one CR template with a form header and its rows (cycles already decoded) and return the XLSX bytes."""
+    splice = load_cr_splice(template_key)
+    data = splice.render(form, rows) if splice is not None else None
+    if data is None:
+        data = render_cr_workbook_openpyxl(template_key, form, rows)
+    return data
+
+def cr_export_filename(template_key, form_idx, form):
+    safe_customer = ''.join(c for c in (form['customer'] or 'Customer') if c.isalnum() or c in (' ', '_', '-'))[:30]
+    return f"{template_key}_{form_idx + 1}_{safe_customer}.xlsx"
+
+_export_pool = None
+_export_pool_lock = threading.Lock()
+
+def get_export_pool():
+    global _export_pool
+    with _export_pool_lock:
+        if _export_pool is None:
+            # spawn rather than fork: gunicorn workers are multi-threaded.
+            _export_pool = ProcessPoolExecutor(max_workers=EXPORT_PROCESSES,
+                                               mp_context=multiprocessing.get_context('spawn'))
+        return _export_pool
+
+def render_cr_workbooks(jobs, parallel=True):
+    """Yield ``render_cr_workbook(*job)`` for every job, in job order.
+
+    With ``parallel`` the jobs run on the shared export process pool, keeping
+    at most two per process in flight so memory stays bounded. A failed job
+    re-raises its exception here and cancels the rest.
+    """
+    if not parallel or EXPORT_PROCESSES <= 1:
+        for job in jobs:
+            yield render_cr_workbook(*job)
+        return
+    
+    global _export_pool
+    pool = get_export_pool()
+    jobs = iter(jobs)
+    pending = deque()
+    try:
+        for job in itertools.islice(jobs, EXPORT_PROCESSES * 2):
+            pending.append(pool.submit(render_cr_workbook, *job))
+        while pending:
+            data = pending.popleft().result()
+            for job in itertools.islice(jobs, 1):
+                pending.append(pool.submit(render_cr_workbook, *job))
+            yield data
+    except BrokenProcessPool:
+        with _export_pool_lock:
+            if _export_pool is pool:
+                _export_pool = None
+        raise
+    finally:
+        for future in pending:
+            future.cancel()
+
+class ZipStream:
+    """Write-only, non-seekable sink for zipfile.ZipFile.
+
+    zipfile falls back to data descriptors when it cannot seek, so finished
+    entries can be drained and sent to the client while the archive is still
+    being written.
+    """
+    def __init__(self):
+        self._chunks = []
+    
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+    
+    def flush(self):
+        pass
+    
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def check_cr_export_assets():
+    for name, path in CR_TEMPLATES.items():
+        if not os.path.exists(path):
+            return jsonify({'error': f'Template file {name} not found'}), 404
+    
+    if not os.path.exists(CR_LOGO_PATH):
+        return jsonify({'error': 'GTN logo file not found'}), 404
+    return None
+
+def read_cr_export_params(source):
+    """Read export filters from query args or a JSON body; raises ValueError on bad dates."""
+    def values(name):
+        if hasattr(source, 'getlist'):
+            raw = source.getlist(name)
+        else:
+            raw = source.get(name) or []
+            if not isinstance(raw, list):
+                raw = [raw]
+        return sorted({str(value).strip() for value in raw if str(value).strip()})
+    
+    params = {'poKeys': values('poKey'), 'customers': values('customer')}
+    for name in ('modifiedSince', 'modifiedBefore'):
+        value = str(source.get(name) or '').strip()
+        if value:
+            try:
+                moment = datetime.fromisoformat(value)
+            except ValueError:
+                raise ValueError(f'Invalid {name}: {value}')
+            if moment.tzinfo:
+                moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+            # last_modified_at holds SQLite CURRENT_TIMESTAMP values (UTC).
+            params[name] = moment.strftime('%Y-%m-%d %H:%M:%S')
+    params['incremental'] = str(source.get('incremental', '')).lower() in ('1', 'true', 'yes')
+    return params
+
+def cr_export_where(params):
+    clauses, args = [], []
+    if params.get('poKeys'):
+        clauses.append(f"po_key IN ({', '.join('?' for _ in params['poKeys'])})")
+        args.extend(params['poKeys'])
+    if params.get('customers'):
+        clauses.append(f"customer IN ({', '.join('?' for _ in params['customers'])})")
+        args.extend(params['customers'])
+    if params.get('modifiedSince'):
+        clauses.append('last_modified_at >= ?')
+        args.append(params['modifiedSince'])
+    if params.get('modifiedBefore'):
+        clauses.append('last_modified_at < ?')
+        args.append(params['modifiedBefore'])
+    return (' WHERE ' + ' AND '.join(clauses) if clauses else ''), args
+
+def fetch_cr_export_forms(db, params=None):
+    where, args = cr_export_where(params or {})
+    return db.execute(f'''
+        SELECT id, customer, bid, po, cr, record_no, record_date, amendment_details, last_modified_by, last_modified_at, version
+        FROM cr_forms{where}
+        ORDER BY id
+    ''', args).fetchall()
+
+def fetch_cr_export_rows(db, form_ids):
+    """Return ``{form_id: rows}`` for ``form_ids`` with cycles decoded, one query per chunk of forms."""
+    rows_by_form = {form_id: [] for form_id in form_ids}
+    for start in range(0, len(form_ids), CR_EXPORT_ROW_CHUNK):
+        chunk = form_ids[start:start + CR_EXPORT_ROW_CHUNK]
+        cursor = db.execute(f'''
+            SELECT cr_form_id, item_no, part_number, part_description, rev, qty, cycles, remarks
+            FROM cr_form_rows
+            WHERE cr_form_id IN ({', '.join('?' for _ in chunk)})
+            ORDER BY cr_form_id, id
+        ''', chunk)
+        for row in cursor:
+            row = dict(row)
+            row['cycles'] = decode_cycles(row['cycles'])
+            rows_by_form[row.pop('cr_form_id')].append(row)
+    return rows_by_form
+
+def cr_export_asset_stamp():
+    assets = [os.path.getmtime(path) for path in (*CR_TEMPLATES.values(), CR_LOGO_PATH)]
+    return hashlib.sha1(json.dumps([CR_RENDER_VERSION, assets]).encode()).hexdigest()[:12]
+
+def cached_workbook_path(template_key, form, stamp):
+    return os.path.join(EXPORT_DIR, 'workbooks', f"{form['id']}-{form['version']}-{template_key}-{stamp}.xlsx")
+
+def read_cached_workbook(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return None
+    # Cached workbooks are pruned by age; touching keeps those in use.
+    os.utime(path)
+    return data
+
+def store_cached_workbook(path, template_key, form, data):
+    # The cache only saves work, so failing to write it must not fail the export.
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        for stale in glob.glob(os.path.join(os.path.dirname(path), f"{form['id']}-*-{template_key}-*.xlsx")):
+            if stale != path:
+                os.remove(stale)
+    except OSError:
+        pass
+
+def cr_export_entries(db, forms, incremental=False):
+    """Yield ``(filename, workbook bytes)`` for every form and template, in order.
+
+    Every rendered workbook is cached by form id, version, template and asset
+    stamp. With ``incremental`` cached workbooks are reused, so only forms saved
+    since they were last exported are rendered again.
+    """
+    stamp = cr_export_asset_stamp()
+    entries = [(cr_export_filename(template_key, form_idx, form), template_key, form,
+                cached_workbook_path(template_key, form, stamp))
+               for form_idx, form in enumerate(forms) for template_key in CR_TEMPLATES]
+    cached = {path for _, _, _, path in entries if incremental and os.path.exists(path)}
+    render_forms = list({form['id']: form for _, _, form, path in entries if path not in cached}.values())
+    
+    # Rows are loaded for a chunk of forms at a time and shared by all of a
+    # form's templates, so the query count grows with forms / chunk size only.
+    def jobs():
+        for start in range(0, len(render_forms), CR_EXPORT_ROW_CHUNK):
+            chunk = render_forms[start:start + CR_EXPORT_ROW_CHUNK]
+            rows_by_form = fetch_cr_export_rows(db, [form['id'] for form in chunk])
+            for form in chunk:
+                for template_key in CR_TEMPLATES:
+                    if cached_workbook_path(template_key, form, stamp) not in cached:
+                        yield template_key, dict(form), rows_by_form[form['id']]
+    
+    # Spliced workbooks take about a millisecond, less than shipping a job to
+    # another process, so the pool is only worth it for openpyxl rendering.
+    parallel = len(entries) - len(cached) > len(CR_TEMPLATES) and not all(map(load_cr_splice, CR_TEMPLATES))
+    rendered = render_cr_workbooks(jobs(), parallel=parallel)
+    for filename, template_key, form, path in entries:
+        data = read_cached_workbook(path) if path in cached else None
+        if data is None:
+            if path in cached:
+                # Pruned since the existence check.
+                data = render_cr_workbook(template_key, dict(form), fetch_cr_export_rows(db, [form['id']])[form['id']])
+            else:
+                data = next(rendered)
+            store_cached_workbook(path, template_key, form, data)
+        yield filename, data
 
 @app.route('/api/cr-export-excel', methods=['GET'])
 @login_required
 def export_cr_to_excel():
-    import json
-    import openpyxl
-    from openpyxl.styles import Font, Alignment
-    from openpyxl.utils import get_column_letter
-    from openpyxl.cell.cell import MergedCell
-    from openpyxl.drawing.image import Image
-    from io import BytesIO
     import zipfile
-    from flask import make_response
-    import os
-    
-    def build_merged_cell_map(ws):
-        merged_map = {}
-        for merged_range in ws.merged_cells.ranges:
-            min_row, min_col = merged_range.min_row, merged_range.min_col
-            for row in range(merged_range.min_row, merged_range.max_row + 1):
-                for col in range(merged_range.min_col, merged_range.max_col + 1):
-                    merged_map[(row, col)] = (min_row, min_col)
-        return merged_map
-    
-    def write_cell(ws, row, col, value, merged_map):
-        if (row, col) in merged_map:
-            anchor_row, anchor_col = merged_map[(row, col)]
-            cell = ws.cell(row=anchor_row, column=anchor_col)
-            cell.value = value
-        else:
-            ws.cell(row=row, column=col, value=value)
-    
-    templates = {
-        'CR_1': 'attached_assets/CR_1762338481711.xlsx',
-        'CR_2': 'attached_assets/CR 2_1762338481710.xlsx',
-        'CR_3': 'attached_assets/CR 3_1762338481711.xlsx'
-    }
-    
-    logo_path = 'attached_assets/GTN_LOGO_1762400078631.png'
     
-    for name, path in templates.items():
-        if not os.path.exists(path):
-            return jsonify({'error': f'Template file {name} not found'}), 404
+    error = check_cr_export_assets()
+    if error:
+        return error
     
-    if not os.path.exists(logo_path):
-        return jsonify({'error': 'GTN logo file not found'}), 404
+    try:
+        params = read_cr_export_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
     
     db = get_db()
     try:
-        forms_cursor = db.execute('''
-            SELECT id, customer, bid, po, cr, record_no, record_date, amendment_details, last_modified_by, last_modified_at
-            FROM cr_forms
-            ORDER BY id
-        ''')
-        forms = forms_cursor.fetchall()
+        forms = fetch_cr_export_forms(db, params)
         
         if not forms:
-            db.close()
             return jsonify({'error': 'No CR forms found to export'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    
+    # Workbooks are rendered on the export process pool, appended to the
+    # archive in form order and sent straight away, so memory stays bounded and
+    # the first bytes go out at once. Errors past this point abort the transfer.
+    # The generator reuses the request's connection (stream_with_context keeps
+    # the context alive); it is released when the response closes.
+    def generate():
+        db = get_db()
+        stream = ZipStream()
+        with zipfile.ZipFile(stream, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for filename, data in cr_export_entries(db, forms, params['incremental']):
+                # XLSX files are already deflated; compressing them again only costs time.
+                zip_file.writestr(filename, data, zipfile.ZIP_STORED)
+                yield stream.drain()
+        yield stream.drain()
+    
+    response = Response(stream_with_context(generate()), mimetype='application/zip')
+    response.headers['Content-Disposition'] = 'attachment; filename=CR_Export.zip'
+    return response
+
+_export_runner = None
+_export_runner_lock = threading.Lock()
+
+def get_export_runner():
+    global _export_runner
+    with _export_runner_lock:
+        if _export_runner is None:
+            _export_runner = ThreadPoolExecutor(max_workers=EXPORT_JOB_THREADS, thread_name_prefix='export-job')
+        return _export_runner
+
+def export_artifact_path(job_id):
+    return os.path.join(EXPORT_DIR, f'{job_id}.zip')
+
+def cr_export_signature(db, params):
+    # Saves bump a form's version and new forms get a higher id, so this changes
+    # whenever the export would; template edits change the asset stamp.
+    # Incremental and full exports produce the same workbooks, so they share jobs.
+    where, args = cr_export_where(params)
+    forms = db.execute(f'SELECT COUNT(*), COALESCE(MAX(id), 0), COALESCE(SUM(version), 0) FROM cr_forms{where}', args).fetchone()
+    filters = {name: value for name, value in params.items() if name != 'incremental'}
+    return json.dumps({'kind': 'cr-excel', 'filters': filters, 'forms': list(forms), 'assets': cr_export_asset_stamp()},
+                      sort_keys=True)
+
+def expire_export_jobs(db):
+    # Jobs whose worker died stop updating; fail them so they are not reused.
+    now = datetime.now(timezone.utc)
+    db.execute('''
+        UPDATE export_jobs
+        SET status = 'failed', error = 'Export worker stopped', finished_at = CURRENT_TIMESTAMP
+        WHERE status IN ('queued', 'running') AND updated_at < ?
+    ''', ((now - timedelta(seconds=EXPORT_JOB_STALE_SECONDS)).strftime('%Y-%m-%d %H:%M:%S'),))
+    
+    cutoff = ((now - timedelta(seconds=EXPORT_RETENTION_SECONDS)).strftime('%Y-%m-%d %H:%M:%S'),)
+    for job in db.execute('SELECT id FROM export_jobs WHERE finished_at < ?', cutoff).fetchall():
+        try:
+            os.remove(export_artifact_path(job['id']))
+        except FileNotFoundError:
+            pass
+    db.execute('DELETE FROM export_jobs WHERE finished_at < ?', cutoff)
+    
+    oldest = time.time() - EXPORT_RETENTION_SECONDS
+    for path in glob.glob(os.path.join(EXPORT_DIR, 'workbooks', '*.xlsx')):
+        try:
+            if os.path.getmtime(path) < oldest:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+def export_job_payload(job):
+    status = job['status']
+    if status == 'done' and not os.path.exists(export_artifact_path(job['id'])):
+        status = 'expired'
+    payload = {
+        'jobId': job['id'],
+        'status': status,
+        'formsDone': job['forms_done'],
+        'formsTotal': job['forms_total'],
+        'error': job['error'] or '',
+        'createdBy': job['created_by'] or '',
+        'createdAt': job['created_at'] or '',
+        'finishedAt': job['finished_at'] or ''
+    }
+    if status == 'done':
+        payload['fileSize'] = job['file_size']
+        payload['downloadUrl'] = f"/api/exports/{job['id']}/download"
+    return payload
+
+def run_cr_export_job(job_id):
+    import zipfile
+    
+    db = connect_db()
+    part_path = export_artifact_path(job_id) + '.part'
+    try:
+        claimed = db.execute(
+            "UPDATE export_jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP WHERE id = ? AND status = 'queued'",
+            (job_id,)
+        ).rowcount
+        db.commit()
+        if not claimed:
+            return
         
-        cycle_mapping = {
-            'CR_1': (0, 21),
-            'CR_2': (21, 48),
-            'CR_3': (48, 72)
-        }
-        
-        remarks_column_mapping = {
-            'CR_1': 27,
-            'CR_2': 29,
-            'CR_3': 26
-        }
+        params = json.loads(db.execute('SELECT params FROM export_jobs WHERE id = ?', (job_id,)).fetchone()['params'] or '{}')
+        forms = fetch_cr_export_forms(db, params)
+        db.execute('UPDATE export_jobs SET forms_total = ? WHERE id = ?', (len(forms), job_id))
+        db.commit()
         
-        zip_buffer = BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for form_idx, form in enumerate(forms):
-                form_id = form['id']
-                safe_customer = ''.join(c for c in (form['customer'] or 'Customer') if c.isalnum() or c in (' ', '_', '-'))[:30]
-                
-                for template_key, template_path in templates.items():
-                    wb = openpyxl.load_workbook(template_path)
-                    ws = wb.active
-                    ws.title = "CR"
-                    
-                    merged_map = build_merged_cell_map(ws)
-                    
-                    img = Image(logo_path)
-                    img.width = 80
-                    img.height = 60
-                    ws.add_image(img, 'A1')
-                    
-                    if template_key == 'CR_2':
-                        write_cell(ws, 1, 25, form['record_no'] or 'SAL/R02/Y', merged_map)
-                        write_cell(ws, 2, 25, form['record_date'] or '', merged_map)
-                    else:
-                        write_cell(ws, 1, 26, form['record_no'] or 'SAL/R02/Y', merged_map)
-                        write_cell(ws, 2, 26, form['record_date'] or '', merged_map)
-                    
-                    write_cell(ws, 3, 2, form['customer'] or '', merged_map)
-                    write_cell(ws, 3, 5, form['bid'] or '', merged_map)
-                    write_cell(ws, 3, 8, form['po'] or '', merged_map)
-                    write_cell(ws, 3, 9, form['cr'] or '', merged_map)
-                    
-                    write_cell(ws, 16, 1, form['amendment_details'] or '', merged_map)
-                    
-                    rows_cursor = db.execute('''
-                        SELECT item_no, part_number, part_description, rev, qty, cycles, remarks
-                        FROM cr_form_rows
-                        WHERE cr_form_id = ?
-                        ORDER BY id
-                    ''', (form_id,))
-                    
-                    data_rows = rows_cursor.fetchall()
-                    data_start_row = 8
-                    
-                    cycle_start, cycle_end = cycle_mapping[template_key]
-                    remarks_col = remarks_column_mapping[template_key]
-                    
-                    for row_idx, row in enumerate(data_rows):
-                        excel_row = data_start_row + row_idx
-                        
-                        if excel_row > 12:
-                            break
-                        
-                        write_cell(ws, excel_row, 1, row['item_no'] or '', merged_map)
-                        write_cell(ws, excel_row, 2, row['part_number'] or '', merged_map)
-                        write_cell(ws, excel_row, 3, row['part_description'] or '', merged_map)
-                        write_cell(ws, excel_row, 4, row['rev'] or '', merged_map)
-                        write_cell(ws, excel_row, 5, row['qty'] or '', merged_map)
-                        
-                        cycles = json.loads(row['cycles']) if row['cycles'] else []
-                        
-                        relevant_cycles = cycles[cycle_start:cycle_end]
-                        for cycle_idx, cycle_val in enumerate(relevant_cycles):
-                            col_num = 6 + cycle_idx
-                            value_to_write = cycle_val if cycle_val else ''
-                            write_cell(ws, excel_row, col_num, value_to_write, merged_map)
-                        
-                        write_cell(ws, excel_row, remarks_col, row['remarks'] or '', merged_map)
-                    
-                    excel_buffer = BytesIO()
-                    wb.save(excel_buffer)
-                    excel_buffer.seek(0)
-                    
-                    filename = f"{template_key}_{form_idx + 1}_{safe_customer}.xlsx"
-                    zip_file.writestr(filename, excel_buffer.read())
+        os.makedirs(EXPORT_DIR, exist_ok=True)
+        with zipfile.ZipFile(part_path, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for count, (filename, data) in enumerate(cr_export_entries(db, forms, params.get('incremental')), 1):
+                zip_file.writestr(filename, data, zipfile.ZIP_STORED)
+                if count % len(CR_TEMPLATES) == 0:
+                    db.execute(
+                        'UPDATE export_jobs SET forms_done = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?',
+                        (count // len(CR_TEMPLATES), job_id)
+                    )
+                    db.commit()
         
+        os.replace(part_path, export_artifact_path(job_id))
+        db.execute('''
+            UPDATE export_jobs
+            SET status = 'done', file_size = ?, finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (os.path.getsize(export_artifact_path(job_id)), job_id))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        if os.path.exists(part_path):
+            os.remove(part_path)
+        db.execute('''
+            UPDATE export_jobs
+            SET status = 'failed', error = ?, finished_at = CURRENT_TIMESTAMP, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        ''', (str(e), job_id))
+        db.commit()
+    finally:
         db.close()
+
+@app.route('/api/exports', methods=['POST'])
+@login_required
+def create_export_job():
+    error = check_cr_export_assets()
+    if error:
+        return error
+    
+    try:
+        params = read_cr_export_params(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    db = get_db()
+    try:
+        db.execute('BEGIN IMMEDIATE')
+        expire_export_jobs(db)
         
-        zip_buffer.seek(0)
-        response = make_response(zip_buffer.read())
-        response.headers['Content-Type'] = 'application/zip'
-        response.headers['Content-Disposition'] = 'attachment; filename=CR_Export.zip'
+        where, args = cr_export_where(params)
+        forms_total = db.execute(f'SELECT COUNT(*) FROM cr_forms{where}', args).fetchone()[0]
+        if not forms_total:
+            db.commit()
+            return jsonify({'error': 'No CR forms found to export'}), 404
         
-        return response
+        # Identical requests share one job (and its artifact while it is kept)
+        # instead of rendering the same workbooks again.
+        params_key = cr_export_signature(db, params)
+        job = db.execute('''
+            SELECT * FROM export_jobs
+            WHERE params_key = ? AND status IN ('queued', 'running', 'done')
+            ORDER BY created_at DESC
+            LIMIT 1
+        ''', (params_key,)).fetchone()
+        if job and (job['status'] != 'done' or os.path.exists(export_artifact_path(job['id']))):
+            db.commit()
+            return jsonify(export_job_payload(job))
         
+        job_id = secrets.token_hex(16)
+        db.execute(
+            'INSERT INTO export_jobs (id, kind, params_key, params, status, forms_total, created_by) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, 'cr-excel', params_key, json.dumps(params), 'queued', forms_total, session.get('username'))
+        )
+        db.commit()
     except Exception as e:
-        db.close()
+        db.rollback()
         return jsonify({'error': str(e)}), 500
+    
+    get_export_runner().submit(run_cr_export_job, job_id)
+    job = db.execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+    return jsonify(export_job_payload(job)), 202
+
+@app.route('/api/exports/<job_id>', methods=['GET'])
+@login_required
+def get_export_job(job_id):
+    db = get_db()
+    job = db.execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    
+    return jsonify(export_job_payload(job))
+
+@app.route('/api/exports/<job_id>/download', methods=['GET'])
+@login_required
+def download_export_job(job_id):
+    db = get_db()
+    job = db.execute('SELECT * FROM export_jobs WHERE id = ?', (job_id,)).fetchone()
+    if not job:
+        return jsonify({'error': 'Export job not found'}), 404
+    
+    payload = export_job_payload(job)
+    if payload['status'] == 'expired':
+        return jsonify({'error': 'Export has expired'}), 410
+    if payload['status'] != 'done':
+        return jsonify({'error': 'Export is not ready'}), 409
+    
+    return send_from_directory(os.path.abspath(EXPORT_DIR), f'{job_id}.zip', as_attachment=True,
+                               download_name='CR_Export.zip', mimetype='application/zip')
+
+# Column headings for /api/ped-export and /api/lead-export, as on the forms.
+# List-valued row fields (cycles, notes) get one column per heading.
+FORM_EXPORT_HEADINGS = {
+    'customer': 'Customer', 'bid': 'BID', 'po': 'PO', 'cr': 'CR', 'record_no': 'Record No',
+    'record_date': 'Record Date', 'amendment_details': 'Amendment Details',
+    'part': 'Part #', 'desc': 'Part Description', 'rev': 'Rev', 'qty': 'Qty in Nos', 'remarks': 'Remarks'
+}
+FORM_EXPORT_ROW_HEADINGS = {
+    'ped': {
+        'pedCycles': (
+            'Engineering: Is Bill of Material Provided for Pressure Equipment',
+            'Engineering: Is applicable DBI / Drawing / Specification are Provided for Pressure Equipment',
+            'Engineering: Is CE Marking Requirements applicable for this Pressure Equipment',
+            'Engineering: Is this Pressure Equipment Group exists in latest PED Certificate',
+            'Engineering: Whether Essential Health & Safety Requirements are require to Capture',
+            'Engineering: Whether Conformity Assessment Module H (Full QA) required? If not, specify',
+            'Engineering: Is any Additional Details Required from Customer',
+            'Engineering: Please Note if any Requirement / Remarks',
+            'Manufacturing: Please Note if any Requirement / Remarks',
+            'Materials / Planning: Please Note if any Requirement / Remarks',
+            'Purchase: Is PED Required for Raw Material Supplier'
+        ),
+        'notes': tuple(f'{department}: Please Note if any Requirement / Remarks' for department in (
+            'Special Process', 'Welding', 'Assembly & Testing', 'Quality Control / Assurance',
+            'Painting / Despatch', 'Customer Service & Sales', 'Commercial'
+        ))
+    },
+    'lead': {
+        'customerRequiredDate': 'Customer Required Date',
+        'standardLeadTime': 'Standard Lead Time in Days',
+        'gtnAgreedDate': 'GTN Agreed Date',
+        'remarks': 'Remarks (Critical Item/ Loading/Capacity)'
+    }
+}
+
+def export_cell(value):
+    return '' if value is None else value if isinstance(value, str) else json.dumps(value) if isinstance(value, (dict, list)) else str(value)
+
+def form_export_lines(db, form, params):
+    """Yield the export table for one form type: a heading row, then one row per form row.
+
+    Forms are read FORM_EXPORT_CHUNK at a time with their rows, so memory does
+    not grow with the amount of data.
+    """
+    headings = dict(FORM_EXPORT_HEADINGS, **FORM_EXPORT_ROW_HEADINGS[form.name])
+    header_columns = [*form.header_fields.values(), *form.admin_fields.values()]
+    yield ['PO Key', *(headings[column] for column in header_columns), 'Last Modified By', 'Last Modified At', 'Item No',
+           *(heading for key, _, _ in form.row_fields
+             for heading in (headings[key] if isinstance(headings[key], tuple) else (headings[key],)))]
+    
+    where, args = cr_export_where(params)
+    sql = f"{form.select_sql}{where} {'AND' if where else 'WHERE'} id > ? ORDER BY id LIMIT {FORM_EXPORT_CHUNK}"
+    last_id = -2 ** 63
+    while True:
+        records = db.execute(sql, args + [last_id]).fetchall()
+        if not records:
+            break
+        rows_by_form = {record['id']: [] for record in records}
+        for row in db.execute(
+            f"{form.rows_select_sql} WHERE {form.fk_column} IN ({', '.join('?' for _ in records)}) "
+            f"ORDER BY {form.fk_column}, id",
+            [record['id'] for record in records]
+        ):
+            rows_by_form[row['form_id']].append(row)
+        for record in records:
+            line = [record['po_key'], *(record[column] or '' for column in header_columns),
+                    record['last_modified_by'] or '', record['last_modified_at'] or '']
+            for row in rows_by_form.pop(record['id']):
+                payload = form.row_payload(row)
+                values = [payload[form.row_key]]
+                for key, _, _ in form.row_fields:
+                    if isinstance(headings[key], tuple):
+                        cells = payload[key] if isinstance(payload[key], list) else []
+                        values.extend(export_cell(cells[i]) if i < len(cells) else '' for i in range(len(headings[key])))
+                    else:
+                        values.append(export_cell(payload[key]))
+                yield line + values
+        last_id = records[-1]['id']
+
+def csv_chunks(lines):
+    buffer = StringIO()
+    buffer.write('\ufeff')  # so Excel reads it as UTF-8
+    writer = csv.writer(buffer)
+    for line in lines:
+        writer.writerow(line)
+        if buffer.tell() >= FORM_EXPORT_BUFFER:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+def xlsx_chunks(lines, title):
+    # A write-only workbook spools rows to a temporary file instead of keeping
+    # cell objects, but the ZIP is only written at the end, so nothing is sent
+    # until every row has been read. Sheets past Excel's row limit continue on
+    # another sheet under the same headings.
+    import tempfile
+    from openpyxl import Workbook
+    from openpyxl.cell.cell import ILLEGAL_CHARACTERS_RE
+    
+    workbook = Workbook(write_only=True)
+    headings = next(lines)
+    sheet, count = None, XLSX_MAX_ROWS
+    for line in lines:
+        if count >= XLSX_MAX_ROWS:
+            sheet = workbook.create_sheet(title if sheet is None else f'{title} ({len(workbook.worksheets) + 1})')
+            sheet.append(headings)
+            count = 1
+        sheet.append([ILLEGAL_CHARACTERS_RE.sub('', value) for value in line])
+        count += 1
+    if sheet is None:
+        workbook.create_sheet(title).append(headings)
+    with tempfile.TemporaryFile() as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(FORM_EXPORT_BUFFER)
+            if not chunk:
+                break
+            yield chunk
+
+def export_form(form, title):
+    """Stream every row of one form type as CSV (default) or ``format=xlsx``.
+
+    Takes the ``/api/cr-export-excel`` filters (``poKey``, ``customer``,
+    ``modifiedSince``, ``modifiedBefore``) and reads from one snapshot.
+    """
+    try:
+        params = read_cr_export_params(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    export_format = request.args.get('format', 'csv').lower()
+    if export_format not in ('csv', 'xlsx'):
+        return jsonify({'error': 'format must be csv or xlsx'}), 400
+    
+    # The generator reuses the request's connection (stream_with_context keeps
+    # the context alive); it is released when the response closes.
+    def generate():
+        db = get_db()
+        db.execute('BEGIN')
+        lines = form_export_lines(db, form, params)
+        yield from csv_chunks(lines) if export_format == 'csv' else xlsx_chunks(lines, title)
+        db.commit()
+    
+    if export_format == 'csv':
+        mimetype = 'text/csv'
+    else:
+        mimetype = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={form.name.upper()}_Export.{export_format}'
+    return response
+
+@app.route('/api/ped-export', methods=['GET'])
+@login_required
+def export_ped():
+    return export_form(FORMS['ped'], 'PED Review')
+
+@app.route('/api/lead-export', methods=['GET'])
+@login_required
+def export_lead():
+    return export_form(FORMS['lead'], 'Lead Time')
+
+def read_metrics():
+    """All workers' flushed metrics as Prometheus text."""
+    flush_metrics()
+    series = {}
+    if os.path.exists(metrics_path()):
+        db = sqlite3.connect(metrics_path(), timeout=5)
+        try:
+            for name, labels, le, value in db.execute('SELECT series, labels, le, value FROM metrics'):
+                series.setdefault(name, []).append((labels, le, value))
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            db.close()
+    
+    lines = []
+    for family, (kind, help_text) in METRIC_FAMILIES.items():
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        names = (f'{family}_bucket', f'{family}_sum', f'{family}_count') if kind == 'histogram' else (family,)
+        samples = [(labels, names.index(name), float(le) if le else 0.0, name, le, value)
+                   for name in names for labels, le, value in series.get(name, [])]
+        for labels, _, _, name, le, value in sorted(samples):
+            if le:
+                labels = f'{labels},le="{le}"' if labels else f'le="{le}"'
+            lines.append(f'{name}{{{labels}}} {value:g}' if labels else f'{name} {value:g}')
+    return '\n'.join(lines) + '\n'
+
+@app.route('/api/metrics', methods=['GET'])
+@admin_required
+def get_metrics():
+    return Response(read_metrics(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
     init_db()
@@ -0,0 +1,109 @@
+"""CR workbook rendering: template splicing against openpyxl, for speed and equal output.
+
+Random forms (including values that make the splicer hand over to openpyxl)
+are rendered with render_cr_workbook and render_cr_workbook_openpyxl. Every
+part of the two XLSX files must match once unzipped, apart from the modified
+date in docProps/core.xml; the exit status is 1 if any differ. Timings per
+workbook are printed as JSON.
+
+    python benchmarks/cr_render.py --forms 200
+"""
+import argparse
+import io
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+import warnings
+import zipfile
+
+from db_concurrency import REPO_DIR, load_app, summarize
+
+STATES = ['✓', 'x', 'NA', '']
+TEXTS = ['', 'PO-0117/Rev A', ' leading space', 'trailing space ', 'a & b <c> "d"', 'two\nlines', 'Ünïcode ✓',
+         '0123', '=SUM(A1:A3)', 'tab\there', 'carriage\r\nreturn', 'x' * 300]
+MODIFIED = re.compile(rb'<dcterms:modified[^<]*')
+
+
+def random_form(rng, odd):
+    def text():
+        return rng.choice(TEXTS) if rng.random() < odd else f'Value {rng.randrange(1000)}'
+    form = {key: text() for key in ('record_no', 'record_date', 'customer', 'bid', 'po', 'cr', 'amendment_details')}
+    rows = [{'item_no': str(item), 'part_number': text(), 'part_description': text(), 'rev': text(), 'qty': text(),
+             'cycles': [rng.choice(STATES) for _ in range(rng.choice((72, 72, 72, 40, 0)))], 'remarks': text()}
+            for item in range(1, rng.randint(0, 6) + 1)]
+    return form, rows
+
+
+def unzipped(data):
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    if archive.testzip() is not None:
+        raise ValueError('corrupt archive')
+    return {name: MODIFIED.sub(b'', archive.read(name)) for name in archive.namelist()}
+
+
+def timed(render, *args):
+    started = time.perf_counter()
+    try:
+        result = render(*args)
+    except Exception as e:
+        result = type(e)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app-dir', default=REPO_DIR)
+    parser.add_argument('--forms', type=int, default=200)
+    parser.add_argument('--odd', type=float, default=0.005,
+                        help='share of values drawn from the awkward ones (whitespace, markup, formulas, ...)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    app_dir = os.path.abspath(args.app_dir)
+    workdir = tempfile.mkdtemp(prefix='cr-bench-')
+    # Templates are looked up relative to the working directory.
+    os.symlink(os.path.join(app_dir, 'attached_assets'), os.path.join(workdir, 'attached_assets'))
+    app_module = load_app(app_dir, workdir)
+    warnings.simplefilter('ignore')  # openpyxl cannot parse the templates' header/footer
+
+    rng = random.Random(args.seed)
+    forms = [random_form(rng, args.odd) for _ in range(args.forms)]
+    results, mismatches = {}, []
+    for template_key in app_module.CR_TEMPLATES:
+        started = time.perf_counter()
+        app_module.render_cr_workbook(template_key, *forms[0])
+        setup = time.perf_counter() - started
+        spliced, reference = [], []
+        for index, (form, rows) in enumerate(forms):
+            data, elapsed = timed(app_module.render_cr_workbook, template_key, form, rows)
+            spliced.append(elapsed)
+            expected, elapsed = timed(app_module.render_cr_workbook_openpyxl, template_key, form, rows)
+            reference.append(elapsed)
+            if isinstance(data, bytes) and isinstance(expected, bytes):
+                data, expected = unzipped(data), unzipped(expected)
+            if data != expected:
+                mismatches.append({'template': template_key, 'form': index})
+        duration = sum(spliced)
+        results[template_key] = {
+            'setup_ms': round(setup * 1000, 1),
+            'template': summarize(spliced, duration),
+            'openpyxl': summarize(reference, sum(reference)),
+            'speedup': round(sum(reference) / duration, 1)
+        }
+
+    print(json.dumps({
+        'app_dir': app_dir,
+        'forms': args.forms,
+        'render_engine': app_module.CR_RENDER_ENGINE,
+        **results,
+        'mismatches': mismatches
+    }, indent=2))
+    sys.exit(1 if mismatches else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+"""Concurrent save/load throughput against a throwaway SQLite database.
+
+Each worker process imports the app (like a gunicorn worker), logs in with the
+Flask test client and alternates full CR form saves and loads until the time
+is up. Results are printed as JSON.
+
+    python benchmarks/db_concurrency.py --workers 8 --duration 10
+
+To compare against an older revision, point --app-dir at a checkout of it:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/db_concurrency.py --app-dir /tmp/before
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def load_app(app_dir, workdir):
+    # Older revisions hard-code a relative DATABASE path, so run from the
+    # scratch directory and also pass it explicitly for newer ones.
+    os.environ['DATABASE_PATH'] = os.path.join(workdir, 'contract_review.db')
+    os.chdir(workdir)
+    sys.path.insert(0, app_dir)
+    import app as app_module
+    return app_module
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def summarize(latencies, duration):
+    return {
+        'count': len(latencies),
+        'per_second': round(len(latencies) / duration, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 2)
+    }
+
+
+def cr_rows(rows_per_form, seed):
+    states = ['✓', 'x', 'NA', '']
+    return [{
+        'key': str(item),
+        'part': f'P-{item:04d}',
+        'desc': f'Part {item}',
+        'rev': 'A',
+        'qty': str(item),
+        'cycles': [states[(item + cycle + seed) % 4] for cycle in range(72)],
+        'remarks': ''
+    } for item in range(1, rows_per_form + 1)]
+
+
+def setup(app_dir, workdir):
+    app_module = load_app(app_dir, workdir)
+    app_module.init_db()
+
+
+def worker(app_dir, workdir, worker_id, args, results):
+    app_module = load_app(app_dir, workdir)
+    client = app_module.app.test_client()
+    client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+
+    saves, loads, errors, locked = [], [], 0, 0
+    iteration = 0
+    deadline = time.monotonic() + args.duration
+    while time.monotonic() < deadline:
+        po_key = f'PO-{(worker_id + iteration) % args.pos}|B|P|C'
+        started = time.perf_counter()
+        response = client.post('/api/cr-form/save', json={
+            'poKey': po_key,
+            'customer': 'Bench',
+            'rows': cr_rows(args.rows, iteration)
+        })
+        saves.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors += 1
+            if b'locked' in response.data:
+                locked += 1
+
+        started = time.perf_counter()
+        response = client.get('/api/cr-form/load', query_string={'poKey': po_key})
+        loads.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            errors += 1
+        iteration += 1
+
+    results.put({'saves': saves, 'loads': loads, 'errors': errors, 'locked': locked})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app-dir', default=REPO_DIR)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--pos', type=int, default=20)
+    parser.add_argument('--rows', type=int, default=20)
+    parser.add_argument('--pragmas', default=None,
+                        help='value for SQLITE_PRAGMAS, e.g. "journal_mode=DELETE,synchronous=FULL"')
+    args = parser.parse_args()
+
+    if args.pragmas is not None:
+        os.environ['SQLITE_PRAGMAS'] = args.pragmas
+    app_dir = os.path.abspath(args.app_dir)
+    workdir = tempfile.mkdtemp(prefix='cr-bench-')
+    ctx = multiprocessing.get_context('spawn')
+
+    process = ctx.Process(target=setup, args=(app_dir, workdir))
+    process.start()
+    process.join()
+
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(app_dir, workdir, i, args, results))
+                 for i in range(args.workers)]
+    for process in processes:
+        process.start()
+    collected = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    print(json.dumps({
+        'app_dir': app_dir,
+        'workers': args.workers,
+        'duration_s': args.duration,
+        'rows_per_form': args.rows,
+        'pragmas': os.environ.get('SQLITE_PRAGMAS', ''),
+        'save': summarize([t for r in collected for t in r['saves']], args.duration),
+        'load': summarize([t for r in collected for t in r['loads']], args.duration),
+        'errors': sum(r['errors'] for r in collected),
+        'lock_errors': sum(r['locked'] for r in collected)
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Login latency under load and its effect on concurrent CR form saves.
+
+A single process imports the app and serves requests from many threads, like
+one gunicorn worker started with --threads. The saver threads first run alone
+for a baseline, then again while the login threads hammer /api/login. Results
+are printed as JSON.
+
+    python benchmarks/login_load.py --login-threads 12 --save-threads 4
+
+PASSWORD_HASH_THREADS / PASSWORD_HASH_METHOD are passed through via
+--hash-threads / --hash-method. To compare against an older revision, point
+--app-dir at a checkout of it:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/login_load.py --app-dir /tmp/before
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+
+from db_concurrency import REPO_DIR, cr_rows, load_app, summarize
+
+USERS = 20
+PASSWORD = 'bench-password'
+
+
+def setup_users(app_module):
+    client = app_module.app.test_client()
+    client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    for i in range(USERS):
+        client.post('/api/users', json={
+            'username': f'bench{i}', 'password': PASSWORD, 'name': f'Bench {i}', 'department': 'it'
+        })
+
+
+def save_loop(app_module, worker_id, args, stop, latencies):
+    client = app_module.app.test_client()
+    client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    iteration = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        client.post('/api/cr-form/save', json={
+            'poKey': f'PO-{worker_id}|B|P|C',
+            'customer': 'Bench',
+            'rows': cr_rows(args.rows, iteration)
+        })
+        latencies.append(time.perf_counter() - started)
+        iteration += 1
+
+
+def login_loop(app_module, worker_id, stop, latencies, failures):
+    client = app_module.app.test_client()
+    iteration = 0
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.post('/api/login', json={
+            'username': f'bench{(worker_id + iteration) % USERS}', 'password': PASSWORD
+        })
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != 200:
+            failures.append(response.status_code)
+        iteration += 1
+
+
+def run_phase(app_module, args, with_logins):
+    stop = threading.Event()
+    saves, logins, failures = [], [], []
+    threads = [threading.Thread(target=save_loop, args=(app_module, i, args, stop, saves))
+               for i in range(args.save_threads)]
+    if with_logins:
+        threads += [threading.Thread(target=login_loop, args=(app_module, i, stop, logins, failures))
+                    for i in range(args.login_threads)]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return saves, logins, failures
+
+
+def run(app_dir, workdir, args, results):
+    app_module = load_app(app_dir, workdir)
+    app_module.init_db()
+    setup_users(app_module)
+
+    baseline, _, _ = run_phase(app_module, args, with_logins=False)
+    saves, logins, failures = run_phase(app_module, args, with_logins=True)
+    results.put({
+        'save_alone': summarize(baseline, args.duration),
+        'save_during_logins': summarize(saves, args.duration),
+        'login': summarize(logins, args.duration),
+        'login_failures': len(failures)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app-dir', default=REPO_DIR)
+    parser.add_argument('--login-threads', type=int, default=12)
+    parser.add_argument('--save-threads', type=int, default=4)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--rows', type=int, default=20)
+    parser.add_argument('--hash-threads', default=None, help='value for PASSWORD_HASH_THREADS')
+    parser.add_argument('--hash-method', default=None, help='value for PASSWORD_HASH_METHOD')
+    args = parser.parse_args()
+
+    if args.hash_threads is not None:
+        os.environ['PASSWORD_HASH_THREADS'] = args.hash_threads
+    if args.hash_method is not None:
+        os.environ['PASSWORD_HASH_METHOD'] = args.hash_method
+    app_dir = os.path.abspath(args.app_dir)
+    workdir = tempfile.mkdtemp(prefix='cr-bench-')
+
+    # A fresh interpreter, so the app module reads the environment set above.
+    ctx = multiprocessing.get_context('spawn')
+    results = ctx.Queue()
+    process = ctx.Process(target=run, args=(app_dir, workdir, args, results))
+    process.start()
+    collected = results.get()
+    process.join()
+
+    print(json.dumps(dict({
+        'app_dir': app_dir,
+        'login_threads': args.login_threads,
+        'save_threads': args.save_threads,
+        'duration_s': args.duration,
+        'password_hash_threads': os.environ.get('PASSWORD_HASH_THREADS', ''),
+        'password_hash_method': os.environ.get('PASSWORD_HASH_METHOD', '')
+    }, **collected), indent=2))
+
+
+if __name__ == '__main__':
+    main()
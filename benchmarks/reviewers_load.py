@@ -0,0 +1,349 @@
+"""Simulated reviewers against a real HTTP server and a throwaway database.
+
+A scratch database is seeded with --pos POs, each with CR, PED and Lead forms,
+and one account per simulated user. The app is then served on a local port
+(werkzeug's threaded server, or gunicorn with --server gunicorn) and every
+user is a thread with its own session that follows the browser's pattern:
+the open form is saved every --save-interval seconds (the autosave debounce),
+polled every --poll-interval seconds with If-None-Match, and now and then
+exported. Each user also keeps the form's /api/form-events stream open, as the
+page does; streams the server refuses (FORM_EVENTS_MAX_STREAMS, set from
+--max-streams) are counted and that user only polls. Results are printed as
+JSON.
+
+    python benchmarks/reviewers_load.py --users 20 --duration 60
+
+With DATABASE_URL set the app (and this script) use that PostgreSQL database
+instead, which should be empty.
+
+To compare against an older revision, point --app-dir at a checkout of it:
+
+    git worktree add /tmp/before <commit>
+    python benchmarks/reviewers_load.py --app-dir /tmp/before
+"""
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from urllib.parse import urlencode
+
+from db_concurrency import REPO_DIR, load_app, summarize
+
+PASSWORD = 'bench-password'
+FORM_MIX = ('cr', 'cr', 'cr', 'ped', 'lead')  # form each user has open, by user number
+OPERATIONS = ('save', 'load', 'export')
+STATES = ['✓', 'x', 'NA', '']
+
+
+def po_key(index):
+    return f'PO-{index:04d}|BID-{index:04d}|P{index:04d}|CR-{index:04d}'
+
+
+def form_payload(form, key, rows, seed):
+    items = []
+    for item in range(1, rows + 1):
+        row = {'part': f'P-{item:04d}', 'desc': f'Part {item}', 'rev': 'A', 'qty': str(item), 'remarks': ''}
+        if form == 'cr':
+            row.update(key=str(item), cycles=[STATES[(item + cycle + seed) % 4] for cycle in range(62)])
+        elif form == 'ped':
+            row.update(key=str(item), pedCycles=[STATES[(item + cycle + seed) % 4] for cycle in range(11)],
+                       notes=['' for _ in range(7)])
+        else:
+            row.update(itemNo=str(item), customerRequiredDate='2025-01-31', standardLeadTime=f'{seed % 12} weeks',
+                       gtnAgreedDate='2025-02-28')
+        items.append(row)
+    customer, bid, po, cr = key.split('|')
+    return {'poKey': key, 'customer': customer, 'bid': bid, 'po': po, 'cr': cr,
+            'recordNo': 'R-1', 'recordDate': '2025-01-01', 'rows': items}
+
+
+def setup(app_dir, workdir, args):
+    app_module = load_app(app_dir, workdir)
+    app_module.init_db()
+    client = app_module.app.test_client()
+    client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    for user in range(args.users):
+        client.post('/api/users', json={'username': f'reviewer{user}', 'password': PASSWORD,
+                                        'name': f'Reviewer {user}', 'department': 'engineering',
+                                        'leadFormAccess': True})
+    for index in range(args.pos):
+        customer, bid, po, cr = po_key(index).split('|')
+        client.post('/api/pos', json={'customer': customer, 'bid': bid, 'po': po, 'cr': cr})
+        for form in ('cr', 'ped', 'lead'):
+            client.post(f'/api/{form}-form/save', json=form_payload(form, po_key(index), args.rows, index))
+
+
+def serve(app_dir, workdir, port):
+    import logging
+    from werkzeug.serving import make_server
+    app_module = load_app(app_dir, workdir)
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    make_server('127.0.0.1', port, app_module.app, threaded=True).serve_forever()
+
+
+def start_server(app_dir, workdir, port, args):
+    if args.server == 'gunicorn':
+        env = dict(os.environ, DATABASE_PATH=os.path.join(workdir, 'contract_review.db'),
+                   PYTHONPATH=app_dir)
+        return subprocess.Popen([sys.executable, '-m', 'gunicorn', '--workers', str(args.workers),
+                                 '--threads', str(args.threads), '--bind', f'127.0.0.1:{port}',
+                                 '--log-level', 'warning', 'app:app'], cwd=workdir, env=env)
+    process = multiprocessing.get_context('spawn').Process(target=serve, args=(app_dir, workdir, port), daemon=True)
+    process.start()
+    return process
+
+
+def stop_server(server):
+    server.terminate()
+    if isinstance(server, subprocess.Popen):
+        server.wait()
+    else:
+        server.join()
+
+
+def wait_for_server(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server did not start on port {port}')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def db_size(workdir):
+    if os.environ.get('DATABASE_URL', '').startswith(('postgres://', 'postgresql://')):
+        import psycopg2
+        with psycopg2.connect(os.environ['DATABASE_URL']) as connection, connection.cursor() as cursor:
+            cursor.execute('SELECT pg_database_size(current_database())')
+            size = cursor.fetchone()[0]
+        connection.close()
+        return size
+    path = os.path.join(workdir, 'contract_review.db')
+    return sum(os.path.getsize(path + suffix) for suffix in ('', '-wal') if os.path.exists(path + suffix))
+
+
+class Browser:
+    """One keep-alive connection with a session cookie, like a browser tab."""
+
+    def __init__(self, port):
+        self.port = port
+        self.connection = None
+        self.cookie = ''
+
+    def request(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookie:
+            headers['Cookie'] = self.cookie
+        if body is not None:
+            body = json.dumps(body).encode('utf-8')
+            headers['Content-Type'] = 'application/json'
+        for attempt in (1, 2):
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=120)
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+        cookie = response.getheader('Set-Cookie')
+        if cookie:
+            self.cookie = cookie.split(';', 1)[0]
+        return response, data
+
+
+def listen(port, cookie, form, key, stop, streams):
+    """Hold the form's event stream open like an EventSource, reconnecting when the server ends it."""
+    query = urlencode({'type': form, 'poKey': key})
+    while not stop.is_set():
+        connection = http.client.HTTPConnection('127.0.0.1', port, timeout=120)
+        streams['connections'].append(connection)
+        try:
+            connection.request('GET', f'/api/form-events?{query}', headers={'Cookie': cookie})
+            response = connection.getresponse()
+            if response.status != 200:
+                # EventSource gives up on an error status; the page falls back to polling.
+                response.read()
+                streams['refused'] += 1
+                return
+            streams['opened'] += 1
+            while not stop.is_set():
+                line = response.fp.readline()
+                if not line:
+                    break
+                if line.startswith(b'event: change'):
+                    streams['events'] += 1
+        except (http.client.HTTPException, OSError, ValueError, AttributeError):
+            # Also raised when the connection is shut down at the end of the run.
+            if not stop.is_set():
+                streams['errors'] += 1
+                time.sleep(1)
+        finally:
+            connection.close()
+
+
+def reviewer(port, user, args, stop, results, streams):
+    rng = random.Random(user)
+    browser = Browser(port)
+    browser.request('POST', '/api/login', {'username': f'reviewer{user}', 'password': PASSWORD})
+    form = FORM_MIX[user % len(FORM_MIX)]
+    key = po_key(user % args.pos)
+    if args.streams:
+        threading.Thread(target=listen, args=(port, browser.cookie, form, key, stop, streams), daemon=True).start()
+    latencies = {operation: [] for operation in OPERATIONS}
+    errors = {operation: 0 for operation in OPERATIONS}
+    locked = 0
+    not_modified = 0
+    etag = None
+    iteration = 0
+
+    now = time.monotonic()
+    due = {
+        'save': now + rng.uniform(0, args.save_interval),
+        'load': now + rng.uniform(0, args.poll_interval),
+        'export': now + rng.expovariate(1 / args.export_interval) if args.export_interval > 0 else float('inf')
+    }
+    while not stop.is_set():
+        operation = min(due, key=due.get)
+        delay = due[operation] - time.monotonic()
+        if delay > 0 and stop.wait(delay):
+            break
+        started = time.perf_counter()
+        try:
+            if operation == 'save':
+                iteration += 1
+                response, data = browser.request('POST', f'/api/{form}-form/save',
+                                                 form_payload(form, key, args.rows, user + iteration))
+            elif operation == 'load':
+                query = urlencode({'poKey': key})
+                response, data = browser.request('GET', f'/api/{form}-form/load?{query}',
+                                                 headers={'If-None-Match': etag} if etag else None)
+                if response.status == 304:
+                    not_modified += 1
+                elif response.status == 200:
+                    etag = response.getheader('ETag')
+            else:
+                query = urlencode({'poKey': key} if args.export_scope == 'po' else {})
+                response, data = browser.request('GET', f'/api/cr-export-excel?{query}')
+            status = response.status
+        except (http.client.HTTPException, OSError):
+            status, data = 0, b''
+        latencies[operation].append(time.perf_counter() - started)
+        if status not in (200, 304):
+            errors[operation] += 1
+            if b'locked' in data:
+                locked += 1
+
+        interval = {'save': args.save_interval, 'load': args.poll_interval}.get(operation)
+        if interval is None:
+            interval = rng.expovariate(1 / args.export_interval)
+        due[operation] = max(due[operation] + interval, time.monotonic())
+
+    results.append({'latencies': latencies, 'errors': errors, 'locked': locked, 'not_modified': not_modified})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app-dir', default=REPO_DIR)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--pos', type=int, default=50)
+    parser.add_argument('--rows', type=int, default=30, help='rows per form')
+    parser.add_argument('--duration', type=float, default=30.0)
+    parser.add_argument('--save-interval', type=float, default=2.0)
+    parser.add_argument('--poll-interval', type=float, default=5.0)
+    parser.add_argument('--export-interval', type=float, default=300.0,
+                        help='mean seconds between exports per user; 0 disables them')
+    parser.add_argument('--export-scope', choices=('po', 'all'), default='po')
+    parser.add_argument('--server', choices=('werkzeug', 'gunicorn'), default='werkzeug')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers')
+    parser.add_argument('--threads', type=int, default=4, help='gunicorn threads per worker')
+    parser.add_argument('--streams', action=argparse.BooleanOptionalAction, default=True,
+                        help='keep a form event stream open per user')
+    parser.add_argument('--max-streams', type=int, default=None,
+                        help='FORM_EVENTS_MAX_STREAMS for the server (default: half of --threads)')
+    args = parser.parse_args()
+    
+    # Inherited by the server, whether spawned or started as gunicorn.
+    max_streams = args.max_streams if args.max_streams is not None else max(1, args.threads // 2)
+    os.environ['FORM_EVENTS_MAX_STREAMS'] = str(max_streams)
+
+    app_dir = os.path.abspath(args.app_dir)
+    workdir = tempfile.mkdtemp(prefix='cr-bench-')
+    # Templates are looked up relative to the working directory.
+    os.symlink(os.path.join(app_dir, 'attached_assets'), os.path.join(workdir, 'attached_assets'))
+    ctx = multiprocessing.get_context('spawn')
+
+    process = ctx.Process(target=setup, args=(app_dir, workdir, args))
+    process.start()
+    process.join()
+    size_before = db_size(workdir)
+
+    port = free_port()
+    server = start_server(app_dir, workdir, port, args)
+    try:
+        wait_for_server(port)
+        stop = threading.Event()
+        collected = []
+        streams = {'opened': 0, 'refused': 0, 'events': 0, 'errors': 0, 'connections': []}
+        threads = [threading.Thread(target=reviewer, args=(port, user, args, stop, collected, streams))
+                   for user in range(args.users)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        for connection in streams.pop('connections'):
+            if connection.sock is not None:
+                try:
+                    connection.sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+        size_after = db_size(workdir)
+    finally:
+        stop_server(server)
+
+    requests = sum(len(r['latencies'][operation]) for r in collected for operation in OPERATIONS)
+    print(json.dumps({
+        'app_dir': app_dir,
+        'server': args.server,
+        'users': args.users,
+        'pos': args.pos,
+        'rows_per_form': args.rows,
+        'duration_s': args.duration,
+        'requests_per_second': round(requests / args.duration, 1),
+        **{operation: summarize([t for r in collected for t in r['latencies'][operation]], args.duration)
+           for operation in OPERATIONS},
+        'load_not_modified': sum(r['not_modified'] for r in collected),
+        'max_streams': max_streams,
+        'streams': streams,
+        'errors': {operation: sum(r['errors'][operation] for r in collected) for operation in OPERATIONS},
+        'lock_errors': sum(r['locked'] for r in collected),
+        'db_bytes_before': size_before,
+        'db_bytes_after': size_after,
+        'db_growth_bytes': size_after - size_before
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
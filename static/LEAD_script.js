@@ -221,6 +221,9 @@
   let autoSaveTimer = null;
   let autoRefreshTimer = null;
   let isRefreshing = false;
+  let formEtag = null;
+  let syncedHeader = {};
+  let syncedRows = new Map();
 
   function showSaveStatus(msg) {
     const status = document.getElementById('saveStatus');
@@ -272,6 +275,28 @@
     return { poKey, customer, bid, po, cr, recordNo, recordDate, rows };
   }
 
+  // Remember what the server holds so autosave can send only the fields and rows that changed.
+  function rememberSynced(data) {
+    const { poKey, rows, ...header } = data;
+    syncedHeader = header;
+    syncedRows = new Map(rows.map(r => [r.itemNo, JSON.stringify(r)]));
+  }
+
+  function buildFormPatch(data) {
+    const { poKey, rows, ...header } = data;
+    const changedHeader = {};
+    Object.keys(header).forEach(k => {
+      if (syncedHeader[k] !== header[k]) changedHeader[k] = header[k];
+    });
+    const changedRows = rows.filter(r => syncedRows.get(r.itemNo) !== JSON.stringify(r));
+    const liveKeys = new Set(rows.map(r => r.itemNo));
+    const deletedKeys = [...syncedRows.keys()].filter(k => !liveKeys.has(k));
+    // Sent only when rows were added, removed or moved, so the server keeps the page's row order.
+    const keys = rows.map(r => r.itemNo).filter(k => k);
+    const order = keys.join('\n') === [...syncedRows.keys()].filter(k => k).join('\n') ? undefined : keys;
+    return { poKey, header: changedHeader, rows: changedRows, deletedKeys, order };
+  }
+
   async function autoSaveForm() {
     const data = collectFormData();
     if (!data.customer || !data.bid || !data.po || !data.cr) {
@@ -281,14 +306,16 @@
     showSaveStatus('Saving...');
     
     try {
-      const response = await fetch('/api/lead-form/save', {
+      const response = await fetch('/api/lead-form/patch', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(data)
+        body: JSON.stringify(buildFormPatch(data))
       });
       
       const result = await response.json();
       if (response.ok && result.success) {
+        if (result.etag) formEtag = `"${result.etag}"`;
+        rememberSynced(data);
         showSaveStatus(`✓ Auto-saved by ${result.lastModifiedBy || 'you'}`);
       } else {
         showSaveStatus('Error saving');
@@ -317,8 +344,9 @@
     const poKey = `${customer}_${bid}_${po}_${cr}`;
     
     try {
-      const response = await fetch(`/api/lead-form/load?poKey=${encodeURIComponent(poKey)}`);
+      const response = await fetch(`/api/lead-form/load?poKey=${encodeURIComponent(poKey)}`, { cache: 'no-store' });
       const result = await response.json();
+      if (response.ok) formEtag = response.headers.get('ETag');
       
       if (response.ok && result.exists) {
         document.getElementById('recordNo').value = result.recordNo || '';
@@ -404,6 +432,7 @@
         });
         
         attachAutoSaveListeners();
+        rememberSynced(collectFormData());
         showSaveStatus(`✓ Loaded - last edited by ${result.lastModifiedBy || 'unknown'}`);
       }
     } catch (error) {
@@ -428,7 +457,14 @@
     const poKey = `${customer}_${bid}_${po}_${cr}`;
     
     try {
-      const response = await fetch(`/api/lead-form/load?poKey=${encodeURIComponent(poKey)}`);
+      const response = await fetch(`/api/lead-form/load?poKey=${encodeURIComponent(poKey)}`, {
+        cache: 'no-store',
+        headers: formEtag ? { 'If-None-Match': formEtag } : {}
+      });
+      if (response.status === 304) {
+        isRefreshing = false;
+        return;
+      }
       const result = await response.json();
       
       if (response.ok && result.exists) {
@@ -436,6 +472,7 @@
         const hasFocus = focusedElement && focusedElement.tagName === 'INPUT';
         
         if (!hasFocus) {
+          formEtag = response.headers.get('ETag');
           document.getElementById('recordNo').value = result.recordNo || '';
           document.getElementById('recordDate').value = result.recordDate || '';
           
@@ -557,6 +594,7 @@
               }
             }
           });
+          rememberSynced(collectFormData());
         }
       }
     } catch (error) {
@@ -594,7 +632,21 @@
         loadFormData();
         attachAutoSaveListeners();
         if (isAdmin) {
-          autoRefreshTimer = setInterval(autoRefreshForm, 5000);
+          if (window.EventSource) {
+            // The server pushes a 'change' event after every save; the slow poll is only a safety net.
+            const events = new EventSource(`/api/form-events?type=lead&poKey=${encodeURIComponent(`${customer}_${bid}_${po}_${cr}`)}`);
+            events.addEventListener('change', autoRefreshForm);
+            events.addEventListener('error', () => {
+              // Refused (the server caps open streams) or gone: fall back to the ETag poll.
+              if (events.readyState === EventSource.CLOSED) {
+                clearInterval(autoRefreshTimer);
+                autoRefreshTimer = setInterval(autoRefreshForm, 5000);
+              }
+            });
+            autoRefreshTimer = setInterval(autoRefreshForm, 30000);
+          } else {
+            autoRefreshTimer = setInterval(autoRefreshForm, 5000);
+          }
         }
       }, 100);
     }
@@ -502,6 +502,9 @@
   let isSaving = false;
   let isDirty = false;
   let lastSaveTime = null;
+  let formEtag = null;
+  let syncedHeader = {};
+  let syncedRows = new Map();
   let lastEditTime = null;
   let saveStartTime = null;
   
@@ -548,6 +551,38 @@
     return rows;
   }
   
+  function collectHeader() {
+    return {
+      customer: document.getElementById('customerName')?.value || urlCustomer || '',
+      bid: document.getElementById('bidDt')?.value || urlBid || '',
+      po: document.getElementById('poRevDt')?.value || urlPo || '',
+      cr: document.getElementById('crRevDt')?.value || urlCr || '',
+      recordNo: document.getElementById('recordNo')?.value || '',
+      recordDate: document.getElementById('recordDate')?.value || '',
+      amendmentDetails: document.getElementById('amendmentDetailsText')?.value || ''
+    };
+  }
+  
+  // Remember what the server holds so autosave can send only the fields and rows that changed.
+  function rememberSynced(header, rows) {
+    syncedHeader = { ...header };
+    syncedRows = new Map(rows.filter(r => r.key).map(r => [r.key, JSON.stringify(r)]));
+  }
+  
+  function buildFormPatch(header, rows) {
+    const changedHeader = {};
+    Object.keys(header).forEach(k => {
+      if (syncedHeader[k] !== header[k]) changedHeader[k] = header[k];
+    });
+    const changedRows = rows.filter(r => r.key && syncedRows.get(r.key) !== JSON.stringify(r));
+    const liveKeys = new Set(rows.map(r => r.key));
+    const deletedKeys = [...syncedRows.keys()].filter(k => !liveKeys.has(k));
+    // Sent only when rows were added, removed or moved, so the server keeps the page's row order.
+    const keys = rows.filter(r => r.key).map(r => r.key);
+    const order = keys.join('\n') === [...syncedRows.keys()].join('\n') ? undefined : keys;
+    return { header: changedHeader, rows: changedRows, deletedKeys, order };
+  }
+  
   async function autoSaveForm() {
     const poKey = getPoKey();
     if (!poKey || poKey === '|||') return;
@@ -558,36 +593,28 @@
     
     showSaveIndicator('💾 Saving...');
     
-    const customer = document.getElementById('customerName')?.value || urlCustomer || '';
-    const bid = document.getElementById('bidDt')?.value || urlBid || '';
-    const po = document.getElementById('poRevDt')?.value || urlPo || '';
-    const cr = document.getElementById('crRevDt')?.value || urlCr || '';
-    const recordNo = document.getElementById('recordNo')?.value || '';
-    const recordDate = document.getElementById('recordDate')?.value || '';
-    const amendmentDetails = document.getElementById('amendmentDetailsText')?.value || '';
-    
+    const header = collectHeader();
     const rows = buildPEDObjectsFromDOM();
+    const patch = buildFormPatch(header, rows);
     
     try {
-      const response = await fetch('/api/ped-form/save', {
+      const response = await fetch('/api/ped-form/patch', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           poKey: poKey,
-          customer: customer,
-          bid: bid,
-          po: po,
-          cr: cr,
-          recordNo: recordNo,
-          recordDate: recordDate,
-          amendmentDetails: amendmentDetails,
-          rows: rows
+          header: patch.header,
+          rows: patch.rows,
+          deletedKeys: patch.deletedKeys,
+          order: patch.order
         })
       });
       
       if (response.ok) {
         const data = await response.json();
         lastSaveTime = new Date();
+        if (data.etag) formEtag = `"${data.etag}"`;
+        rememberSynced(header, rows);
         
         if (!lastEditTime || lastEditTime <= saveStartTime) {
           isDirty = false;
@@ -623,8 +650,9 @@
     if (!poKey || poKey === '|||') return;
     
     try {
-      const response = await fetch(`/api/ped-form/load?poKey=${encodeURIComponent(poKey)}`);
+      const response = await fetch(`/api/ped-form/load?poKey=${encodeURIComponent(poKey)}`, { cache: 'no-store' });
       if (response.ok) {
+        formEtag = response.headers.get('ETag');
         const data = await response.json();
         if (data.exists && data.rows && data.rows.length > 0) {
           showSaveIndicator('📥 Loading saved data...');
@@ -639,6 +667,7 @@
             document.getElementById('amendmentDetailsText').value = data.amendmentDetails;
           }
           enforcePEDAccess();
+          rememberSynced(collectHeader(), buildPEDObjectsFromDOM());
           if (data.lastModifiedBy) {
             setTimeout(() => {
               showSaveIndicator(`✓ Loaded (last saved by ${data.lastModifiedBy})`);
@@ -658,19 +687,22 @@
     if (isSaving || isDirty) return;
     
     try {
-      const response = await fetch(`/api/ped-form/load?poKey=${encodeURIComponent(poKey)}`);
+      const response = await fetch(`/api/ped-form/load?poKey=${encodeURIComponent(poKey)}`, {
+        cache: 'no-store',
+        headers: formEtag ? { 'If-None-Match': formEtag } : {}
+      });
+      if (response.status === 304) return;
       if (response.ok) {
+        formEtag = response.headers.get('ETag');
         const data = await response.json();
-        if (data.exists && data.lastModifiedAt) {
-          const serverTime = new Date(data.lastModifiedAt);
-          if (!lastSaveTime || serverTime > lastSaveTime) {
-            applyPEDDataToDOM(data.rows);
-            if (data.recordNo) document.getElementById('recordNo').value = data.recordNo;
-            if (data.recordDate) document.getElementById('recordDate').value = data.recordDate;
-            if (data.amendmentDetails) document.getElementById('amendmentDetailsText').value = data.amendmentDetails;
-            enforcePEDAccess();
-            lastSaveTime = serverTime;
-          }
+        if (data.exists) {
+          applyPEDDataToDOM(data.rows);
+          if (data.recordNo) document.getElementById('recordNo').value = data.recordNo;
+          if (data.recordDate) document.getElementById('recordDate').value = data.recordDate;
+          if (data.amendmentDetails) document.getElementById('amendmentDetailsText').value = data.amendmentDetails;
+          enforcePEDAccess();
+          rememberSynced(collectHeader(), buildPEDObjectsFromDOM());
+          lastSaveTime = new Date(data.lastModifiedAt);
         }
       }
     } catch (err) {
@@ -680,7 +712,21 @@
   
   function startAutoRefresh() {
     if (autoRefreshTimer) clearInterval(autoRefreshTimer);
-    autoRefreshTimer = setInterval(autoRefreshForm, 5000);
+    if (window.EventSource) {
+      // The server pushes a 'change' event after every save; the slow poll is only a safety net.
+      const events = new EventSource(`/api/form-events?type=ped&poKey=${encodeURIComponent(getPoKey())}`);
+      events.addEventListener('change', autoRefreshForm);
+      events.addEventListener('error', () => {
+        // Refused (the server caps open streams) or gone: fall back to the ETag poll.
+        if (events.readyState === EventSource.CLOSED) {
+          clearInterval(autoRefreshTimer);
+          autoRefreshTimer = setInterval(autoRefreshForm, 5000);
+        }
+      });
+      autoRefreshTimer = setInterval(autoRefreshForm, 30000);
+    } else {
+      autoRefreshTimer = setInterval(autoRefreshForm, 5000);
+    }
   }
   
   function attachAutoSaveListeners() {
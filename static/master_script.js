@@ -12,6 +12,9 @@
   const restoreBtn = document.getElementById('restoreBtn');
   const restoreInput = document.getElementById('restoreInput');
   const exportExcelBtn = document.getElementById('exportExcelBtn');
+  const poSearch = document.getElementById('poSearch');
+  const poCount = document.getElementById('poCount');
+  const loadMoreBtn = document.getElementById('loadMorePOs');
 
   let pos = [];
   let editingId = null;
@@ -35,31 +38,64 @@
     return Object.keys(data).map(k => `${encodeURIComponent(k)}=${encodeURIComponent(data[k])}`).join('&');
   }
 
-  async function loadPOs() {
+  // POs are fetched a page at a time (newest first); search runs server-side.
+  let nextCursor = null;
+  let searchTimer = null;
+  let loadSeq = 0;
+
+  async function loadPOs(append = false) {
+    const seq = ++loadSeq;
     try {
-      const response = await fetch('/api/pos');
+      const params = { q: poSearch.value.trim() };
+      if (append && nextCursor !== null) params.cursor = nextCursor;
+      const response = await fetch(`/api/pos/summary?${encodeParams(params)}`);
       if (response.ok) {
-        pos = await response.json();
-        renderPOs();
+        const page = await response.json();
+        if (seq !== loadSeq) return; // a newer search superseded this one
+        pos = append ? pos.concat(page.pos) : page.pos;
+        nextCursor = page.nextCursor;
+        poCount.textContent = `Showing ${pos.length} of ${page.total}`;
+        loadMoreBtn.style.display = nextCursor !== null ? '' : 'none';
+        renderPOs(append ? page.pos : pos, append);
       }
     } catch (err) {
       console.error('Failed to load POs:', err);
     }
   }
 
-  function renderPOs() {
-    poContainer.innerHTML = '';
+  poSearch.addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => loadPOs(), 250);
+  });
+  loadMoreBtn.addEventListener('click', () => loadPOs(true));
+
+  const FORM_LABELS = { cr: 'CR', ped: 'PED', lead: 'Lead' };
+
+  function formBadges(forms) {
+    return Object.keys(FORM_LABELS).map((type) => {
+      const f = forms?.[type];
+      if (!f || !f.exists) return `<span class="form-badge missing">${FORM_LABELS[type]}: not started</span>`;
+      const title = `${f.rows} rows, ${f.filledCells}/${f.totalCells} filled` +
+        (f.lastModifiedBy ? ` — last saved by ${f.lastModifiedBy} at ${f.lastModifiedAt}` : '');
+      return `<span class="form-badge ${f.status}" title="${title}">${FORM_LABELS[type]}: ${Math.round(f.filledRatio * 100)}%</span>`;
+    }).join('');
+  }
+
+  function renderPOs(items, append = false) {
+    if (!append) poContainer.innerHTML = '';
     if (pos.length === 0) {
+      noPO.textContent = poSearch.value.trim() ? 'No POs match your search.' : 'No POs added yet. Add one above!';
       noPO.style.display = 'block';
       return;
     }
     noPO.style.display = 'none';
-    pos.forEach((po) => {
+    items.forEach((po) => {
       const item = document.createElement('div');
       item.className = 'po-item';
       item.innerHTML = `
         <div class="po-details">
           <strong>${po.po}</strong> — Customer: ${po.customer}, BID: ${po.bid}, CR: ${po.cr}
+          <div class="form-badges">${formBadges(po.forms)}</div>
         </div>
         <div class="po-actions">
           <button class="open-form" data-id="${po.id}" data-form="CR">Contract Review</button>
@@ -112,7 +148,7 @@
     if (e.target.classList.contains('open-form')) {
       const po = pos.find(p => p.id === id);
       if (!po) return;
-      const params = encodeParams(po);
+      const params = encodeParams({ customer: po.customer, bid: po.bid, po: po.po, cr: po.cr });
       const type = e.target.dataset.form;
       const url = type === 'CR' ? `CR_index_all.html?${params}` :
                   type === 'PED' ? `PED_index.html?${params}` :
@@ -148,14 +184,11 @@
     try {
       const response = await fetch('/api/backup');
       if (response.ok) {
-        const data = await response.json();
-        const text = JSON.stringify(data, null, 2);
-        const blob = new Blob([text], { type: 'text/plain' });
-        const dt = new Date();
-        const ts = `${dt.getFullYear()}${String(dt.getMonth()+1).padStart(2,'0')}${String(dt.getDate()).padStart(2,'0')}-${String(dt.getHours()).padStart(2,'0')}${String(dt.getMinutes()).padStart(2,'0')}${String(dt.getSeconds()).padStart(2,'0')}`;
+        const blob = await response.blob();
+        const match = /filename=([^;]+)/.exec(response.headers.get('Content-Disposition') || '');
         const a = document.createElement('a');
         a.href = URL.createObjectURL(blob);
-        a.download = `gtn-contract-review-backup-${ts}.txt`;
+        a.download = match ? match[1] : 'gtn-contract-review-backup.ndjson.gz';
         a.click();
         setTimeout(()=>URL.revokeObjectURL(a.href), 1500);
       } else {
@@ -167,8 +200,30 @@
     }
   }
 
+  async function sendRestore(request) {
+    const response = await fetch('/api/restore', Object.assign({ method: 'POST' }, request));
+    if (response.ok) {
+      alert('Restore completed. Logging out...');
+      await fetch('/api/logout', { method: 'POST' });
+      window.location.href = 'login.html';
+    } else {
+      const data = await response.json();
+      alert('Failed to restore: ' + (data.error || 'Unknown error'));
+    }
+  }
+
   function restoreData(file) {
     if (!file) return;
+    // Full backups are uploaded as-is and validated by the server while it
+    // reads them; .txt files are the older users/POs-only JSON format.
+    if (!/\.txt$/i.test(file.name)) {
+      if (!confirm('Restore will replace all current Users, POs and forms. Proceed?')) return;
+      sendRestore({ headers: { 'Content-Type': 'application/octet-stream' }, body: file }).catch(err => {
+        console.error(err);
+        alert('Failed to restore: ' + (err.message || 'Invalid file'));
+      });
+      return;
+    }
     const reader = new FileReader();
     reader.onload = async () => {
       try {
@@ -184,20 +239,10 @@
         }
         if (!confirm('Restore will replace current Users and POs. Proceed?')) return;
 
-        const response = await fetch('/api/restore', {
-          method: 'POST',
+        await sendRestore({
           headers: { 'Content-Type': 'application/json' },
           body: JSON.stringify(obj)
         });
-
-        if (response.ok) {
-          alert('Restore completed. Logging out...');
-          await fetch('/api/logout', { method: 'POST' });
-          window.location.href = 'login.html';
-        } else {
-          const data = await response.json();
-          alert('Failed to restore: ' + (data.error || 'Unknown error'));
-        }
       } catch (err) {
         console.error(err);
         alert('Failed to restore: ' + (err.message || 'Invalid file'));
@@ -212,30 +257,42 @@
     restoreInput.addEventListener('change', (e) => restoreData(e.target.files?.[0]));
   }
 
+  const sleep = (ms) => new Promise(resolve => setTimeout(resolve, ms));
+
+  // Exports run as server-side jobs; identical requests (e.g. after a page
+  // reload) are attached to the job already in progress.
+  async function runExportJob() {
+    let response = await fetch('/api/exports', { method: 'POST' });
+    let job = await response.json();
+    if (!response.ok) throw new Error(job.error || 'Unknown error');
+    
+    while (job.status === 'queued' || job.status === 'running') {
+      exportExcelBtn.textContent = `Exporting... ${job.formsDone}/${job.formsTotal}`;
+      await sleep(1000);
+      response = await fetch(`/api/exports/${job.jobId}`, { cache: 'no-store' });
+      job = await response.json();
+      if (!response.ok) throw new Error(job.error || 'Unknown error');
+    }
+    if (job.status !== 'done') throw new Error(job.error || `Export ${job.status}`);
+    return job;
+  }
+
   exportExcelBtn.addEventListener('click', async () => {
     try {
       exportExcelBtn.disabled = true;
       exportExcelBtn.textContent = 'Exporting...';
       
-      const response = await fetch('/api/cr-export-excel');
-      if (response.ok) {
-        const blob = await response.blob();
-        const url = URL.createObjectURL(blob);
-        const a = document.createElement('a');
-        a.href = url;
-        a.download = 'CR_Export.zip';
-        document.body.appendChild(a);
-        a.click();
-        document.body.removeChild(a);
-        setTimeout(() => URL.revokeObjectURL(url), 1500);
-        alert('Excel export completed! Check your downloads for CR_Export.zip containing 3 Excel files.');
-      } else {
-        const data = await response.json();
-        alert('Export failed: ' + (data.error || 'Unknown error'));
-      }
+      const job = await runExportJob();
+      const a = document.createElement('a');
+      a.href = job.downloadUrl;
+      a.download = 'CR_Export.zip';
+      document.body.appendChild(a);
+      a.click();
+      document.body.removeChild(a);
+      alert('Excel export completed! Check your downloads for CR_Export.zip containing 3 Excel files.');
     } catch (err) {
       console.error('Export error:', err);
-      alert('Failed to export: ' + err.message);
+      alert('Export failed: ' + err.message);
     } finally {
       exportExcelBtn.disabled = false;
       exportExcelBtn.textContent = 'Export to Excel';
@@ -0,0 +1,118 @@
+"""Fixtures: the app pointed at a throwaway database for each test.
+
+``backend_app`` runs a test against SQLite and PostgreSQL. The PostgreSQL
+server is TEST_DATABASE_URL if set, otherwise one started with pgserver for
+the session; without either those tests are skipped.
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+# Templates and the logo are looked up relative to the working directory.
+os.chdir(REPO_DIR)
+
+import app as app_module
+
+
+def use_scratch_files(module, tmp_path, monkeypatch):
+    monkeypatch.setattr(module, 'DATABASE', str(tmp_path / 'test.db'))
+    monkeypatch.setattr(module, 'EXPORT_DIR', str(tmp_path / 'exports'))
+    monkeypatch.setattr(module, 'SNAPSHOT_DIR', str(tmp_path / 'snapshots'))
+    module._auth_cache.clear()
+    module.app.testing = True
+
+
+def log_in(module):
+    client = module.app.test_client()
+    response = client.post('/api/login', json={'username': 'admin', 'password': 'admin'})
+    assert response.status_code == 200
+    return client
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    use_scratch_files(app_module, tmp_path, monkeypatch)
+    app_module.init_db()
+    return app_module
+
+
+@pytest.fixture
+def client(app):
+    return log_in(app)
+
+
+@pytest.fixture
+def cr_rows():
+    """Build CR save rows for item numbers ``keys``: ``cr_rows(['1', '2'], remarks='...')``."""
+    def build(keys, remarks=''):
+        return [{'key': key, 'part': f'P-{key}', 'desc': '', 'rev': 'A', 'qty': '1', 'cycles': ['✓'] * 72,
+                 'remarks': remarks} for key in keys]
+    return build
+
+
+@pytest.fixture(scope='session')
+def postgres_url(tmp_path_factory):
+    url = os.environ.get('TEST_DATABASE_URL')
+    if url:
+        return url
+    try:
+        import pgserver
+        import psycopg2
+    except ImportError:
+        pytest.skip('PostgreSQL tests need TEST_DATABASE_URL or pgserver')
+    server = pgserver.get_server(tmp_path_factory.mktemp('pgdata'))
+    url = server.get_uri()
+    conn = psycopg2.connect(url)
+    conn.autocommit = True
+    conn.cursor().execute('CREATE DATABASE contract_review_test')
+    conn.close()
+    return url.replace('/postgres?', '/contract_review_test?')
+
+
+@pytest.fixture(scope='session')
+def postgres_module(postgres_url):
+    """A second copy of app.py, imported with DATABASE_URL set.
+
+    The backend is chosen from module-level constants at import, so the
+    PostgreSQL copy cannot share the SQLite module.
+    """
+    previous = os.environ.get('DATABASE_URL')
+    os.environ['DATABASE_URL'] = postgres_url
+    try:
+        spec = importlib.util.spec_from_file_location('app_postgres', os.path.join(REPO_DIR, 'app.py'))
+        module = importlib.util.module_from_spec(spec)
+        sys.modules['app_postgres'] = module
+        spec.loader.exec_module(module)
+    finally:
+        if previous is None:
+            del os.environ['DATABASE_URL']
+        else:
+            os.environ['DATABASE_URL'] = previous
+    return module
+
+
+@pytest.fixture
+def postgres_app(postgres_module, tmp_path, monkeypatch):
+    db = postgres_module.connect_db()
+    try:
+        db.execute('DROP SCHEMA public CASCADE')
+        db.execute('CREATE SCHEMA public')
+    finally:
+        db.close()
+    use_scratch_files(postgres_module, tmp_path, monkeypatch)
+    postgres_module.init_db()
+    return postgres_module
+
+
+@pytest.fixture(params=['sqlite', 'postgres'])
+def backend_app(request):
+    return request.getfixturevalue('app' if request.param == 'sqlite' else 'postgres_app')
+
+
+@pytest.fixture
+def backend_client(backend_app):
+    return log_in(backend_app)
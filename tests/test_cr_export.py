@@ -0,0 +1,34 @@
+import io
+import zipfile
+
+import pytest
+
+
+def save_forms(client, rows, count):
+    for index in range(count):
+        response = client.post('/api/cr-form/save', json={
+            'poKey': f'C{index}|B|P|R', 'customer': f'Customer {index}', 'rows': rows
+        })
+        assert response.status_code == 200
+
+
+@pytest.mark.parametrize('forms', [3, 12])
+def test_export_reads_all_rows_in_one_query(app, client, cr_rows, monkeypatch, forms):
+    monkeypatch.setattr(app, 'EXPORT_PROCESSES', 1)
+    save_forms(client, cr_rows(['1', '2', '3']), forms)
+    db = app.connect_db()
+    records = app.fetch_cr_export_forms(db)
+    before = db.query_count
+    entries = list(app.cr_export_entries(db, records))
+    assert db.query_count - before == 1
+    assert len(entries) == forms * len(app.CR_TEMPLATES)
+    db.close()
+
+
+def test_export_endpoint_zips_three_workbooks_per_form(client, cr_rows):
+    save_forms(client, cr_rows(['1', '2', '3']), 2)
+    response = client.get('/api/cr-export-excel')
+    assert response.status_code == 200
+    names = zipfile.ZipFile(io.BytesIO(response.data)).namelist()
+    assert names == ['CR_1_1_Customer 0.xlsx', 'CR_2_1_Customer 0.xlsx', 'CR_3_1_Customer 0.xlsx',
+                     'CR_1_2_Customer 1.xlsx', 'CR_2_2_Customer 1.xlsx', 'CR_3_2_Customer 1.xlsx']
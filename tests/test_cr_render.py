@@ -0,0 +1,66 @@
+"""The template-splice CR renderer against openpyxl: the workbooks must match
+part for part, apart from the modified date."""
+import io
+import random
+import re
+import zipfile
+
+import pytest
+
+import app as app_module
+
+STATES = ['✓', 'x', 'NA', '']
+AWKWARD = ['', 'PO-0117/Rev A', ' leading space', 'trailing space ', 'a & b <c> "d"', 'two\nlines', 'Ünïcode ✓',
+           '0123', '=SUM(A1:A3)', 'tab\there', 'carriage\r\nreturn', 'x' * 300]
+HEADER = ('record_no', 'record_date', 'customer', 'bid', 'po', 'cr', 'amendment_details')
+MODIFIED = re.compile(rb'<dcterms:modified[^<]*')
+
+
+def random_form(rng):
+    form = {key: f'Value {rng.randrange(1000)}' for key in HEADER}
+    rows = [{'item_no': str(item), 'part_number': f'P-{item}', 'part_description': f'Part {item}', 'rev': 'A',
+             'qty': str(rng.randrange(1, 50)), 'cycles': [rng.choice(STATES) for _ in range(rng.choice((72, 40, 0)))],
+             'remarks': rng.choice(['', 'ok'])}
+            for item in range(1, rng.randint(0, 6) + 1)]
+    return form, rows
+
+
+def unzipped(data):
+    archive = zipfile.ZipFile(io.BytesIO(data))
+    assert archive.testzip() is None
+    return {name: MODIFIED.sub(b'', archive.read(name)) for name in archive.namelist()}
+
+
+def rendered_by_openpyxl(template_key, form, rows):
+    try:
+        return unzipped(app_module.render_cr_workbook_openpyxl(template_key, form, rows))
+    except Exception as e:
+        return type(e)
+
+
+def rendered(template_key, form, rows):
+    try:
+        return unzipped(app_module.render_cr_workbook(template_key, form, rows))
+    except Exception as e:
+        return type(e)
+
+
+@pytest.mark.parametrize('template_key', sorted(app_module.CR_TEMPLATES))
+def test_splice_matches_openpyxl(template_key):
+    splice = app_module.load_cr_splice(template_key)
+    assert splice is not None, 'template failed the splice self-check and falls back to openpyxl'
+    rng = random.Random(template_key)
+    for _ in range(20):
+        form, rows = random_form(rng)
+        data = splice.render(form, rows)
+        assert data is not None
+        assert unzipped(data) == rendered_by_openpyxl(template_key, form, rows)
+
+
+@pytest.mark.parametrize('template_key', sorted(app_module.CR_TEMPLATES))
+@pytest.mark.parametrize('value', AWKWARD)
+def test_awkward_values_match_openpyxl(template_key, value):
+    form = dict.fromkeys(HEADER, value)
+    rows = [{'item_no': '1', 'part_number': value, 'part_description': value, 'rev': value, 'qty': value,
+             'cycles': ['✓'] * 72, 'remarks': value}]
+    assert rendered(template_key, form, rows) == rendered_by_openpyxl(template_key, form, rows)
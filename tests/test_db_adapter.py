@@ -0,0 +1,174 @@
+"""The PostgreSQL adapter: statement translation and COPY units, and the same
+round trips run on both backends."""
+import threading
+import time
+
+import pytest
+
+import app as app_module
+
+AWKWARD = ['plain', '50% off', 'what?', "it's", 'tab\there', 'two\nlines', 'cr\r\nlf', 'back\\slash', '\\N',
+           'Ünïcode ✓', '']
+
+
+@pytest.mark.parametrize('sql, statement, kind', [
+    ('SELECT * FROM pos WHERE customer = ? AND bid = ?', 'SELECT * FROM pos WHERE customer = %s AND bid = %s', 'read'),
+    ("SELECT customer FROM pos WHERE customer LIKE ? || '%'", "SELECT customer FROM pos WHERE customer LIKE %s || '%%'",
+     'read'),
+    ('  UPDATE pos SET cr = ? WHERE id = ?  ', 'UPDATE pos SET cr = %s WHERE id = %s', 'write'),
+    ('DELETE FROM pos WHERE id = ?', 'DELETE FROM pos WHERE id = %s', 'write'),
+    ('BEGIN', 'BEGIN ISOLATION LEVEL REPEATABLE READ', 'begin'),
+    ('begin', 'BEGIN ISOLATION LEVEL REPEATABLE READ', 'begin'),
+    ('BEGIN IMMEDIATE', 'BEGIN', 'begin'),
+])
+def test_postgres_statement(sql, statement, kind):
+    assert app_module.postgres_statement(sql)[:2] == (statement, kind)
+
+
+def test_postgres_statement_splits_single_row_inserts():
+    statement, kind, values = app_module.postgres_statement(
+        'INSERT INTO pos (customer, bid, po, cr) VALUES (?, ?, ?, ?) ON CONFLICT DO NOTHING')
+    assert kind == 'write'
+    assert values == ('INSERT INTO pos (customer, bid, po, cr) VALUES ', '(%s, %s, %s, %s)', ' ON CONFLICT DO NOTHING')
+    assert ''.join(values) == statement
+    assert app_module.postgres_statement('INSERT INTO pos SELECT * FROM pos')[2] is None
+
+
+@pytest.mark.parametrize('value, field', [
+    ('tab\there', 'tab\\there'),
+    ('a\nb\r\\c', 'a\\nb\\r\\\\c'),
+    ('\\N', '\\\\N'),
+    (None, '\\N'),
+    (b'\x00\xff', '\\\\x00ff'),
+    (True, '1'),
+    (7, '7'),
+    (1.5, '1.5'),
+])
+def test_postgres_copy_value(value, field):
+    assert app_module.postgres_copy_value(value) == field
+
+
+def test_postgres_copy_value_rejects_containers():
+    with pytest.raises(TypeError):
+        app_module.postgres_copy_value({'a': 1})
+
+
+def test_copy_rows_round_trip(postgres_app):
+    db = postgres_app.connect_db()
+    try:
+        rows = [(text, f'B{i}', 'P', 'R') for i, text in enumerate(AWKWARD)]
+        db.copy_rows('pos', ('customer', 'bid', 'po', 'cr'), rows)
+        assert db.in_transaction
+        db.commit()
+        stored = db.execute('SELECT customer, bid, po, cr FROM pos ORDER BY id').fetchall()
+        assert [tuple(row) for row in stored] == rows
+    finally:
+        db.close()
+
+
+def test_placeholders_and_percent_signs_round_trip(backend_app):
+    db = backend_app.connect_db()
+    try:
+        db.executemany('INSERT INTO pos (customer, bid, po, cr) VALUES (?, ?, ?, ?)',
+                       [(text, 'B', 'P', str(i)) for i, text in enumerate(AWKWARD)])
+        db.commit()
+        assert [row['customer'] for row in db.execute('SELECT customer FROM pos ORDER BY id')] == AWKWARD
+        found = db.execute("SELECT cr FROM pos WHERE customer LIKE ? || '%' AND bid = ?", ('50', 'B')).fetchone()
+        assert dict(found) == {'cr': '1'}
+    finally:
+        db.close()
+
+
+def test_writes_open_a_transaction_until_commit(backend_app):
+    db = backend_app.connect_db()
+    try:
+        db.execute("INSERT INTO pos (customer, bid, po, cr) VALUES ('C', 'B', 'P', 'R')")
+        assert db.in_transaction
+        db.rollback()
+        assert db.execute('SELECT COUNT(*) AS n FROM pos').fetchone()['n'] == 0
+
+        db.execute('BEGIN IMMEDIATE')
+        db.execute("INSERT INTO pos (customer, bid, po, cr) VALUES ('C', 'B', 'P', 'R')")
+        db.commit()
+        assert not db.in_transaction
+        assert db.execute('SELECT COUNT(*) AS n FROM pos').fetchone()['n'] == 1
+    finally:
+        db.close()
+
+
+def test_begin_reads_one_snapshot(backend_app):
+    reader, writer = backend_app.connect_db(), backend_app.connect_db()
+    try:
+        reader.execute('BEGIN')
+        assert reader.execute('SELECT COUNT(*) AS n FROM pos').fetchone()['n'] == 0
+        writer.execute("INSERT INTO pos (customer, bid, po, cr) VALUES ('C', 'B', 'P', 'R')")
+        writer.commit()
+        assert reader.execute('SELECT COUNT(*) AS n FROM pos').fetchone()['n'] == 0
+        reader.commit()
+        assert reader.execute('SELECT COUNT(*) AS n FROM pos').fetchone()['n'] == 1
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_backup_restore_round_trip(backend_app, backend_client):
+    rows = [{'key': str(i), 'part': text, 'desc': text, 'rev': 'A', 'qty': '1', 'cycles': ['✓', 'x', ''] * 24,
+             'remarks': text} for i, text in enumerate(AWKWARD)]
+    assert backend_client.post('/api/pos', json={'customer': 'C\tx', 'bid': 'B', 'po': 'P', 'cr': 'R'}).status_code in (200, 201)
+    assert backend_client.post('/api/cr-form/save', json={'poKey': 'C|B|P|R', 'rows': rows}).status_code == 200
+    before = backend_client.get('/api/cr-form/load', query_string={'poKey': 'C|B|P|R'}).get_json()['rows']
+
+    backup = backend_client.get('/api/backup').get_data()
+    backend_client.post('/api/cr-form/save', json={'poKey': 'C|B|P|R', 'rows': rows[:1]})
+    response = backend_client.post('/api/restore', data=backup, content_type='application/gzip')
+    assert response.status_code == 200, response.get_json()
+
+    assert backend_client.get('/api/cr-form/load', query_string={'poKey': 'C|B|P|R'}).get_json()['rows'] == before
+    assert [po['customer'] for po in backend_client.get('/api/pos').get_json()['pos']] == ['C\tx']
+    # Sequences were moved past the restored ids.
+    assert backend_client.post('/api/pos', json={'customer': 'D', 'bid': 'B', 'po': 'P', 'cr': 'R'}).status_code in (200, 201)
+
+
+def test_track_form_change_gaps(monkeypatch):
+    gaps = {}
+    monkeypatch.setattr(app_module, '_form_changes_gaps', gaps)
+    app_module.track_form_change_gaps(3, [5, 8])
+    assert sorted(gaps) == [4, 6, 7]
+    app_module.track_form_change_gaps(8, [6, 9])
+    assert sorted(gaps) == [4, 7]
+    app_module.track_form_change_gaps(9, [5000])
+    assert len(gaps) == app_module.FORM_CHANGES_MAX_GAPS and min(gaps) == 5000 - app_module.FORM_CHANGES_MAX_GAPS
+    monkeypatch.setattr(app_module, 'FORM_CHANGES_GAP_SECONDS', -1)
+    app_module.track_form_change_gaps(5000, [])
+    assert gaps == {}
+
+
+def test_watcher_delivers_changes_committed_out_of_order(postgres_app, monkeypatch):
+    monkeypatch.setattr(postgres_app, 'FORM_EVENTS_POLL_INTERVAL', 0.05)
+    with postgres_app.app.app_context():
+        postgres_app.start_form_changes_watcher()
+
+    def delivered(po_key):
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            seen = [change['po_key'] for change in postgres_app._form_changes]
+            if po_key in seen:
+                return seen
+            time.sleep(0.05)
+        raise AssertionError(f'{po_key} not delivered')
+
+    late, early = postgres_app.connect_db(), postgres_app.connect_db()
+    try:
+        postgres_app.publish_form_change(late, 'cr', 'late', 1, 'a')
+        # Without a global lock the second save does not wait for the first.
+        saved = threading.Event()
+        threading.Thread(target=lambda: (postgres_app.publish_form_change(early, 'cr', 'early', 1, 'b'),
+                                         early.commit(), saved.set())).start()
+        assert saved.wait(5)
+        delivered('early')
+        late.commit()
+    finally:
+        late.close()
+        early.close()
+    assert delivered('late')[-2:] == ['early', 'late']
+    assert not postgres_app._form_changes_gaps
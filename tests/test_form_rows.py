@@ -0,0 +1,73 @@
+import pytest
+
+
+def save(client, rows):
+    return client.post('/api/cr-form/save', json={'poKey': 'C|B|P|R', 'customer': 'C', 'rows': rows})
+
+
+def patch(client, rows=(), deleted=(), order=None):
+    body = {'poKey': 'C|B|P|R', 'rows': list(rows), 'deletedKeys': list(deleted)}
+    if order is not None:
+        body['order'] = order
+    return client.post('/api/cr-form/patch', json=body)
+
+
+def loaded_keys(client):
+    return [row['key'] for row in client.get('/api/cr-form/load', query_string={'poKey': 'C|B|P|R'}).get_json()['rows']]
+
+
+@pytest.mark.parametrize('first, second', [
+    (['1', '2', '3'], ['1', '1A', '2', '3']),
+    (['1', '2', '3'], ['3', '2', '1']),
+    (['1', '2', '3'], ['2', '3']),
+    (['1', '2'], ['1', '2', '3']),
+])
+def test_full_save_keeps_page_order(client, first, second, cr_rows):
+    assert save(client, cr_rows(first)).status_code == 200
+    assert save(client, cr_rows(second)).status_code == 200
+    assert loaded_keys(client) == second
+
+
+def test_full_save_updates_rows_in_place(client, app, cr_rows):
+    save(client, cr_rows(['1', '2', '3']))
+    db = app.connect_db()
+    ids = [row['id'] for row in db.execute('SELECT id FROM cr_form_rows ORDER BY id')]
+    save(client, cr_rows(['1', '2', '3'], remarks='changed'))
+    assert [row['id'] for row in db.execute('SELECT id FROM cr_form_rows ORDER BY id')] == ids
+    db.close()
+
+
+def test_patch_with_order_inserts_and_moves_rows(client, cr_rows):
+    save(client, cr_rows(['1', '2', '3']))
+    assert patch(client, cr_rows(['1A']), order=['1', '1A', '2', '3']).status_code == 200
+    assert loaded_keys(client) == ['1', '1A', '2', '3']
+    assert patch(client, deleted=['2'], order=['3', '1', '1A']).status_code == 200
+    assert loaded_keys(client) == ['3', '1', '1A']
+
+
+def test_patch_without_order_appends_new_rows(client, cr_rows):
+    save(client, cr_rows(['1', '2']))
+    patch(client, cr_rows(['0']))
+    assert loaded_keys(client) == ['1', '2', '0']
+
+
+def test_duplicate_item_numbers_are_rejected(client, cr_rows):
+    save(client, cr_rows(['1', '2']))
+    response = save(client, cr_rows(['1', '1', '2']))
+    assert response.status_code == 400
+    assert 'Duplicate item number: 1' in response.get_json()['error']
+    assert patch(client, order=['1', '2', '1']).status_code == 400
+    assert loaded_keys(client) == ['1', '2']
+
+
+def test_empty_patch_writes_nothing(client, app, cr_rows):
+    saved = save(client, cr_rows(['1', '2'])).get_json()
+    db = app.connect_db()
+    changes = db.execute('SELECT COUNT(*) AS n FROM form_changes').fetchone()['n']
+
+    response = patch(client)
+    assert response.status_code == 200
+    assert (response.get_json()['version'], response.get_json()['etag']) == (saved['version'], saved['etag'])
+    assert client.post('/api/cr-form/patch', json={'poKey': 'C|B|P|R', 'header': {}}).get_json()['version'] == saved['version']
+    assert db.execute('SELECT COUNT(*) AS n FROM form_changes').fetchone()['n'] == changes
+    assert db.execute('SELECT version FROM cr_forms').fetchone()['version'] == saved['version']
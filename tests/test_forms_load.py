@@ -0,0 +1,34 @@
+import pytest
+
+
+@pytest.fixture
+def po_id(client):
+    client.post('/api/pos', json={'customer': 'C', 'bid': 'B', 'po': 'P', 'cr': 'R'})
+    client.post('/api/cr-form/save', json={'poKey': 'C|B|P|R', 'rows': [
+        {'key': '1', 'part': 'P-1', 'desc': '', 'rev': 'A', 'qty': '1', 'cycles': [''] * 72, 'remarks': ''}]})
+    client.post('/api/lead-form/save', json={'poKey': 'C_B_P_R', 'rows': [{'itemNo': '7'}]})
+    return client.get('/api/pos').get_json()['pos'][0]['id']
+
+
+@pytest.mark.parametrize('method', ['GET', 'POST'])
+def test_load_by_id_and_key_includes_lead(client, po_id, method):
+    if method == 'GET':
+        response = client.get('/api/forms/load', query_string={'poId': po_id, 'poKey': 'C|B|P|R'})
+    else:
+        response = client.post('/api/forms/load', json={'poIds': [po_id], 'poKeys': ['C|B|P|R']})
+    forms = response.get_json()['forms']
+    assert set(forms) == {str(po_id), 'C|B|P|R'}
+    for po_forms in forms.values():
+        assert [row['key'] for row in po_forms['cr']['rows']] == ['1']
+        assert po_forms['ped'] == {'exists': False}
+        assert [row['itemNo'] for row in po_forms['lead']['rows']] == ['7']
+
+
+@pytest.mark.parametrize('query, status', [
+    ({'poId': '999'}, 404),
+    ({'poId': 'x'}, 400),
+    ({'poKey': 'C_B_P_R'}, 400),
+    ({}, 400),
+])
+def test_load_rejects_bad_pos(client, po_id, query, status):
+    assert client.get('/api/forms/load', query_string=query).status_code == status
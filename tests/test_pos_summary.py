@@ -0,0 +1,13 @@
+def test_summary_finds_each_form_under_its_own_key(client):
+    assert client.post('/api/pos', json={'customer': 'C', 'bid': 'B', 'po': 'P', 'cr': 'R'}).status_code in (200, 201)
+    client.post('/api/cr-form/save', json={'poKey': 'C|B|P|R', 'rows': [
+        {'key': '1', 'part': 'P-1', 'desc': '', 'rev': 'A', 'qty': '1', 'cycles': ['✓'] * 72, 'remarks': ''}]})
+    client.post('/api/lead-form/save', json={'poKey': 'C_B_P_R', 'rows': [
+        {'itemNo': str(item), 'customerRequiredDate': '2026-01-01', 'standardLeadTime': '4w', 'gtnAgreedDate': ''}
+        for item in (1, 2)]})
+
+    forms = client.get('/api/pos/summary').get_json()['pos'][0]['forms']
+    assert forms['cr']['exists'] and forms['cr']['status'] == 'complete'
+    assert not forms['ped']['exists']
+    assert forms['lead']['exists'] and forms['lead']['rows'] == 2
+    assert (forms['lead']['filledCells'], forms['lead']['totalCells']) == (4, 6)
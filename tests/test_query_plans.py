@@ -0,0 +1,61 @@
+"""Every child-row query must be answered from the (form_id, id) indexes, not a scan or sort."""
+import pytest
+
+PED_ROW = {'key': '1', 'part': 'P', 'desc': '', 'rev': 'A', 'qty': '1', 'pedCycles': ['✓'] * 11, 'notes': [''] * 7,
+           'remarks': ''}
+LEAD_ROW = {'itemNo': '1', 'part': 'P', 'desc': '', 'rev': 'A', 'qty': '1', 'customerRequiredDate': '',
+            'standardLeadTime': '', 'gtnAgreedDate': '', 'remarks': ''}
+
+
+@pytest.fixture
+def db(app, client, cr_rows):
+    for form, row in (('cr', cr_rows(['1', '2'])[0]), ('ped', PED_ROW), ('lead', LEAD_ROW)):
+        for po_key in ('A|B|C|D', 'E|F|G|H'):
+            response = client.post(f'/api/{form}-form/save', json={'poKey': po_key, 'customer': 'C', 'rows': [row]})
+            assert response.status_code == 200
+    db = app.connect_db()
+    statements = []
+    db.set_trace_callback(statements.append)
+    db.statements = statements
+    yield db
+    db.close()
+
+
+def assert_row_queries_use_index(db, form):
+    table = form.rows_table
+    queries = [sql for sql in db.statements if sql.lstrip().upper().startswith('SELECT') and f'FROM {table}' in sql]
+    assert queries
+    db.set_trace_callback(None)
+    for sql in queries:
+        plan = ' | '.join(row['detail'] for row in db.execute(f'EXPLAIN QUERY PLAN {sql}'))
+        assert f'USING INDEX idx_{table}_form' in plan or f'USING COVERING INDEX idx_{table}_form' in plan, (sql, plan)
+        assert 'TEMP B-TREE' not in plan, (sql, plan)
+
+
+@pytest.mark.parametrize('name', ['cr', 'ped', 'lead'])
+def test_load_rows_query(app, db, name):
+    form = app.FORMS[name]
+    form_id = db.execute(f'SELECT id FROM {form.table} ORDER BY id LIMIT 1').fetchone()['id']
+    db.execute(form.rows_sql, (form_id,)).fetchall()
+    app.read_forms(db, form, ['A|B|C|D', 'E|F|G|H'])
+    assert_row_queries_use_index(db, form)
+
+
+@pytest.mark.parametrize('name', ['cr', 'ped', 'lead'])
+def test_sync_rows_query(app, db, cr_rows, name):
+    form = app.FORMS[name]
+    row = {'cr': cr_rows(['1'])[0], 'ped': PED_ROW, 'lead': LEAD_ROW}[name]
+    form_id = db.execute(f'SELECT id FROM {form.table} ORDER BY id LIMIT 1').fetchone()['id']
+    app.sync_form_rows(db, form, form_id, [(row[form.row_key], form.row_values(row))], replace=True)
+    db.rollback()
+    assert_row_queries_use_index(db, form)
+
+
+@pytest.mark.parametrize('name', ['cr', 'ped', 'lead'])
+def test_export_rows_query(app, db, name):
+    form = app.FORMS[name]
+    if name == 'cr':
+        app.fetch_cr_export_rows(db, [record['id'] for record in app.fetch_cr_export_forms(db)])
+    else:
+        list(app.form_export_lines(db, form, {}))
+    assert_row_queries_use_index(db, form)
@@ -0,0 +1,21 @@
+import os
+
+
+def snapshot_names(client):
+    return [snapshot['name'] for snapshot in client.get('/api/snapshots').get_json()['snapshots']]
+
+
+def test_restoring_the_oldest_snapshot_keeps_it(client, app, monkeypatch):
+    monkeypatch.setattr(app, 'SNAPSHOT_RETAIN', 2)
+    client.post('/api/pos', json={'customer': 'Old', 'bid': 'B', 'po': 'P', 'cr': 'R'})
+    oldest = client.post('/api/snapshots').get_json()['name']
+    newer = client.post('/api/snapshots').get_json()['name']
+    # Same-second snapshots are ordered by mtime.
+    os.utime(os.path.join(app.SNAPSHOT_DIR, oldest), (1, 1))
+    client.post('/api/pos', json={'customer': 'New', 'bid': 'B', 'po': 'P', 'cr': 'R'})
+
+    response = client.post(f'/api/snapshots/{oldest}/restore')
+    assert response.status_code == 200
+    safety = response.get_json()['safetySnapshot']['name']
+    assert set(snapshot_names(client)) == {safety, newer, oldest}
+    assert [po['customer'] for po in client.get('/api/pos').get_json()['pos']] == ['Old']
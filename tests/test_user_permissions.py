@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+
+@pytest.fixture
+def bob(client, app):
+    client.post('/api/users', json={'username': 'bob', 'password': 'pw', 'name': 'Bob', 'department': 'QA'})
+    bob = app.app.test_client()
+    assert bob.post('/api/login', json={'username': 'bob', 'password': 'pw'}).status_code == 200
+    return bob
+
+
+def test_other_workers_see_user_changes_at_once(bob, app):
+    assert bob.get('/api/users').status_code == 403
+    # Another worker process promotes bob; this process still has him cached.
+    db = app.connect_db()
+    db.execute("UPDATE users SET is_admin = 1 WHERE username = 'bob'")
+    db.commit()
+    assert bob.get('/api/users').status_code == 403
+    subprocess.run([sys.executable, '-c', 'import app; app.invalidate_user_permissions()'], check=True,
+                   env=dict(os.environ, USERS_VERSION_PATH=app.users_version_path()))
+    assert bob.get('/api/users').status_code == 200
+
+
+def test_invalidation_always_moves_the_version(app):
+    versions = []
+    for _ in range(20):
+        app.invalidate_user_permissions()
+        versions.append(app.users_version())
+    assert versions == sorted(set(versions))